@@ -0,0 +1,48 @@
+"""Request scoped context.
+
+Each request (a turn of the agent) runs in a `request_context()`, which
+gives it an ID kept in a context variable. Context variables follow the
+request into asyncio tasks, LangGraph nodes and `Send` fan-outs, and
+`asyncio.to_thread`, so state keyed on them (the turn log row, the current
+span) is isolated per request without locks.
+
+Plain thread pools do not copy the caller's context, submit work to them
+with `submit()`.
+
+The request ID is a 32 hex digit ID: it is the `turn_id` of the turn log
+row, the trace ID of the request's spans and is stamped on log records.
+"""
+
+import contextlib
+import contextvars
+import uuid
+from concurrent.futures import Executor, Future
+from typing import Callable, Iterator, Optional
+
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "request_id", default=None
+)
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+@contextlib.contextmanager
+def request_context(request_id: Optional[str] = None) -> Iterator[str]:
+    """Runs the block as a request, with a new ID unless one is given."""
+    request_id = request_id or new_request_id()
+    token = _request_id.set(request_id)
+    try:
+        yield request_id
+    finally:
+        _request_id.reset(token)
+
+
+def submit(executor: Executor, fn: Callable, *args, **kwargs) -> Future:
+    """`executor.submit` running `fn` in a copy of the caller's context."""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
@@ -10,39 +10,47 @@ import tempfile
 import shutil
 import subprocess
 import asyncio
+import contextvars
+import functools
+import threading
+from typing import TYPE_CHECKING
+
+from shared.context import current_request_id, request_context
+
+if TYPE_CHECKING:
+    from shared.turn_log import BufferedTurnLogger
 
 _LOG_BASE_NAME = ""
 csv.field_size_limit(sys.maxsize)
 CSV_DEMILITER = "|"
 
 
-def get_commit_hash():
-    """Get the current git commit hash."""
+@functools.lru_cache(maxsize=None)
+def _commit_hashes():
+    """Full and short hash of the current git commit, from one `git` call."""
     try:
         result = subprocess.run(
-            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+            ["git", "rev-parse", "HEAD", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
         )
-        return result.stdout.strip()
+        full, short = result.stdout.split()
+        return full, short
     except subprocess.CalledProcessError:
-        return "unknown"
+        return "unknown", "unknown"
     except FileNotFoundError:
-        return "git-not-found"
+        return "git-not-found", "git-not-found"
+
+
+def get_commit_hash():
+    """Get the current git commit hash."""
+    return _commit_hashes()[0]
 
 
 def get_short_commit_hash():
     """Get the short version of the current git commit hash."""
-    try:
-        result = subprocess.run(
-            ["git", "rev-parse", "--short", "HEAD"],
-            capture_output=True,
-            text=True,
-            check=True,
-        )
-        return result.stdout.strip()
-    except subprocess.CalledProcessError:
-        return "unknown"
-    except FileNotFoundError:
-        return "git-not-found"
+    return _commit_hashes()[1]
 
 
 def get_commit_timestamp_basename():
@@ -90,6 +98,7 @@ def setup_logger_with_commit_info(
             record.commit_hash = commit_hash
             record.short_hash = short_hash
             record.timestamp = datetime.now().isoformat()
+            record.request_id = current_request_id() or "-"
             return super().format(record)
 
     # Set up logger
@@ -102,7 +111,7 @@ def setup_logger_with_commit_info(
     # Console handler
     console_handler = logging.StreamHandler()
     console_formatter = CommitFormatter(
-        fmt="%(timestamp)s - %(name)s - %(levelname)s - [%(short_hash)s] - %(filename)s:%(lineno)d %(message)s",
+        fmt="%(timestamp)s - %(name)s - %(levelname)s - [%(short_hash)s] [%(request_id)s] - %(filename)s:%(lineno)d %(message)s",
         datefmt="%Y-%m-%d %H:%M:%S",
     )
     console_handler.setFormatter(console_formatter)
@@ -115,7 +124,7 @@ def setup_logger_with_commit_info(
         log_filepath, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
     )
     file_formatter = CommitFormatter(
-        fmt="%(timestamp)s - %(name)s - %(levelname)s - [%(short_hash)s] - %(filename)s:%(lineno)d %(message)s"
+        fmt="%(timestamp)s - %(name)s - %(levelname)s - [%(short_hash)s] [%(request_id)s] - %(filename)s:%(lineno)d %(message)s"
     )
     file_handler.setFormatter(file_formatter)
     slogger.addHandler(file_handler)
@@ -136,34 +145,80 @@ def add_run_to_csv(basename, csv_path="run_logs.csv", description=""):
 
 
 APP_NAME = "text2sql-bot"
-LOG_DIR = "./logs/"
-logger = setup_logger_with_commit_info(APP_NAME, log_dir=LOG_DIR)
+LOG_DIR = os.environ.get("LOG_DIR", "./logs/")
+
+_setup_lock = threading.RLock()
+_is_set_up = False
+
+
+def setup_logging():
+    """Set up the app logger's handlers and record the run in the run log
+    CSV. Runs once, on the first record logged."""
+    global _is_set_up
+    if _is_set_up:
+        return
+    with _setup_lock:
+        if _is_set_up:
+            return
+        setup_logger_with_commit_info(APP_NAME, log_dir=LOG_DIR)
+        run_log_base = f"{get_short_commit_hash()}_run.csv"
+        csv_path = create_run_log_csv(os.path.join(LOG_DIR, run_log_base))
+        add_run_to_csv(getattr(logger, "basename", run_log_base), csv_path)
+        _is_set_up = True
+
+
+class _SetupOnFirstRecord(logging.Handler):
+    """Placeholder handler: sets up logging on the first record, then hands
+    the record to the real handlers."""
+
+    def handle(self, record):
+        setup_logging()
+        for handler in logger.handlers:
+            if handler is not self and record.levelno >= handler.level:
+                handler.handle(record)
+        return True
+
+    def emit(self, record):
+        pass
+
+
+# handlers, log files and `git` calls wait until something is logged
+logger = logging.getLogger(APP_NAME)
+logger.setLevel(logging.INFO)
+logger.handlers.clear()
+logger.addHandler(_SetupOnFirstRecord())
 
 
 class TurnLogger:
     delimiter = CSV_DEMILITER
+    # save_turn() writes and fsyncs the file
+    blocking_save = True
 
     def __init__(
         self,
-        csv_file_path=os.path.join(
-            LOG_DIR,
-            f"{get_commit_timestamp_basename()}_turn.csv",
-        ),
+        csv_file_path=None,
         identity_columns=None,
     ):
         """
         Initialize TurnLogger with optional identity columns.
 
         Args:
-            csv_file_path: Path to the CSV file
+            csv_file_path: Path to the CSV file, by default
+                `<commit>_<timestamp>_turn.csv` in the log directory
             identity_columns: List of column names that serve as identity columns.
                             If None, defaults to ["created_date"].
                             Can include "id" for auto-incrementing row numbers.
         """
 
+        if csv_file_path is None:
+            csv_file_path = os.path.join(
+                LOG_DIR, f"{get_commit_timestamp_basename()}_turn.csv"
+            )
         print(f"csv_file_path: {os.path.abspath(csv_file_path)}")
         self.csv_file_path = csv_file_path
-        self.current_row = {}
+        # one row per request, concurrent turns do not share it
+        self._row = contextvars.ContextVar(f"turn_row_{id(self)}", default=None)
+        self._file_lock = threading.Lock()
         self.identity_columns = identity_columns or ["created_date"]
         # Initialize fieldnames as a list to maintain order
         self.fieldnames = list(self.identity_columns)
@@ -219,6 +274,14 @@ class TurnLogger:
         except Exception as e:
             raise RuntimeError(f"Failed to initialize CSV file: {e}")
 
+    @property
+    def current_row(self):
+        return self._row.get()
+
+    @current_row.setter
+    def current_row(self, row):
+        self._row.set(row)
+
     def new_turn(self):
         """
         Start a new turn by saving the current turn (if any) and initializing a new one.
@@ -247,16 +310,27 @@ class TurnLogger:
             if key is None:
                 raise ValueError("Cannot log with None key")
 
-            if key in self.current_row:
-                self.current_row[key] = f"{self.current_row[key]}\n{value}"
+            row = self.current_row
+            if row is None:
+                # logged before `new_turn`, start this context's own row
+                row = self.current_row = {}
+            if key in row:
+                row[key] = f"{row[key]}\n{value}"
             else:
-                self.current_row[key] = value
+                row[key] = value
                 if key not in self.fieldnames:
-                    self.fieldnames.append(key)
-                    self._update_csv_header()
+                    with self._file_lock:
+                        if key not in self.fieldnames:
+                            self.fieldnames.append(key)
+                            self._update_csv_header()
         except Exception as e:
             raise RuntimeError(f"Failed to log key-value pair: {e}")
 
+    def detach_turn(self):
+        """Stop logging to the turn's row from this context, for work that
+        outlives its turn."""
+        self.current_row = None
+
     def _update_csv_header(self):
         try:
             # Create a temporary file using tempfile module
@@ -322,10 +396,13 @@ class TurnLogger:
 
     def save_turn(self):
         try:
-            with open(self.csv_file_path, "a", newline="", encoding="utf-8") as csvfile:
+            with self._file_lock, open(
+                self.csv_file_path, "a", newline="", encoding="utf-8"
+            ) as csvfile:
                 # Ensure all fields are present in the row and no None keys
                 row = {field: "" for field in self.fieldnames}
-                row.update({k: v for k, v in self.current_row.items() if k is not None})
+                current_row = self.current_row or {}
+                row.update({k: v for k, v in current_row.items() if k is not None})
 
                 writer = csv.DictWriter(
                     csvfile,
@@ -349,36 +426,42 @@ class TurnLogger:
             self.save_turn()
 
 
-def with_a_turn_logger(turn_logger: TurnLogger):
+def with_a_turn_logger(turn_logger: "TurnLogger | BufferedTurnLogger"):
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
             if not asyncio.iscoroutinefunction(func):
-                turn_logger.new_turn()
-                try:
-                    result = func(*args, **kwargs)
-                    return result
-                except Exception as e:
-                    turn_logger.log("error", f"Error: {e}")
-                    raise e
-                finally:
-                    logger.info(f"Waiting for saving turn log...")
-                    turn_logger.save_turn()
-                    logger.info(f"Turn log saved!")
-            else:
-
-                async def async_wrapper():
+                with request_context():
                     turn_logger.new_turn()
                     try:
-                        result = await func(*args, **kwargs)
+                        result = func(*args, **kwargs)
                         return result
                     except Exception as e:
                         turn_logger.log("error", f"Error: {e}")
                         raise e
                     finally:
                         logger.info(f"Waiting for saving turn log...")
-                        await asyncio.to_thread(turn_logger.save_turn)
+                        turn_logger.save_turn()
                         logger.info(f"Turn log saved!")
+            else:
+
+                async def async_wrapper():
+                    with request_context():
+                        turn_logger.new_turn()
+                        try:
+                            result = await func(*args, **kwargs)
+                            return result
+                        except Exception as e:
+                            turn_logger.log("error", f"Error: {e}")
+                            raise e
+                        finally:
+                            if turn_logger.blocking_save:
+                                logger.info(f"Waiting for saving turn log...")
+                                await asyncio.to_thread(turn_logger.save_turn)
+                                logger.info(f"Turn log saved!")
+                            else:
+                                # buffered loggers only queue the row
+                                turn_logger.save_turn()
 
                 return async_wrapper()
 
@@ -387,15 +470,6 @@ def with_a_turn_logger(turn_logger: TurnLogger):
     return decorator
 
 
-# Create/update CSV tracking file
-CSV_RUN_LOG_BASE = f"{get_short_commit_hash()}_run.csv"
-CSV_RUN_LOG = os.path.join(LOG_DIR, CSV_RUN_LOG_BASE)
-
-csv_path = create_run_log_csv(CSV_RUN_LOG)
-run_log_basename = getattr(logger, "basename", CSV_RUN_LOG_BASE)
-
-add_run_to_csv(run_log_basename, csv_path)
-
 # Example usage:
 if __name__ == "__main__":
     # Example with timestamped log file in logs directory
@@ -1,13 +1,18 @@
+"""Chart images for the MCP chart tools.
+
+matplotlib, numpy, networkx, wordcloud and squarify are imported by the
+functions drawing with them, importing this module does not load them.
+"""
+
+from __future__ import annotations
+
 import os
-from typing import List, Dict, Union, Tuple, Optional
-import matplotlib.pyplot as plt
-import numpy as np
-from matplotlib.figure import Figure
-import networkx as nx
-from wordcloud import WordCloud
-import seaborn as sns
+from typing import TYPE_CHECKING, List, Dict, Union, Tuple, Optional
 from datetime import datetime
 
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
 
 def _save_chart(fig: Figure, chart_type: str) -> str:
     """
@@ -20,6 +25,8 @@ def _save_chart(fig: Figure, chart_type: str) -> str:
     Returns:
         str: Absolute path to the saved image
     """
+    import matplotlib.pyplot as plt
+
     # Create output directory if it doesn't exist
     output_dir = os.path.join(os.getcwd(), "charts")
     os.makedirs(output_dir, exist_ok=True)
@@ -58,6 +65,8 @@ def generate_area_chart(
     Returns:
         str: Absolute path to the saved image
     """
+    import matplotlib.pyplot as plt
+
     fig, ax = plt.subplots(figsize=(10, 6))
     ax.fill_between(x_data, y_data, color=color, alpha=0.4)
     ax.plot(x_data, y_data, color=color, linewidth=2)
@@ -92,6 +101,8 @@ def generate_bar_chart(
     Returns:
         str: Absolute path to the saved image
     """
+    import matplotlib.pyplot as plt
+
     fig, ax = plt.subplots(figsize=(10, 6))
     bars = ax.bar(categories, values, color=color)
 
@@ -136,6 +147,8 @@ def generate_column_chart(
     Returns:
         str: Absolute path to the saved image
     """
+    import matplotlib.pyplot as plt
+
     fig, ax = plt.subplots(figsize=(10, 6))
     bars = ax.barh(categories, values, color=color)
 
@@ -182,6 +195,8 @@ def generate_dual_axes_chart(
     Returns:
         str: Absolute path to the saved image
     """
+    import matplotlib.pyplot as plt
+
     fig, ax1 = plt.subplots(figsize=(10, 6))
 
     # Plot first dataset
@@ -230,6 +245,8 @@ def generate_histogram_chart(
     Returns:
         str: Absolute path to the saved image
     """
+    import matplotlib.pyplot as plt
+
     fig, ax = plt.subplots(figsize=(10, 6))
     ax.hist(data, bins=bins, color=color, edgecolor="black")
 
@@ -265,6 +282,8 @@ def generate_line_chart(
     Returns:
         str: Absolute path to the saved image
     """
+    import matplotlib.pyplot as plt
+
     fig, ax = plt.subplots(figsize=(10, 6))
     ax.plot(x_data, y_data, color=color, marker=marker, linewidth=2)
 
@@ -294,6 +313,8 @@ def generate_pie_chart(
     Returns:
         str: Absolute path to the saved image
     """
+    import matplotlib.pyplot as plt
+
     fig, ax = plt.subplots(figsize=(10, 6))
     ax.pie(
         values,
@@ -323,6 +344,9 @@ def generate_radar_chart(
     Returns:
         str: Absolute path to the saved image
     """
+    import matplotlib.pyplot as plt
+    import numpy as np
+
     # Number of variables
     N = len(categories)
 
@@ -370,6 +394,8 @@ def generate_scatter_chart(
     Returns:
         str: Absolute path to the saved image
     """
+    import matplotlib.pyplot as plt
+
     fig, ax = plt.subplots(figsize=(10, 6))
     ax.scatter(x_data, y_data, c=color, s=size, alpha=0.6)
 
@@ -395,6 +421,9 @@ def generate_treemap_chart(
     Returns:
         str: Absolute path to the saved image
     """
+    import matplotlib.pyplot as plt
+    import squarify
+
     fig, ax = plt.subplots(figsize=(10, 6))
     squarify.plot(sizes=values, label=labels, alpha=0.8)
     plt.title(title)
@@ -420,6 +449,9 @@ def generate_word_cloud_chart(
     Returns:
         str: Absolute path to the saved image
     """
+    import matplotlib.pyplot as plt
+    from wordcloud import WordCloud
+
     wordcloud = WordCloud(
         max_words=max_words, background_color=background_color, width=800, height=400
     ).generate(text)
@@ -452,6 +484,9 @@ def generate_network_graph(
     Returns:
         str: Absolute path to the saved image
     """
+    import matplotlib.pyplot as plt
+    import networkx as nx
+
     G = nx.Graph()
     G.add_nodes_from(nodes)
     G.add_edges_from(edges)
@@ -495,6 +530,9 @@ def generate_flow_diagram(
     Returns:
         str: Absolute path to the saved image
     """
+    import matplotlib.pyplot as plt
+    import networkx as nx
+
     G = nx.DiGraph()
     G.add_nodes_from(nodes)
     G.add_edges_from(edges)
@@ -537,6 +575,8 @@ def generate_fishbone_diagram(
     Returns:
         str: Absolute path to the saved image
     """
+    import matplotlib.pyplot as plt
+
     fig, ax = plt.subplots(figsize=(12, 8))
 
     # Draw main line
@@ -586,6 +626,9 @@ def generate_mind_map(
     Returns:
         str: Absolute path to the saved image
     """
+    import matplotlib.pyplot as plt
+    import numpy as np
+
     fig, ax = plt.subplots(figsize=(12, 8))
 
     # Draw central topic
@@ -0,0 +1,140 @@
+import hashlib
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Callable, List, NamedTuple, Optional, Tuple
+
+
+class RowBatch(NamedTuple):
+    columns: Tuple[str, ...]
+    rows: List[Tuple[Any, ...]]
+
+
+def _normalize_value(value: Any) -> Any:
+    """Make values from different drivers/queries compare equal: 2 == 2.0 ==
+    Decimal("2.00"), floats rounded so float noise does not split votes."""
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float, Decimal)):
+        number = round(float(value), 6)
+        return int(number) if number.is_integer() else number
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+    return str(value)
+
+
+def rows_fingerprint(rows: List[Tuple[Any, ...]]) -> str:
+    """Order-insensitive hash of a multiset of rows."""
+    total = 0
+    for row in rows:
+        digest = hashlib.blake2b(
+            repr(tuple(_normalize_value(v) for v in row)).encode("utf-8"),
+            digest_size=8,
+        ).digest()
+        total = (total + int.from_bytes(digest, "big")) % (1 << 64)
+    return f"{len(rows)}:{total:016x}"
+
+
+class QueryResult:
+    """Row-capped result of one query execution.
+
+    `rows` keeps the driver's Python types for at most the configured row and
+    byte caps. `to_text()` renders them like `SQLDatabase.run` for callers that
+    expect a string, `summary()` is the short form meant for prompts and logs,
+    and `fetch_all()` lazily re-executes the query when the full result is
+    really needed.
+    """
+
+    def __init__(
+        self,
+        sql: str,
+        columns: Tuple[str, ...] = (),
+        rows: Optional[List[Tuple[Any, ...]]] = None,
+        truncated: bool = False,
+        nbytes: int = 0,
+        error: Optional[str] = None,
+        loader: Optional[Callable[[], List[Tuple[Any, ...]]]] = None,
+        max_string_length: int = 300,
+    ):
+        self.sql = sql
+        self.columns = columns
+        self.rows = rows or []
+        self.truncated = truncated
+        self.nbytes = nbytes
+        self.error = error
+        self.max_string_length = max_string_length
+        self._loader = loader
+        self._all_rows: Optional[List[Tuple[Any, ...]]] = None
+
+    @property
+    def is_success(self) -> bool:
+        return self.error is None
+
+    def _format_row(self, row: Tuple[Any, ...]) -> Tuple[Any, ...]:
+        # formatted like SQLDatabase.run, imported here as langchain_community
+        # is slow to import
+        from langchain_community.utilities.sql_database import truncate_word
+
+        return tuple(
+            truncate_word(value, length=self.max_string_length) for value in row
+        )
+
+    def to_text(self) -> str:
+        if self.error is not None:
+            return self.error
+        if not self.rows:
+            return ""
+        text = str([self._format_row(row) for row in self.rows])
+        if self.truncated:
+            text += f"\n... (truncated after {len(self.rows)} rows)"
+        return text
+
+    def summary(self, max_rows: int = 20, max_chars: int = 4000) -> str:
+        """Compact rendering bounded by `max_rows` rows and `max_chars` chars."""
+        if self.error is not None:
+            return self.error[:max_chars]
+        if not self.rows:
+            return ""
+        lines = [f"columns: {', '.join(self.columns)}"]
+        size = len(lines[0])
+        shown = 0
+        for row in self.rows[:max_rows]:
+            line = str(self._format_row(row))
+            if size + len(line) > max_chars:
+                break
+            lines.append(line)
+            size += len(line) + 1
+            shown += 1
+        remaining = len(self.rows) - shown
+        if remaining or self.truncated:
+            more = f"{remaining}+" if self.truncated else str(remaining)
+            lines.append(f"... {more} more rows")
+        return "\n".join(lines)
+
+    def fingerprint(self) -> Optional[str]:
+        """Order-insensitive hash of the rows, equal for queries returning the
+        same rows in any order. None for errors and empty results, which say
+        nothing about equivalence. Truncated results hash the kept rows only.
+        """
+        if self.error is not None or not self.rows:
+            return None
+        prefix = "truncated:" if self.truncated else ""
+        return prefix + rows_fingerprint(self.rows)
+
+    def fetch_all(self) -> List[Tuple[Any, ...]]:
+        """Every row of the query, re-executed without caps only if truncated."""
+        if not self.truncated or self._loader is None:
+            return self.rows
+        if self._all_rows is None:
+            self._all_rows = self._loader()
+        return self._all_rows
+
+    def __str__(self) -> str:
+        return self.to_text()
+
+    def __repr__(self) -> str:
+        return (
+            f"QueryResult(rows={len(self.rows)}, truncated={self.truncated}, "
+            f"error={self.error!r})"
+        )
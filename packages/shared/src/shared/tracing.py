@@ -0,0 +1,401 @@
+"""Span based tracing of requests.
+
+`span(name)` times a block and links it to the enclosing span of the same
+request. The current span lives in a context variable, so it follows the
+request into asyncio tasks, LangGraph nodes and `asyncio.to_thread`. The
+root span of a request takes the request ID (see `shared.context`) as its
+trace ID, linking the trace to the request's turn log row and log lines.
+
+Code deep in the call stack records what it did on the current span with
+`add()` (tokens, retries, queue wait, cache hits). Counters roll up into the
+parent span when a span ends, so a graph node span holds the totals of the
+LLM calls and queries made under it.
+
+Finished spans go to the configured exporters, `JsonlSpanExporter` for a
+local file or `OtlpSpanExporter` for an OpenTelemetry collector (OTLP/HTTP
+JSON, no SDK needed). Exporters are flushed when a root span ends.
+"""
+
+import asyncio
+import atexit
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+import urllib.request
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from shared.context import current_request_id
+from shared.logger import logger
+
+OK = "ok"
+ERROR = "error"
+CANCELLED = "cancelled"
+
+
+class Span:
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent",
+        "start",
+        "duration",
+        "status",
+        "attributes",
+        "counters",
+        "_started",
+    )
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, **attributes):
+        self.name = name
+        self.parent = parent
+        if parent is not None:
+            self.trace_id = parent.trace_id
+        else:
+            self.trace_id = current_request_id() or secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.start = time.time()
+        self.duration: Optional[float] = None
+        self.status = OK
+        self.attributes: Dict[str, Any] = dict(attributes)
+        self.counters: Dict[str, float] = {}
+        self._started = time.perf_counter()
+
+    def add(self, counter: str, value: float = 1):
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent else None,
+            "start": self.start,
+            "duration": self.duration,
+            "status": self.status,
+            "attributes": self.attributes,
+            "counters": self.counters,
+        }
+
+
+class SpanExporter:
+    def export(self, span: Span):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+
+class JsonlSpanExporter(SpanExporter):
+    """Appends one JSON object per span to `path`, written once per trace."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._buffer: List[str] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            self._buffer.append(line)
+
+    def flush(self):
+        with self._lock:
+            lines, self._buffer = self._buffer, []
+        if not lines:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(span: Span) -> Dict[str, Any]:
+    start = int(span.start * 1e9)
+    attributes = {**span.attributes, **span.counters}
+    payload = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        # SPAN_KIND_INTERNAL
+        "kind": 1,
+        "startTimeUnixNano": str(start),
+        "endTimeUnixNano": str(start + int((span.duration or 0) * 1e9)),
+        "attributes": [
+            {"key": key, "value": _otlp_value(value)}
+            for key, value in attributes.items()
+            if value is not None
+        ],
+        "status": {"code": 2 if span.status == ERROR else 1},
+    }
+    if span.parent is not None:
+        payload["parentSpanId"] = span.parent.span_id
+    return payload
+
+
+class OtlpSpanExporter(SpanExporter):
+    """Posts spans to an OpenTelemetry collector's OTLP/HTTP JSON endpoint.
+
+    Requests are sent from a background thread, a slow or missing collector
+    never delays a request.
+    """
+
+    def __init__(
+        self,
+        endpoint: str = "http://localhost:4318",
+        service_name: str = "text2sql",
+        timeout: float = 5.0,
+    ):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self.timeout = timeout
+        self._spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[List[Dict[str, Any]]]]" = queue.Queue()
+        self._failing = False
+        self._thread = threading.Thread(
+            target=self._run, name="otlp-exporter", daemon=True
+        )
+        self._thread.start()
+
+    def export(self, span: Span):
+        payload = _otlp_span(span)
+        with self._lock:
+            self._spans.append(payload)
+
+    def flush(self):
+        with self._lock:
+            spans, self._spans = self._spans, []
+        if spans:
+            self._queue.put(spans)
+
+    def close(self):
+        self.flush()
+        self._queue.put(None)
+        self._thread.join(self.timeout)
+
+    def _body(self, spans: List[Dict[str, Any]]) -> bytes:
+        return json.dumps(
+            {
+                "resourceSpans": [
+                    {
+                        "resource": {
+                            "attributes": [
+                                {
+                                    "key": "service.name",
+                                    "value": {"stringValue": self.service_name},
+                                }
+                            ]
+                        },
+                        "scopeSpans": [{"scope": {"name": "shared.tracing"}, "spans": spans}],
+                    }
+                ]
+            }
+        ).encode("utf-8")
+
+    def _run(self):
+        while (spans := self._queue.get()) is not None:
+            request = urllib.request.Request(
+                self.url,
+                data=self._body(spans),
+                headers={"Content-Type": "application/json"},
+                method="POST",
+            )
+            try:
+                urllib.request.urlopen(request, timeout=self.timeout).close()
+                self._failing = False
+            except Exception as e:
+                # warn once per outage, not for every trace
+                if not self._failing:
+                    logger.warning(f"Could not export spans to {self.url}: {e}")
+                self._failing = True
+
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+_stages: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "stage_timings", default=None
+)
+_exporters: List[SpanExporter] = []
+# counters of spans ending in worker threads roll up concurrently
+_rollup_lock = threading.Lock()
+
+
+def configure(exporters: Iterable[SpanExporter]):
+    """Replace the exporters finished spans are sent to."""
+    shutdown()
+    _exporters.extend(exporters)
+
+
+def shutdown():
+    """Flush and close the exporters."""
+    while _exporters:
+        exporter = _exporters.pop()
+        try:
+            exporter.close()
+        except Exception as e:
+            logger.warning(f"Closing span exporter failed: {e}")
+
+
+atexit.register(shutdown)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def add(counter: str, value: float = 1):
+    """Add to a counter of the current span, if any."""
+    current = _current.get()
+    if current is not None:
+        current.add(counter, value)
+
+
+def set_attributes(**attributes):
+    current = _current.get()
+    if current is not None:
+        current.set(**attributes)
+
+
+def _finish(span: Span):
+    span.duration = time.perf_counter() - span._started
+    if span.parent is not None and span.counters:
+        with _rollup_lock:
+            for counter, value in span.counters.items():
+                span.parent.add(counter, value)
+    stages = _stages.get()
+    if stages is not None:
+        # spans run several times (retries, strategies) add up
+        stages[span.name] = stages.get(span.name, 0.0) + span.duration
+    for exporter in _exporters:
+        try:
+            exporter.export(span)
+            if span.parent is None:
+                exporter.flush()
+        except Exception as e:
+            logger.warning(f"Span export failed: {e}")
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """Times the block as a child of the current span."""
+    current = Span(name, _current.get(), **attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except (asyncio.CancelledError, GeneratorExit):
+        current.status = CANCELLED
+        raise
+    except BaseException as e:
+        current.status = ERROR
+        current.set(error=repr(e))
+        raise
+    finally:
+        _current.reset(token)
+        _finish(current)
+
+
+def traced(name: str, **attributes) -> Callable[[Callable], Callable]:
+    """Decorator running every call of a function, sync or async, in a span."""
+
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, **attributes):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, **attributes):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextlib.contextmanager
+def record_stages() -> Iterator[Dict[str, float]]:
+    """Yields a `{span name: seconds}` dict of the spans ending inside."""
+    stages: Dict[str, float] = {}
+    token = _stages.set(stages)
+    try:
+        yield stages
+    finally:
+        _stages.reset(token)
+
+
+# --- reports
+
+
+def read_spans(path: str) -> List[Dict[str, Any]]:
+    spans = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                try:
+                    spans.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return spans
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize_spans(spans: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Per span name: count, errors, latency percentiles and counter means."""
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for item in spans:
+        groups.setdefault(item["name"], []).append(item)
+    summary = {}
+    for name, items in groups.items():
+        durations = [item["duration"] or 0.0 for item in items]
+        counters: Dict[str, float] = {}
+        for item in items:
+            for counter, value in (item.get("counters") or {}).items():
+                counters[counter] = counters.get(counter, 0) + value
+        summary[name] = {
+            "count": len(items),
+            "errors": sum(1 for item in items if item.get("status") == ERROR),
+            "total": sum(durations),
+            "mean": sum(durations) / len(durations),
+            "p50": _percentile(durations, 0.5),
+            "p95": _percentile(durations, 0.95),
+            "max": max(durations),
+            **{
+                f"mean_{counter}": value / len(items)
+                for counter, value in sorted(counters.items())
+            },
+        }
+    return summary
@@ -0,0 +1,280 @@
+"""Buffered turn logging.
+
+`BufferedTurnLogger` has the `TurnLogger` interface (`new_turn`, `log`,
+`save_turn`) but keeps the row of a turn in a context variable, so
+concurrent turns each fill their own row without locks. A row's `turn_id`
+is the ID of its request (see `shared.context`), which is also the trace ID
+of the request's spans. Finished rows are
+queued to a background thread that appends them in batches to a sink:
+
+- `JsonlTurnSink`: one JSON object per turn, new keys need no rewrite.
+- `ParquetTurnSink`: one part file per batch, each with its own schema
+  (needs pyarrow).
+
+`durability` sets what a batch write waits for: ``none`` leaves the data to
+the OS buffers, ``flush`` flushes the file, ``fsync`` also syncs it to disk.
+"""
+
+import atexit
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from shared.context import current_request_id
+from shared.logger import logger
+
+DURABILITY = ("none", "flush", "fsync")
+
+_STOP = object()
+
+
+def _jsonable(value: Any) -> Any:
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    try:
+        return json.loads(json.dumps(value, ensure_ascii=False, default=str))
+    except (TypeError, ValueError):
+        return str(value)
+
+
+class TurnSink:
+    def write(self, rows: List[Dict[str, Any]]):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class JsonlTurnSink(TurnSink):
+    def __init__(self, path: str, durability: str = "flush"):
+        if durability not in DURABILITY:
+            raise ValueError(f"Unknown turn log durability: {durability}")
+        self.path = path
+        self.durability = durability
+        self._file = None
+
+    def write(self, rows: List[Dict[str, Any]]):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(
+            "".join(
+                json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in rows
+            )
+        )
+        if self.durability != "none":
+            self._file.flush()
+        if self.durability == "fsync":
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ParquetTurnSink(TurnSink):
+    """Part files `<directory>/turns-<time>-<n>.parquet`, one per batch.
+
+    Values are stored as text (JSON for structured ones) so parts written
+    with different keys still read as one dataset.
+    """
+
+    def __init__(self, directory: str, durability: str = "flush"):
+        if durability not in DURABILITY:
+            raise ValueError(f"Unknown turn log durability: {durability}")
+        try:
+            import pyarrow  # noqa: F401
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise ImportError(
+                "Parquet turn logs need pyarrow, install it with `pip install pyarrow`"
+            ) from None
+        self.directory = directory
+        self.durability = durability
+        self._parts = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, rows: List[Dict[str, Any]]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        columns: Dict[str, List[Optional[str]]] = {}
+        for row in rows:
+            for key in row:
+                columns.setdefault(key, [])
+        for row in rows:
+            for key, values in columns.items():
+                value = row.get(key)
+                if value is not None and not isinstance(value, str):
+                    value = json.dumps(value, ensure_ascii=False, default=str)
+                values.append(value)
+        self._parts += 1
+        path = os.path.join(
+            self.directory,
+            f"turns-{datetime.now().strftime('%Y%m%d_%H%M%S')}-{self._parts:05d}.parquet",
+        )
+        pq.write_table(pa.table(columns), path)
+        if self.durability == "fsync":
+            with open(path, "rb") as f:
+                os.fsync(f.fileno())
+
+
+class BufferedTurnLogger:
+    """Turn logger with one row per turn and batched background writes."""
+
+    # save_turn() only queues the row
+    blocking_save = False
+
+    def __init__(
+        self,
+        sink: TurnSink,
+        batch_size: int = 64,
+        flush_interval: float = 1.0,
+    ):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._row: contextvars.ContextVar[Optional[Dict[str, Any]]] = (
+            contextvars.ContextVar(f"turn_row_{id(self)}", default=None)
+        )
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._warned = False
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="turn-log-writer", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    # --- turn API, called on the request path
+
+    def new_turn(self) -> Dict[str, Any]:
+        row = {
+            "turn_id": current_request_id() or uuid.uuid4().hex,
+            "created_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        self._row.set(row)
+        return row
+
+    @property
+    def current_row(self) -> Optional[Dict[str, Any]]:
+        return self._row.get()
+
+    def log(self, key, value):
+        """Log a key-value pair on the current turn's row, values of a key
+        logged again are appended on a new line."""
+        if key is None:
+            raise ValueError("Cannot log with None key")
+        row = self._row.get()
+        if row is None:
+            if not self._warned:
+                logger.warning(f"Turn log `{key}` outside of a turn, dropped")
+                self._warned = True
+            return
+        if key in row:
+            row[key] = f"{row[key]}\n{value}"
+        else:
+            # snapshot now, states logged by reference change afterwards
+            row[key] = _jsonable(value)
+
+    def save_turn(self):
+        """Queue the current row for writing, never blocks on I/O."""
+        row = self._row.get()
+        if row is None:
+            return
+        self._row.set(None)
+        self._queue.put(row)
+
+    def detach_turn(self):
+        """Stop logging to the turn's row from this context, for work that
+        outlives its turn (the row may already be queued)."""
+        self._row.set(None)
+
+    def __enter__(self):
+        self.new_turn()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.save_turn()
+
+    # --- writer thread
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        if not batch:
+            return
+        try:
+            self.sink.write(batch)
+        except Exception as e:
+            logger.error(f"Failed to write {len(batch)} turn log rows: {e}")
+
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            batch: List[Dict[str, Any]] = []
+            waiters: List[threading.Event] = []
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stop = True
+                    break
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            self._write(batch)
+            for waiter in waiters:
+                waiter.set()
+        self.sink.close()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the rows saved so far are written."""
+        if self._closed:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 10.0):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+
+def create_turn_logger(
+    format: str = "jsonl",
+    path: str = "./logs/turn_log.jsonl",
+    batch_size: int = 64,
+    flush_interval: float = 1.0,
+    durability: str = "flush",
+):
+    """Turn logger for `format`: jsonl, parquet or csv (the legacy, blocking
+    `TurnLogger`)."""
+    if format == "csv":
+        from shared.logger import TurnLogger
+
+        return TurnLogger(path)
+    if format == "jsonl":
+        sink: TurnSink = JsonlTurnSink(path, durability)
+    elif format == "parquet":
+        sink = ParquetTurnSink(path, durability)
+    else:
+        raise ValueError(f"Unknown turn log format: {format}")
+    return BufferedTurnLogger(sink, batch_size=batch_size, flush_interval=flush_interval)
@@ -0,0 +1,205 @@
+"""Question level answer cache in front of `SqlAgent.arun`.
+
+A repeated question skips schema linking, the strategies and the merger,
+the cached final SQL is re-executed when its result is older than the
+data TTL. Entries are partitioned by tenant and schema fingerprint, so a
+schema change never serves SQL written for the old schema.
+"""
+
+import re
+import threading
+import time
+import unicodedata
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from shared.cache import LRUCache
+from sql_qa.schema.retrieval import Embedder, get_embedder
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]", re.UNICODE)
+_SPACE_RE = re.compile(r"\s+")
+
+DEFAULT_TENANT = "default"
+
+
+def normalize_question(question: str) -> str:
+    """Case, punctuation and whitespace insensitive form of a question.
+
+    Diacritics are kept, in Vietnamese they change the meaning of a word.
+    """
+    text = unicodedata.normalize("NFC", question).lower()
+    text = _PUNCTUATION_RE.sub(" ", text)
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+class CachedAnswer(NamedTuple):
+    question: str
+    final_sql: str
+    final_result: str
+    candidate_generation: Optional[List[Any]]
+    # clock time of the last execution of `final_sql`
+    executed_at: float
+
+
+class AnswerCache:
+    """LRU cache of successful answers keyed by (tenant, schema, question).
+
+    Lookups match the normalized question first. With an `embedder`, a
+    question whose embedding is at least `similarity_threshold` similar to a
+    cached one in the same partition also matches.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: Optional[float] = None,
+        data_ttl: Optional[float] = 300.0,
+        embedder: Optional[Embedder] = None,
+        similarity_threshold: float = 0.92,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.data_ttl = data_ttl
+        self.embedder = embedder
+        self.similarity_threshold = similarity_threshold
+        self._clock = clock
+        self._entries = LRUCache(max_entries=max_entries, ttl=ttl, clock=clock)
+        self._lock = threading.Lock()
+        # (tenant, schema) -> key -> unit vector of the cached question
+        self._vectors: Dict[Tuple[str, str], Dict[Hashable, np.ndarray]] = {}
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    @classmethod
+    def from_config(cls, cache_config) -> "AnswerCache":
+        from sql_qa.config import as_bool
+
+        embedder = None
+        semantic = cache_config.get("semantic") or {}
+        if as_bool(semantic.get("enabled", False)):
+            embedder = get_embedder(semantic)
+        ttl = cache_config.get("ttl")
+        data_ttl = cache_config.get("data_ttl")
+        return cls(
+            max_entries=int(cache_config.get("max_entries", 1024)),
+            ttl=float(ttl) if ttl else None,
+            data_ttl=float(data_ttl) if data_ttl else None,
+            embedder=embedder,
+            similarity_threshold=float(semantic.get("threshold", 0.92)),
+        )
+
+    def _embed(self, question: str) -> np.ndarray:
+        vector = np.asarray(self.embedder.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _semantic_lookup(
+        self, partition: Tuple[str, str], question: str
+    ) -> Optional[Hashable]:
+        with self._lock:
+            vectors = self._vectors.get(partition)
+            if not vectors:
+                return None
+            # forget vectors of evicted or expired entries
+            for key in [k for k in vectors if k not in self._entries]:
+                del vectors[key]
+            if not vectors:
+                return None
+            keys = list(vectors)
+            matrix = np.stack([vectors[k] for k in keys])
+        similarities = matrix @ self._embed(question)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None
+        return keys[best]
+
+    def lookup(
+        self, question: str, tenant: str, schema_key: str
+    ) -> Optional[Tuple[CachedAnswer, str]]:
+        """`(answer, "exact" | "semantic")` or None on a miss."""
+        key = (tenant, schema_key, normalize_question(question))
+        entry = self._entries.get(key)
+        kind = "exact"
+        if entry is None and self.embedder is not None:
+            similar = self._semantic_lookup((tenant, schema_key), question)
+            if similar is not None:
+                entry = self._entries.get(similar)
+                kind = "semantic"
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            if kind == "exact":
+                self.exact_hits += 1
+            else:
+                self.semantic_hits += 1
+        return entry, kind
+
+    def store(
+        self,
+        question: str,
+        tenant: str,
+        schema_key: str,
+        final_sql: str,
+        final_result: str,
+        candidate_generation: Optional[List[Any]] = None,
+    ) -> CachedAnswer:
+        key = (tenant, schema_key, normalize_question(question))
+        entry = CachedAnswer(
+            question, final_sql, final_result, candidate_generation, self._clock()
+        )
+        self._entries.set(key, entry, namespace=tenant)
+        if self.embedder is not None:
+            vector = self._embed(question)
+            with self._lock:
+                self._vectors.setdefault((tenant, schema_key), {})[key] = vector
+        return entry
+
+    def is_stale(self, entry: CachedAnswer) -> bool:
+        """Whether the cached result is older than the data TTL."""
+        return (
+            self.data_ttl is not None
+            and self._clock() - entry.executed_at >= self.data_ttl
+        )
+
+    def refresh(
+        self, entry: CachedAnswer, tenant: str, schema_key: str, final_result: str
+    ) -> CachedAnswer:
+        """Store the re-executed result of a stale `entry`."""
+        with self._lock:
+            self.refreshes += 1
+        key = (tenant, schema_key, normalize_question(entry.question))
+        refreshed = entry._replace(
+            final_result=final_result, executed_at=self._clock()
+        )
+        self._entries.set(key, refreshed, namespace=tenant)
+        return refreshed
+
+    def discard(self, entry: CachedAnswer, tenant: str, schema_key: str):
+        self._entries.pop((tenant, schema_key, normalize_question(entry.question)))
+
+    def invalidate(self, tenant: Optional[str] = None) -> int:
+        """Drop the answers of `tenant`, or of every tenant."""
+        with self._lock:
+            for partition in list(self._vectors):
+                if tenant is None or partition[0] == tenant:
+                    del self._vectors[partition]
+        return self._entries.invalidate(tenant)
+
+    def stats(self) -> Dict[str, Any]:
+        entries = self._entries.stats()
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            lookups = hits + self.misses
+            return {
+                "entries": entries["entries"],
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "refreshes": self.refreshes,
+                "evictions": entries["evictions"],
+                "expirations": entries["expirations"],
+            }
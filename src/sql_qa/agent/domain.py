@@ -29,7 +29,6 @@ from sql_qa.prompt.constant import DomainConstant
 from sql_qa.prompt.template import Role
 
 type TQuestionDomain = Literal["accountant"]
-app_config = get_app_config()
 
 
 class QUESTION_PROC_NODE(NamedTuple):
@@ -72,18 +71,18 @@ class QuestionDomainAgent(AgentBase):
         logger.info(f"Agent tools: {agent_tools}")
         self.domain_agents: Dict[str, CompiledGraph] = {
             k: create_react_agent(
-                app_config.question_proc.model,
+                get_app_config().question_proc.model,
                 tools=agent_tools,
                 prompt=DomainConstant.domain_system_prompt.format(
                     domain=k, knowledge=get_domain_knowledge(f["knowledge_file"])
                 ),
             )
-            for k, f in app_config.question_proc.domains.items()
+            for k, f in get_app_config().question_proc.domains.items()
         }
         # get_react_agent(app_config.question_proc.model)
         self.domain_knowledge: Dict[str, str] = {
             k: get_domain_knowledge(f["knowledge_file"])
-            for k, f in app_config.question_proc.domains.items()
+            for k, f in get_app_config().question_proc.domains.items()
         }
 
         graph_builder = StateGraph(QuestionDomainAgentState)
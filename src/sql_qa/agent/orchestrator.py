@@ -1,4 +1,5 @@
 import asyncio
+import functools
 from typing import (
     Annotated,
     Any,
@@ -11,7 +12,6 @@ from typing import (
 )
 
 
-from langchain.chat_models import init_chat_model
 from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, RemoveMessage
 from langchain_core.tools import tool
 from langchain_mcp_adapters.tools import load_mcp_tools
@@ -31,6 +31,8 @@ from sql_qa.agent.domain import (
     get_domain_knowledge,
 )
 from sql_qa.llm.adapter import get_react_agent
+from sql_qa.llm.limiter import rate_limited
+from sql_qa.llm.registry import get_chat_model
 from sql_qa.prompt.constant import DomainConstant
 from sql_qa.prompt.template import Role
 from langgraph.checkpoint.memory import InMemorySaver
@@ -40,12 +42,6 @@ from langgraph.graph import END, START, StateGraph
 
 from sql_qa.config import get_app_config
 
-app_config = get_app_config()
-mcp_servers = app_config.mcp_servers
-mcp_servers_dict = {s.server_name: s for s in mcp_servers}
-
-logger.info(f"MCP servers: {mcp_servers_dict}")
-
 
 class OrchestratorState(QuestionDomainAgentState, SwarmState):
     # messages: Annotated[List[AnyMessage], operator.add]
@@ -79,7 +75,12 @@ class OrchestratorGraph:
     # }
 
 
-mcp_client = MultiServerMCPClient(mcp_servers_dict)
+@functools.lru_cache(maxsize=None)
+def get_mcp_client() -> MultiServerMCPClient:
+    """Client of the configured `mcp_servers`, created on first use."""
+    mcp_servers_dict = {s.server_name: s for s in get_app_config().mcp_servers}
+    logger.info(f"MCP servers: {mcp_servers_dict}")
+    return MultiServerMCPClient(mcp_servers_dict)
 
 
 async def main_langchain():
@@ -129,15 +130,15 @@ def domain_post_hook(state: OrchestratorState) -> OrchestratorState:
         logger.warning("No AI message containing user question found!")
         return update
 
-    summary_model = init_chat_model(app_config.question_proc.model)
-    summarizer_resp = summary_model.invoke(
-        [
-            *state["messages"][:-1],
-            HumanMessage(
-                content="Dựa trên lịch sử cuộc trò chuyện, tổng hợp lại thành câu hỏi trên vai của tôi để hỏi AI. Lưu ý chỉ trả về câu hỏi, không giải thích hay chú thích gì thêm."
-            ),
-        ]
-    )
+    summary_model = get_chat_model(get_app_config().question_proc.model)
+    summary_messages = [
+        *state["messages"][:-1],
+        HumanMessage(
+            content="Dựa trên lịch sử cuộc trò chuyện, tổng hợp lại thành câu hỏi trên vai của tôi để hỏi AI. Lưu ý chỉ trả về câu hỏi, không giải thích hay chú thích gì thêm."
+        ),
+    ]
+    with rate_limited(get_app_config().question_proc.model, summary_messages):
+        summarizer_resp = summary_model.invoke(summary_messages)
     update.update(
         {
             "messages": [
@@ -155,15 +156,15 @@ def domain_post_hook(state: OrchestratorState) -> OrchestratorState:
 
 def sql_pre_hook(state: OrchestratorState) -> OrchestratorState:
     update: OrchestratorState = {}
-    summary_model = init_chat_model(app_config.question_proc.model)
-    summarier_response = summary_model.invoke(
-        [
-            *state["messages"],
-            HumanMessage(
-                content="Dựa trên lịch sử cuộc trò chuyện, tổng hợp lại thành câu hỏi trên vai của tôi để hỏi AI. Lưu ý chỉ trả về câu hỏi, không giải thích hay chú thích gì thêm."
-            ),
-        ]
-    )
+    summary_model = get_chat_model(get_app_config().question_proc.model)
+    summary_messages = [
+        *state["messages"],
+        HumanMessage(
+            content="Dựa trên lịch sử cuộc trò chuyện, tổng hợp lại thành câu hỏi trên vai của tôi để hỏi AI. Lưu ý chỉ trả về câu hỏi, không giải thích hay chú thích gì thêm."
+        ),
+    ]
+    with rate_limited(get_app_config().question_proc.model, summary_messages):
+        summarier_response = summary_model.invoke(summary_messages)
     logger.info(f"sql summary pre-hook: {summarier_response.content}")
     update.update(
         {
@@ -177,11 +178,12 @@ def sql_pre_hook(state: OrchestratorState) -> OrchestratorState:
 
 
 async def get_orchestrator_executor(checkpointer=None) -> CompiledGraph:
+    app_config = get_app_config()
 
     domain_conf = app_config.question_proc.domains.accountant
 
     domain_agent = create_react_agent(
-        model=app_config.question_proc.model,
+        model=get_chat_model(app_config.question_proc.model),
         tools=[
             get_current_date,
             get_current_time,
@@ -213,7 +215,7 @@ async def get_orchestrator_executor(checkpointer=None) -> CompiledGraph:
     # ).graph
 
 
-    async with mcp_client.session("mcp-server-text2sql") as session:
+    async with get_mcp_client().session("mcp-server-text2sql") as session:
         mcp_tools = await load_mcp_tools(session)
 
     logger.info(f"MCP tools: {mcp_tools}")
@@ -222,7 +224,7 @@ async def get_orchestrator_executor(checkpointer=None) -> CompiledGraph:
 
     sql_generation_agent = create_react_agent(
         name="orchestrator_agent",
-        model=app_config.orchestrator.model,
+        model=get_chat_model(app_config.orchestrator.model),
         tools=[*sql_tools, create_handoff_tool(agent_name="domain_agent")],
         prompt="""
         - Bạn là chuyên gia sử dụng công cụ để thực hiện tác vụ truy vấn dữ liệu. Nhiệm vụ của bạn là sử dụng sử dụng công cụ để trả lời câu hỏi của người dùng
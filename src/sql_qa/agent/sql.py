@@ -1,29 +1,33 @@
-from typing import Literal, Optional, Tuple, NamedTuple, cast
-from typing import List, Literal, Optional, NamedTuple, TypedDict
+from typing import Dict, Literal, NamedTuple, Optional, cast
 from langgraph.graph import END, START, StateGraph
 from langgraph.graph.graph import CompiledGraph
 from langgraph.graph.state import CompiledStateGraph
 from langgraph.types import Command
-from shared.db import get_db
+from shared.db import aexecute_query, get_db, get_engine
 from shared.logger import logger
-from sql_qa.config import turn_logger
+from shared.tracing import add as trace_add, traced
+from sql_qa.agent.cache import DEFAULT_TENANT, AnswerCache
+from sql_qa.config import as_bool, turn_logger
 from sql_qa.llm.strategy import StrategyFactory
 from sql_qa.llm.type import (
-    CandidateGenState,
+    SqlAgentState,
     SqlLinkingTablesResponse,
     StrategyState,
 )
+from sql_qa.prompt.budget import budget_limit, prompt_budget, summarize_rows
 from sql_qa.prompt.constant import CommonConstant, Text2SqlConstant
 from sql_qa.prompt.template import Role
 from sql_qa.llm.adapter import get_react_agent
+from sql_qa.schema.manager import SchemaManager, SchemaVersion
+from sql_qa.schema.retrieval import SchemaRetriever
 from sql_qa.schema.store import Schema, SchemaStore
+import contextvars
 import json
 
-
-from sql_qa.llm.type import (
-    SqlLinkingTablesResponse,
-    SQLGenerationResponse,
-    CandidateGenState,
+# SchemaVersion pinned for the running turn, kept out of the graph state so
+# the returned (logged, served) state does not carry the whole schema
+_turn_schema: contextvars.ContextVar[Optional[SchemaVersion]] = contextvars.ContextVar(
+    "turn_schema", default=None
 )
 
 
@@ -34,17 +38,6 @@ class SQL_AGENT_NODE(NamedTuple):
     response_enhancement = "response_enhancement_node"
 
 
-class SqlAgentState(SqlLinkingTablesResponse, SQLGenerationResponse):
-    user_question: str
-    is_success: bool
-    final_sql: str
-    final_result: str
-    error: str
-    raw_result: str
-    candidate_generation: Optional[List[CandidateGenState]]
-    # schema_linking: List[Any]
-
-
 class SqlAgent:
     def __init__(self, app_config, chat_config: dict = {}):
         self.app_config = app_config
@@ -80,13 +73,54 @@ class SqlAgent:
         )
 
         # sql_generator = LLMGeneration(chat_config)
-        schema = Schema.load(self.app_config.schema_path)
         self.strategy = StrategyFactory()
-        self.schema_store = SchemaStore()
-        self.schema_store.add_schema(schema)
+        self.schema_manager = self._init_schema_manager()
+        self.answer_cache = self._init_answer_cache()
 
         self.graph: CompiledGraph = self._build_graph()
 
+    def _init_schema_manager(self) -> SchemaManager:
+        retrieval_config = self.app_config.get("schema_retrieval")
+        retriever_factory = None
+        if retrieval_config and as_bool(retrieval_config.enabled):
+
+            def retriever_factory(schema: Schema, store: SchemaStore):
+                return SchemaRetriever.from_config(
+                    schema, retrieval_config, store.get_index(schema.name)
+                )
+
+        reload_config = self.app_config.get("schema_reload") or {}
+        manager_kwargs = dict(
+            interval=float(reload_config.get("interval", 30)),
+            retriever_factory=retriever_factory,
+        )
+        if self.app_config.get("schema_source", "file") == "database":
+            manager = SchemaManager.from_database(get_engine(), **manager_kwargs)
+        else:
+            manager = SchemaManager.from_path(
+                self.app_config.schema_path, **manager_kwargs
+            )
+        if as_bool(reload_config.get("enabled", False)):
+            manager.start()
+        return manager
+
+    def _init_answer_cache(self) -> Optional[AnswerCache]:
+        cache_config = self.app_config.get("answer_cache")
+        if not cache_config or not as_bool(cache_config.enabled):
+            return None
+        return AnswerCache.from_config(cache_config)
+
+    @property
+    def schema_store(self) -> SchemaStore:
+        return self.schema_manager.current.store
+
+    @property
+    def schema_retriever(self) -> Optional[SchemaRetriever]:
+        return self.schema_manager.current.retriever
+
+    def _schema_version(self) -> SchemaVersion:
+        return _turn_schema.get() or self.schema_manager.current
+
     def _build_graph(self) -> CompiledStateGraph:
         graph_builder = StateGraph(SqlAgentState)
         graph_builder.add_node(SQL_AGENT_NODE.schema_linking, self.link_schema)
@@ -114,10 +148,39 @@ class SqlAgent:
 
         return graph_builder.compile()
 
+    def _render_schema(
+        self,
+        schema_version: SchemaVersion,
+        schemas: Dict[str, Schema],
+        question: Optional[str] = None,
+    ) -> str:
+        return schema_version.store.render(
+            schemas,
+            self.app_config.schema_linking.get("render_format", "mschema"),
+            max_tokens=budget_limit("schema_tokens"),
+            question=question,
+        )
+
+    def _linking_schema(
+        self, schema_version: SchemaVersion, user_question: str
+    ) -> Schema:
+        """Schema shown to the table linking prompt, narrowed by the vector
+        pre-filter when it is enabled."""
+        schema = schema_version.schema
+        if schema_version.retriever is None:
+            return schema
+        top_k = int(self.app_config.schema_retrieval.top_k)
+        schema = schema_version.retriever.filter_schema(user_question, top_k)
+        logger.info(f"Schema retrieval candidates: {[t.name for t in schema.tables]}")
+        return schema
+
+    @traced("link_schema")
     async def link_schema(
         self, state: SqlAgentState
     ) -> Command[Literal[END, SQL_AGENT_NODE.filtered_schema_tables]]:
         user_question = state["user_question"]
+        schema_version = self._schema_version()
+        linking_schema = self._linking_schema(schema_version, user_question)
         linking_response = await self.schema_linking_adapter.ainvoke(
             {
                 "messages": [
@@ -125,9 +188,11 @@ class SqlAgent:
                         "role": Role.USER,
                         "content": Text2SqlConstant.table_linking.format(
                             question=user_question,
-                            schema=list(self.schema_store.schemas.values())[
-                                0
-                            ].model_dump(mode="json"),
+                            schema=self._render_schema(
+                                schema_version,
+                                {linking_schema.name: linking_schema},
+                                user_question,
+                            ),
                         ),
                     }
                 ]
@@ -168,12 +233,18 @@ class SqlAgent:
             update=SqlAgentState(tables=table_names),
         )
 
+    @traced("filtered_schema_tables")
     def filtered_schema_tables(
         self, state: SqlAgentState
     ) -> Literal[SQL_AGENT_NODE.generation]:
         table_names = state["tables"]
-        filtered_schema_tables = self.schema_store.search_tables(
-            table_names, mode="same", include_foreign_keys=True
+        linking_config = self.app_config.schema_linking
+        schema_store = self._schema_version().store
+        filtered_schema_tables = schema_store.search_tables(
+            table_names,
+            mode=linking_config.get("search_mode", "same"),
+            include_foreign_keys=True,
+            max_hops=int(linking_config.get("max_hops", 3)),
         )
         logger.info(
             f"filtered_schema_tables: {[t.name for s in filtered_schema_tables.values() for t in s.tables if s]}"
@@ -194,6 +265,7 @@ class SqlAgent:
         update["schema_linking"] = filtered_schema_tables
         return update
 
+    @traced("generation")
     async def generation(self, state: SqlAgentState) -> Literal[END]:
         filtered_schema_tables = state["schema_linking"]
         user_question = state["user_question"]
@@ -201,7 +273,9 @@ class SqlAgent:
         strategy_graph = strategy.graph
         strategy_payload: StrategyState = {}
         strategy_payload["user_question"] = user_question
-        strategy_payload["schema"] = filtered_schema_tables
+        strategy_payload["schema"] = self._render_schema(
+            self._schema_version(), filtered_schema_tables, user_question
+        )
 
         strategy_results = await strategy_graph.ainvoke(strategy_payload)
         strategy_results = cast(StrategyState, strategy_results)
@@ -255,6 +329,7 @@ class SqlAgent:
             sql_result = generation["execution_result"]
 
             response_enhancement_prompt = Text2SqlConstant.response_enhancement.format(
+                budget=prompt_budget("result_tokens", {"result": summarize_rows}),
                 question=user_question,
                 sql_query=sql,
                 result=sql_result if sql_result else CommonConstant.empty_return_value,
@@ -300,12 +375,90 @@ class SqlAgent:
         #     raw_result=sql_result,
         # )
 
-    async def arun(self, user_question: str) -> SqlAgentState:
+    @staticmethod
+    def _answer_cache_key(schema_version: SchemaVersion) -> str:
+        return schema_version.store.get_index(schema_version.schema.name).fingerprint
+
+    @staticmethod
+    def _answer_executed(response: SqlAgentState) -> bool:
+        """Whether the final SQL of `response` ran, only those are cached.
+
+        `generation` reports success whenever a strategy produced SQL, the
+        last candidate tells whether that SQL (e.g. a merged one) executed.
+        """
+        candidates = response.get("candidate_generation")
+        if not (
+            response.get("is_success") and response.get("final_sql") and candidates
+        ):
+            return False
+        final = candidates[-1]
+        return bool(final.get("is_success") and final.get("is_valid", True))
+
+    @traced("answer_cache")
+    async def _cached_answer(
+        self, user_question: str, tenant: str, schema_version: SchemaVersion
+    ) -> Optional[SqlAgentState]:
+        schema_key = self._answer_cache_key(schema_version)
+        hit = self.answer_cache.lookup(user_question, tenant, schema_key)
+        if hit is None:
+            return None
+        entry, kind = hit
+        if self.answer_cache.is_stale(entry):
+            query_result = await aexecute_query(
+                self.db, entry.final_sql, use_cache=False
+            )
+            if not query_result.is_success:
+                logger.warning(
+                    f"Cached SQL failed on re-execution, regenerating: {query_result.error}"
+                )
+                self.answer_cache.discard(entry, tenant, schema_key)
+                return None
+            entry = self.answer_cache.refresh(
+                entry, tenant, schema_key, query_result.to_text()
+            )
+        logger.info(f"Answer cache {kind} hit: {entry.question}")
+        trace_add("answer_cache_hits")
+        turn_logger.log("answer_cache", {"kind": kind, "question": entry.question})
+        return SqlAgentState(
+            user_question=user_question,
+            is_success=True,
+            error="",
+            final_sql=entry.final_sql,
+            final_result=entry.final_result,
+            candidate_generation=entry.candidate_generation,
+            answer_cache=kind,
+        )
+
+    @traced("turn")
+    async def arun(self, user_question: str, use_cache: bool = True) -> SqlAgentState:
+        tenant = DEFAULT_TENANT
+        schema_version = self.schema_manager.current
+        use_cache = use_cache and self.answer_cache is not None
+        if use_cache:
+            cached = await self._cached_answer(user_question, tenant, schema_version)
+            if cached is not None:
+                turn_logger.log("final_state", cached)
+                return cached
+
         payload: SqlAgentState = {}
         payload["user_question"] = user_question
-        response = await self.graph.ainvoke(payload)
+        token = _turn_schema.set(schema_version)
+        try:
+            response = await self.graph.ainvoke(payload)
+        finally:
+            _turn_schema.reset(token)
         response = cast(SqlAgentState, response)
 
+        if use_cache and self._answer_executed(response):
+            self.answer_cache.store(
+                user_question,
+                tenant,
+                self._answer_cache_key(schema_version),
+                response["final_sql"],
+                response.get("final_result", ""),
+                response.get("candidate_generation"),
+            )
+
         # logger.info(f"final_state: {response}")
         turn_logger.log("final_state", response)
         return response
@@ -1,37 +1,131 @@
+"""Application config, composed by Hydra from `conf/config.yaml`.
+
+Nothing is done at import: the config is composed on the first
+`get_app_config()` call, the turn logger is created on first use, so
+importing a module costs only its imports.
+"""
+
 import os
-from dotenv import load_dotenv
-from shared.logger import TurnLogger
 import pathlib
+import threading
 
-import os
-from hydra import initialize_config_dir, compose
-from omegaconf import OmegaConf
-from hydra.core.global_hydra import GlobalHydra
+_lock = threading.Lock()
+_settings = None
+_turn_logger = None
 
-load_dotenv(override=True)
 
-GlobalHydra.instance().clear()
-OmegaConf.clear_resolvers()
+def _load_app_config():
+    from dotenv import load_dotenv
+    from hydra import compose, initialize_config_dir
+    from hydra.core.global_hydra import GlobalHydra
+    from omegaconf import OmegaConf
 
-abs_config_dir = str(pathlib.Path(__file__).parent.parent.parent / "conf")
-initialize_config_dir(version_base=None, config_dir=abs_config_dir)
+    load_dotenv(override=True)
 
-# Register a custom resolver for environment variables
-OmegaConf.register_new_resolver(
-    "env", lambda *args: os.environ.get(args[0], args[-1] or "")
-)
+    GlobalHydra.instance().clear()
+    OmegaConf.clear_resolvers()
 
-settings = compose(config_name="config")
-settings = OmegaConf.create(OmegaConf.to_yaml(cfg=settings, resolve=True))
+    abs_config_dir = str(pathlib.Path(__file__).parent.parent.parent / "conf")
+    initialize_config_dir(version_base=None, config_dir=abs_config_dir)
 
-if not os.path.exists(settings.logging.log_dir):
-    os.makedirs(settings.logging.log_dir)
+    # Register a custom resolver for environment variables
+    OmegaConf.register_new_resolver(
+        "env", lambda *args: os.environ.get(args[0], args[-1] or "")
+    )
 
-turn_logger = TurnLogger(settings.turn_log_file)
+    settings = compose(config_name="config")
+    settings = OmegaConf.create(OmegaConf.to_yaml(cfg=settings, resolve=True))
 
-if __name__ == "__main__":
-    print(settings.model_dump_json(indent=2))
+    if not os.path.exists(settings.logging.log_dir):
+        os.makedirs(settings.logging.log_dir)
+    setup_tracing(settings)
+    return settings
 
 
 def get_app_config():
-    return settings
+    """The app config, composed on the first call."""
+    global _settings
+    if _settings is None:
+        # composing is not thread-safe (Hydra and OmegaConf globals)
+        with _lock:
+            if _settings is None:
+                _settings = _load_app_config()
+    return _settings
+
+
+def get_turn_logger():
+    """The process-wide turn logger, created on the first call."""
+    global _turn_logger
+    if _turn_logger is None:
+        from shared.turn_log import create_turn_logger
+
+        settings = get_app_config()
+        with _lock:
+            if _turn_logger is None:
+                _turn_logger = create_turn_logger(
+                    format=settings.turn_log.format,
+                    path=settings.turn_log.path,
+                    batch_size=int(settings.turn_log.batch_size),
+                    flush_interval=float(settings.turn_log.flush_interval),
+                    durability=settings.turn_log.durability,
+                )
+    return _turn_logger
+
+
+class _LazyTurnLogger:
+    """Stands for `get_turn_logger()`, so modules can import `turn_logger`
+    and decorate functions with it without creating it."""
+
+    def __getattr__(self, name):
+        return getattr(get_turn_logger(), name)
+
+    def __enter__(self):
+        return get_turn_logger().__enter__()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return get_turn_logger().__exit__(exc_type, exc_val, exc_tb)
+
+
+turn_logger = _LazyTurnLogger()
+
+
+def __getattr__(name):
+    # `settings` used to be composed at import
+    if name == "settings":
+        return get_app_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def as_bool(value) -> bool:
+    """Config flag as bool, `${env:...}` values arrive as strings."""
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+def setup_tracing(settings=None):
+    from shared import tracing
+
+    settings = settings if settings is not None else get_app_config()
+    tracing_config = settings.get("tracing") or {}
+    if not as_bool(tracing_config.get("enabled", False)):
+        return
+    exporter = tracing_config.get("exporter") or "jsonl"
+    if exporter == "jsonl":
+        tracing.configure([tracing.JsonlSpanExporter(tracing_config.path)])
+    elif exporter == "otlp":
+        tracing.configure(
+            [
+                tracing.OtlpSpanExporter(
+                    tracing_config.otlp_endpoint, tracing_config.service_name
+                )
+            ]
+        )
+    else:
+        raise ValueError(f"Unknown span exporter: {exporter}")
+
+
+if __name__ == "__main__":
+    from omegaconf import OmegaConf
+
+    print(OmegaConf.to_yaml(get_app_config()))
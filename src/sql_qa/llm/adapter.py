@@ -16,7 +16,6 @@ from langgraph.graph.graph import CompiledGraph
 from langchain_core.language_models import BaseChatModel, LanguageModelLike
 from langchain_core.runnables.base import RunnableLike
 from langchain_core.tools import BaseTool
-from langchain_huggingface.llms.huggingface_pipeline import DEFAULT_BATCH_SIZE
 from langgraph.prebuilt import ToolNode, create_react_agent
 from langgraph.prebuilt.chat_agent_executor import (
     Prompt,
@@ -25,17 +24,33 @@ from langgraph.prebuilt.chat_agent_executor import (
 )
 from langgraph.store.base import BaseStore
 from langgraph.types import Checkpointer
-import tenacity
 
+from sql_qa.config import get_app_config
 from sql_qa.llm.base import InvokableBase
-from sql_qa.llm.util import on_llm_retry_fail
-
-from shared.logger import logger
+from sql_qa.llm.limiter import get_limiter
+from sql_qa.llm.registry import get_chat_model
+from sql_qa.llm.resilience import ResilientCaller, ResiliencePolicy
+from sql_qa.llm.response_cache import cache_agent_calls
 
 
 API_MODELS = ["gemini", "openai", "anthropic", "mistral"]
 
 
+def model_name(model: Union[str, LanguageModelLike]) -> str:
+    """Key used for the per-model latency and circuit breaker state."""
+    if isinstance(model, str):
+        return model
+    for attr in ("model_name", "model", "model_id"):
+        value = getattr(model, attr, None)
+        if isinstance(value, str):
+            return value
+    return type(model).__name__
+
+
+def _resilience_policy() -> ResiliencePolicy:
+    return ResiliencePolicy.from_config(get_app_config().get("llm_resilience"))
+
+
 class BaseAdapter(InvokableBase, ABC):
     @abstractmethod
     def __init__(
@@ -102,28 +117,15 @@ class ApiAdapter(BaseAdapter):
             version=self.version,
             name=self.name,
         )
+        self._caller = ResilientCaller(
+            model_name(self.model), _resilience_policy(), limiter_for=get_limiter
+        )
 
     def stream(self, *args: Any, **kwargs: Any) -> Any:
         return self.agent_executor.stream(*args, **kwargs)
 
-    @tenacity.retry(
-        stop=tenacity.stop_after_attempt(7),
-        wait=tenacity.wait_exponential(multiplier=1, min=7, max=60),
-        retry=tenacity.retry_if_exception_type(Exception),
-        reraise=True,
-        retry_error_callback=on_llm_retry_fail,
-        before_sleep=lambda retry_state: (
-            logger.warning(
-                f"Retry attempt {retry_state.attempt_number} due to error: {retry_state.outcome.exception()}"
-            )
-            if retry_state.outcome
-            else logger.warning(
-                f"Retry attempt {retry_state.attempt_number} due to unknown error"
-            )
-        ),
-    )
     def invoke(self, *args, **kwargs: Any) -> Any:
-        return self.agent_executor.invoke(*args, **kwargs)
+        return self._caller.wrap_sync(self.agent_executor.invoke)(*args, **kwargs)
 
 
 class HuggingFaceAdapter(BaseAdapter):
@@ -135,7 +137,7 @@ class HuggingFaceAdapter(BaseAdapter):
         device_map: Optional[str] = None,
         model_kwargs: Optional[dict] = None,
         pipeline_kwargs: Optional[dict] = None,
-        batch_size: int = DEFAULT_BATCH_SIZE,
+        batch_size: Optional[int] = None,
         **kwargs,
     ):
         super().__init__(**kwargs)
@@ -147,8 +149,11 @@ class HuggingFaceAdapter(BaseAdapter):
             "device_map": device_map,
             "model_kwargs": model_kwargs,
             "pipeline_kwargs": pipeline_kwargs,
-            "batch_size": batch_size,
         }
+        # langchain_huggingface's default otherwise, it is only imported
+        # when the pipeline is built
+        if batch_size is not None:
+            self.pipeline_config["batch_size"] = batch_size
 
     def _init_agent_executor(self):
         from langchain_huggingface import ChatHuggingFace, HuggingFacePipeline
@@ -177,24 +182,6 @@ class HuggingFaceAdapter(BaseAdapter):
         return self.agent_executor.invoke(*args, **kwargs)
 
 
-_retry_wrapper = tenacity.retry(
-    stop=tenacity.stop_after_attempt(1),
-    wait=tenacity.wait_exponential(multiplier=1, min=7, max=60),
-    retry=tenacity.retry_if_exception_type(Exception),
-    reraise=True,
-    retry_error_callback=on_llm_retry_fail,
-    before_sleep=lambda retry_state: (
-        logger.warning(
-            f"Retry attempt {retry_state.attempt_number} due to error: {retry_state.outcome.exception()}"
-        )
-        if retry_state.outcome
-        else logger.warning(
-            f"Retry attempt {retry_state.attempt_number} due to unknown error"
-        )
-    ),
-)
-
-
 def get_react_agent(
     model: Union[str, LanguageModelLike],
     tools: Union[Sequence[Union[BaseTool, Callable]], ToolNode] = [],
@@ -218,6 +205,67 @@ def get_react_agent(
     debug: bool = False,
     version: Literal["v1", "v2"] = "v2",
     name: Optional[str] = None,
+) -> CompiledGraph:
+    """ReAct agent whose `invoke`/`ainvoke` go through a `ResilientCaller`:
+    per-call timeout, jittered retries, a per-model circuit breaker and a
+    hedged request once the model's p95 latency has passed. Calls share the
+    model's rate limiter (`sql_qa.llm.limiter`). Failed calls return None.
+    Responses are served from `sql_qa.llm.response_cache` when enabled."""
+    kwargs = dict(
+        prompt=prompt,
+        response_format=response_format,
+        pre_model_hook=pre_model_hook,
+        post_model_hook=post_model_hook,
+        state_schema=state_schema,
+        config_schema=config_schema,
+        checkpointer=checkpointer,
+        store=store,
+        interrupt_before=interrupt_before,
+        interrupt_after=interrupt_after,
+        debug=debug,
+        version=version,
+        name=name,
+    )
+    agent_executor = _create_react_agent(model, tools, **kwargs)
+
+    policy = _resilience_policy()
+    primary = model_name(model)
+    fallback = None
+    if policy.fallback_model and policy.fallback_model != primary:
+        fallback_model = policy.fallback_model
+
+        def fallback():
+            return fallback_model, _create_react_agent(fallback_model, tools, **kwargs)
+
+    caller = ResilientCaller(primary, policy, fallback=fallback, limiter_for=get_limiter)
+    agent_executor.invoke = caller.wrap_sync(agent_executor.invoke)
+    agent_executor.ainvoke = caller.wrap_async(agent_executor.ainvoke)
+    return cache_agent_calls(
+        agent_executor,
+        primary,
+        prompt=prompt,
+        response_format=response_format,
+        temperature=getattr(model, "temperature", None),
+    )
+
+
+def _create_react_agent(
+    model: Union[str, LanguageModelLike],
+    tools: Union[Sequence[Union[BaseTool, Callable]], ToolNode],
+    *,
+    prompt: Optional[Prompt],
+    response_format,
+    pre_model_hook: Optional[RunnableLike],
+    post_model_hook: Optional[RunnableLike],
+    state_schema: Optional[StateSchemaType],
+    config_schema: Optional[Type[Any]],
+    checkpointer: Optional[Checkpointer],
+    store: Optional[BaseStore],
+    interrupt_before: Optional[list[str]],
+    interrupt_after: Optional[list[str]],
+    debug: bool,
+    version: Literal["v1", "v2"],
+    name: Optional[str],
 ) -> CompiledGraph:
     agent_executor: CompiledGraph
     if type(model) == str and not [m for m in API_MODELS if m in model]:
@@ -254,7 +302,7 @@ def get_react_agent(
         )
     else:
         agent_executor = create_react_agent(
-            model,
+            get_chat_model(model) if isinstance(model, str) else model,
             tools,
             prompt=prompt,
             response_format=response_format,
@@ -270,10 +318,6 @@ def get_react_agent(
             version=version,
             name=name,
         )
-
-    agent_executor.invoke = _retry_wrapper(agent_executor.invoke)
-    agent_executor.stream = _retry_wrapper(agent_executor.stream)
-    agent_executor.ainvoke = _retry_wrapper(agent_executor.ainvoke)
     return agent_executor
 
 
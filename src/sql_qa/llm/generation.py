@@ -1,10 +1,12 @@
-from typing import Literal, Union
+import asyncio
+from typing import Literal, Optional, Union
 from langgraph.graph import END, START, StateGraph
 from langgraph.graph.graph import CompiledGraph
 from langgraph.types import Command
-from shared.db import get_db, execute_sql
+from shared.db import get_db, aexecute_query
 from sql_qa.config import get_app_config
 from sql_qa.llm.adapter import get_react_agent
+from sql_qa.llm.prefix_cache import get_prefix_cache
 from sql_qa.llm.type import (
     GEN_GRAPH_NODE,
     CandidateGenState,
@@ -12,14 +14,13 @@ from sql_qa.llm.type import (
     SQLQueryFixerResponse,
     SQLQueryValidationResponse,
 )
+from sql_qa.prompt.budget import prompt_budget, summarize_rows, truncate_text
 from sql_qa.prompt.constant import Text2SqlConstant
 from shared.logger import logger
+from shared.tracing import traced
 from sql_qa.config import turn_logger
 
-from sql_qa.prompt.template import Role
-
-
-app_config = get_app_config()
+from sql_qa.prompt.template import PromptParts
 
 
 _MAX_GEN_TIME = 3
@@ -41,57 +42,105 @@ class LLMGeneration:
         self.prompt_type = prompt_type
         self.graph: CompiledGraph
 
-        # model: str = query_validation_kwargs.get("model")
+        # The system prompt is part of every call's shared prefix (see
+        # `_prompt`), so it is not baked into the adapters.
         self.query_validation_adapter = get_react_agent(
             tools=self.tools,
-            prompt=Text2SqlConstant.system.format(
-                dialect=app_config.database.dialect.upper()
-            ),
             response_format=SQLQueryValidationResponse,
             **query_validation_kwargs,
         )
 
-        # model: str = query_fixer_kwargs.get("model")
         self.query_fixer_adapter = get_react_agent(
             tools=self.tools,
-            prompt=Text2SqlConstant.system.format(
-                dialect=app_config.database.dialect.upper()
-            ),
             response_format=SQLQueryFixerResponse,
             **query_fixer_kwargs,
             # checkpointer=checkpointer,
         )
 
-        # model: str = generation_kwargs.get("model")
         self.generation_adapter = get_react_agent(
             tools=self.tools,
-            prompt=Text2SqlConstant.system.format(
-                dialect=app_config.database.dialect.upper()
-            ),
             response_format=SQLGenerationResponse,
             **generation_kwargs,
         )
+        self._adapter_models = {
+            GEN_GRAPH_NODE.validate: query_validation_kwargs.get("model"),
+            GEN_GRAPH_NODE.fix: query_fixer_kwargs.get("model"),
+            GEN_GRAPH_NODE.candidate: generation_kwargs.get("model"),
+        }
 
         self._build_graph()
 
     def _build_graph(self):
         graph_builder = StateGraph(CandidateGenState)
+
+        def traced_node(name, node):
+            # spans are named per strategy, e.g. cot_generation.fix
+            return traced(f"{self.prompt_type}.{name}", strategy=self.prompt_type)(
+                node
+            )
+
         graph_builder.add_node(GEN_GRAPH_NODE.init, self.init_state)
         graph_builder.add_node(GEN_GRAPH_NODE.route, self.route)
-        graph_builder.add_node(GEN_GRAPH_NODE.candidate, self.gen_candidate)
-        graph_builder.add_node(GEN_GRAPH_NODE.validate, self.validate_generation)
-        graph_builder.add_node(GEN_GRAPH_NODE.should_fix, self.should_fix)
-        graph_builder.add_node(GEN_GRAPH_NODE.fix, self.fix_query)
+        graph_builder.add_node(
+            GEN_GRAPH_NODE.candidate,
+            traced_node(GEN_GRAPH_NODE.candidate, self.agen_candidate),
+        )
+        graph_builder.add_node(
+            GEN_GRAPH_NODE.validate,
+            traced_node(GEN_GRAPH_NODE.validate, self.avalidate_generation),
+        )
+        graph_builder.add_node(
+            GEN_GRAPH_NODE.should_fix,
+            traced_node(GEN_GRAPH_NODE.should_fix, self.ashould_fix),
+        )
+        graph_builder.add_node(
+            GEN_GRAPH_NODE.fix, traced_node(GEN_GRAPH_NODE.fix, self.afix_query)
+        )
 
         graph_builder.add_edge(START, GEN_GRAPH_NODE.init)
         graph_builder.add_edge(GEN_GRAPH_NODE.init, GEN_GRAPH_NODE.route)
-        graph_builder.add_edge(GEN_GRAPH_NODE.route, GEN_GRAPH_NODE.candidate)
-        graph_builder.add_edge(GEN_GRAPH_NODE.candidate, GEN_GRAPH_NODE.validate)
-        graph_builder.add_edge(GEN_GRAPH_NODE.validate, GEN_GRAPH_NODE.should_fix)
-        graph_builder.add_edge(GEN_GRAPH_NODE.should_fix, END)
+        # route/candidate/validate/should_fix pick their successor via Command,
+        # static edges here would also fire and defeat the retry limit
 
         self.graph = graph_builder.compile()
 
+    @staticmethod
+    def _prompt(schema: str, suffix: str) -> PromptParts:
+        """Prompt whose prefix (system prompt + schema) is shared by every
+        node, retry and strategy of a turn."""
+        return PromptParts(
+            prefix=Text2SqlConstant.context.format(
+                dialect=get_app_config().database.dialect.upper(),
+                schema=schema,
+                examples="",
+            ),
+            suffix=suffix,
+        )
+
+    async def _ainvoke_adapter(
+        self, adapter, prompt: PromptParts, node: str
+    ) -> Optional[dict]:
+        """Invoke an adapter without blocking the event loop.
+
+        Provider errors are logged and reported as ``None`` so the node can
+        route back for another iteration; cancellation is always propagated.
+        """
+        model = str(self._adapter_models.get(node))
+        prefix_cache = get_prefix_cache(model)
+        try:
+            response = await adapter.ainvoke(
+                {"messages": prefix_cache.messages(model, prompt)},
+                config=self.chat_config,
+            )
+            prefix_cache.record_usage(response)
+            return response
+        except asyncio.CancelledError:
+            logger.info(f"{self.prompt_type} {node} cancelled")
+            raise
+        except Exception as e:
+            logger.error(f"{self.prompt_type} {node} invocation failed: {e}")
+            return None
+
     def init_state(self, state: CandidateGenState) -> CandidateGenState:
         return {
             "run_iter": 0,
@@ -99,6 +148,8 @@ class LLMGeneration:
             "logs": [],
             "is_sql_correct": False,
             "execution_result": "",
+            "execution_summary": "",
+            "execution_fingerprint": None,
             "sql": "",
             "user_question": state["user_question"],
             "schema": state["schema"],
@@ -133,7 +184,7 @@ class LLMGeneration:
         else:
             return Command(update=update, goto=GEN_GRAPH_NODE.candidate)
 
-    def gen_candidate(
+    async def agen_candidate(
         self, state: CandidateGenState
     ) -> Command[Literal["route", "validate"]]:
         user_question = state["user_question"]
@@ -149,26 +200,22 @@ class LLMGeneration:
                 "---"
             )
         prompt_template = getattr(Text2SqlConstant, self.prompt_type)
-        generation_prompt = prompt_template.format(
-            question=user_question,
-            evidence=gen_evidence,
-            schema=schema,
+        generation_prompt = self._prompt(
+            schema,
+            prompt_template.format(
+                budget=prompt_budget("suffix_tokens", {"evidence": truncate_text}),
+                dialect=get_app_config().database.dialect.upper(),
+                question=user_question,
+                evidence=gen_evidence,
+            ),
         )
         turn_logger.log(
             f"{self.prompt_type}_prompt",
             f"---retry--- \n" f" {generation_prompt}",
         )
         logger.info(f"Generation with strategy: {self.prompt_type}")
-        generation_response = self.generation_adapter.invoke(
-            {
-                "messages": [
-                    {
-                        "role": Role.USER,
-                        "content": generation_prompt,
-                    }
-                ]
-            },
-            config=self.chat_config,
+        generation_response = await self._ainvoke_adapter(
+            self.generation_adapter, generation_prompt, GEN_GRAPH_NODE.candidate
         )
         turn_logger.log(
             f"{self.prompt_type}_generation_response",
@@ -214,31 +261,34 @@ class LLMGeneration:
             },
         )
 
-    def validate_generation(
+    async def avalidate_generation(
         self, state: CandidateGenState
     ) -> Command[Literal["route", "should_fix"]]:
         user_question = state["user_question"]
         sql = state["sql"]
-        query_validation_prompt = Text2SqlConstant.query_validation.format(
-            question=user_question,
-            query=sql,
-            dialect=app_config.database.dialect.upper(),
+        dialect = get_app_config().database.dialect.upper()
+        validation_suffix = Text2SqlConstant.query_validation.format(
+            question=user_question, query=sql, dialect=dialect
         )
+        model = str(self._adapter_models.get(GEN_GRAPH_NODE.validate))
+        if get_prefix_cache(model).explicit:
+            query_validation_prompt = self._prompt(state["schema"], validation_suffix)
+        else:
+            # validation does not need the schema, it is only worth sending
+            # when the provider surely serves it from its cache
+            query_validation_prompt = PromptParts(
+                prefix=Text2SqlConstant.system.format(dialect=dialect),
+                suffix=validation_suffix,
+            )
         turn_logger.log(
             "query_validation_prompt",
             f"---retry--- \n" f" {query_validation_prompt}",
         )
 
-        query_validation_response = self.query_validation_adapter.invoke(
-            {
-                "messages": [
-                    {
-                        "role": Role.USER,
-                        "content": query_validation_prompt,
-                    }
-                ]
-            },
-            config=self.chat_config,
+        query_validation_response = await self._ainvoke_adapter(
+            self.query_validation_adapter,
+            query_validation_prompt,
+            GEN_GRAPH_NODE.validate,
         )
         turn_logger.log(
             "query_validation_response",
@@ -291,15 +341,18 @@ class LLMGeneration:
             },
         )
 
-    def should_fix(self, state: CandidateGenState) -> Command[Literal[END, "fix"]]:
-        execution_result, execution_result_is_sql_correct = execute_sql(
-            self.db, state["sql"]
-        )
+    async def ashould_fix(
+        self, state: CandidateGenState
+    ) -> Command[Literal[END, "fix"]]:
+        query_result = await aexecute_query(self.db, state["sql"])
+        execution_result_is_sql_correct = query_result.is_success
         update: CandidateGenState = {}
 
         update.update(
             {
-                "execution_result": execution_result,
+                "execution_result": query_result.to_text(),
+                "execution_summary": query_result.summary(),
+                "execution_fingerprint": query_result.fingerprint(),
                 "is_sql_correct": execution_result_is_sql_correct,
             },
         )
@@ -315,33 +368,35 @@ class LLMGeneration:
             update=update,
         )
 
-    def fix_query(self, state: CandidateGenState) -> Command[Literal["route", END]]:
+    async def afix_query(
+        self, state: CandidateGenState
+    ) -> Command[Literal["route", END]]:
         schema = state["schema"]
         user_question = state["user_question"]
         evidence = state["explaination"]
         sql = state["sql"]
-        execution_result = state["execution_result"]
-        query_fixing_prompt = Text2SqlConstant.query_fixing.format(
-            schema=schema,
-            question=user_question,
-            evidence=evidence,
-            query=sql,
-            result=execution_result,
+        execution_result = state.get("execution_summary") or state["execution_result"]
+        query_fixing_prompt = self._prompt(
+            schema,
+            Text2SqlConstant.query_fixing.format(
+                # the result goes first, the explanation is what the fix builds on
+                budget=prompt_budget(
+                    "suffix_tokens",
+                    {"result": summarize_rows, "evidence": truncate_text},
+                ),
+                dialect=get_app_config().database.dialect.upper(),
+                question=user_question,
+                evidence=evidence,
+                query=sql,
+                result=execution_result,
+            ),
         )
         turn_logger.log(
             "query_fixing_prompt",
             f"---retry--- \n" f" {query_fixing_prompt}",
         )
-        query_fixing_response = self.query_fixer_adapter.invoke(
-            {
-                "messages": [
-                    {
-                        "role": Role.USER,
-                        "content": query_fixing_prompt,
-                    }
-                ]
-            },
-            config=self.chat_config,
+        query_fixing_response = await self._ainvoke_adapter(
+            self.query_fixer_adapter, query_fixing_prompt, GEN_GRAPH_NODE.fix
         )
         if not query_fixing_response:
             logger.error(f"Query fixing response is None")
@@ -363,15 +418,22 @@ class LLMGeneration:
             "query_fixing_response",
             f"---retry--- \n" f" {query_fixing_response['structured_response']}",
         )
-        sql, fix_explaination = structured_query_fixing_response
+        sql = structured_query_fixing_response["sql"]
+        fix_explaination = structured_query_fixing_response["explaination"]
 
-        exec_result, is_success = execute_sql(self.db, sql)
+        query_result = await aexecute_query(self.db, sql)
+        is_success = query_result.is_success
+        # logs feed later prompts as evidence, keep them to the short summary
+        exec_result = query_result.summary()
         run_iter = state["run_iter"]
         update = {
             "run_iter": run_iter + 1,
             "sql": sql,
             "explaination": fix_explaination,
-            "execution_result": exec_result,
+            "execution_result": query_result.to_text(),
+            "execution_summary": exec_result,
+            "execution_fingerprint": query_result.fingerprint(),
+            "is_sql_correct": is_success,
             "logs": [
                 {
                     "name": GEN_GRAPH_NODE.fix,
@@ -404,7 +466,7 @@ class LLMGeneration:
 
 
 if __name__ == "__main__":
-    generator = LLMGeneration({}, **app_config.candidate_generations[0])
+    generator = LLMGeneration({}, **get_app_config().candidate_generations[0])
     graph = generator.graph
     with open("./tmp/candidate_generation.png", "wb") as fw:
         fw.write(graph.get_graph().draw_mermaid_png())
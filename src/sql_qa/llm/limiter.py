@@ -0,0 +1,314 @@
+"""Client-side rate limiting shared by every caller of a model.
+
+One `ModelLimiter` per model name enforces requests/min and tokens/min
+token buckets and a cap on in-flight calls. Callers that cannot start
+wait in a priority queue, interactive turns ahead of batch traffic
+(benchmarks, evaluation). The priority of a call comes from the
+`llm_priority` context, so it follows a request through the graph
+without being passed around.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional
+
+from shared import tracing
+from shared.logger import logger
+from sql_qa.llm.util import estimate_tokens
+
+INTERACTIVE = 0
+BATCH = 10
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar(
+    "llm_priority", default=INTERACTIVE
+)
+
+
+@contextlib.contextmanager
+def llm_priority(priority: int) -> Iterator[None]:
+    """LLM calls made inside the block queue with `priority`, lower first."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+class _TokenBucket:
+    def __init__(self, per_minute: Optional[float], clock: Callable[[], float]):
+        self.capacity = float(per_minute) if per_minute else None
+        self.rate = self.capacity / 60.0 if self.capacity else None
+        self.level = self.capacity
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        if self.capacity is not None:
+            self.level = min(
+                self.capacity, self.level + (now - self._updated) * self.rate
+            )
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` can be taken, 0 if it can be taken now."""
+        if self.capacity is None:
+            return 0.0
+        self._refill()
+        # a request larger than the bucket would never fit, let it drain it
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        if self.capacity is not None:
+            self.level -= min(amount, self.capacity)
+
+
+class _Waiter:
+    __slots__ = (
+        "priority",
+        "seq",
+        "tokens",
+        "enqueued",
+        "granted",
+        "cancelled",
+        "notify",
+        "sleep",
+    )
+
+    def __init__(self, priority: int, seq: int, tokens: int, notify: Callable[[], None]):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+        self.granted = False
+        self.cancelled = False
+        self.notify = notify
+        # timeout the waiter sleeps with: None waits for a notify, 0 is awake
+        self.sleep: Optional[float] = 0.0
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class ModelLimiter:
+    """Admission control for one model, safe to share across threads and
+    event loops.
+
+    The queue is strictly ordered by (priority, arrival): a waiting
+    interactive call is never overtaken by batch traffic, even a cheaper one.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency or None
+        self._requests = _TokenBucket(rpm, clock)
+        self._tokens = _TokenBucket(tpm, clock)
+        self._lock = threading.Lock()
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        # seconds until the bucket can admit the head of the queue
+        self._retry_after: Optional[float] = None
+        self._admitted = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _dispatch(self):
+        """Admit waiters from the head of the queue, called under the lock."""
+        self._retry_after = None
+        while self._queue:
+            head = self._queue[0]
+            if head.cancelled:
+                heapq.heappop(self._queue)
+                continue
+            if self.max_concurrency and self._in_flight >= self.max_concurrency:
+                return
+            wait = max(
+                self._requests.wait_time(1), self._tokens.wait_time(head.tokens)
+            )
+            if wait > 0:
+                self._retry_after = wait
+                if head.sleep is None:
+                    # it waits for a notification that would never come,
+                    # wake it to sleep until the bucket refills instead
+                    head.sleep = wait
+                    head.notify()
+                return
+            heapq.heappop(self._queue)
+            self._requests.take(1)
+            self._tokens.take(head.tokens)
+            self._in_flight += 1
+            waited = time.monotonic() - head.enqueued
+            self._admitted += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+            head.granted = True
+            head.notify()
+
+    def _enqueue(self, tokens: int, notify: Callable[[], None]) -> _Waiter:
+        with self._lock:
+            waiter = _Waiter(current_priority(), next(self._seq), tokens, notify)
+            heapq.heappush(self._queue, waiter)
+            self._dispatch()
+            return waiter
+
+    def _poll(self, waiter: _Waiter) -> Optional[float]:
+        """Re-run admission, returns how long `waiter` should sleep."""
+        with self._lock:
+            if not waiter.granted:
+                waiter.sleep = 0.0
+                self._dispatch()
+            waiter.sleep = None if waiter.granted else self._retry_after
+            return waiter.sleep
+
+    def _abandon(self, waiter: _Waiter):
+        with self._lock:
+            if waiter.granted:
+                self._release_locked()
+            else:
+                waiter.cancelled = True
+                self._dispatch()
+
+    def _release_locked(self):
+        self._in_flight -= 1
+        self._dispatch()
+
+    def release(self):
+        with self._lock:
+            self._release_locked()
+
+    def acquire(self, tokens: int = 0):
+        event = threading.Event()
+        waiter = self._enqueue(tokens, event.set)
+        try:
+            while not waiter.granted:
+                event.wait(self._poll(waiter))
+                event.clear()
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        finally:
+            tracing.add("queue_wait", time.monotonic() - waiter.enqueued)
+
+    async def aacquire(self, tokens: int = 0):
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        waiter = self._enqueue(tokens, lambda: loop.call_soon_threadsafe(event.set))
+        try:
+            while not waiter.granted:
+                try:
+                    await asyncio.wait_for(event.wait(), self._poll(waiter))
+                except asyncio.TimeoutError:
+                    pass
+                event.clear()
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        finally:
+            tracing.add("queue_wait", time.monotonic() - waiter.enqueued)
+
+    @contextlib.contextmanager
+    def slot(self, tokens: int = 0) -> Iterator[None]:
+        self.acquire(tokens)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @contextlib.asynccontextmanager
+    async def aslot(self, tokens: int = 0):
+        await self.aacquire(tokens)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            queued = [w for w in self._queue if not w.cancelled]
+            now = time.monotonic()
+            return {
+                "queue_depth": len(queued),
+                "queue_depth_interactive": sum(
+                    1 for w in queued if w.priority <= INTERACTIVE
+                ),
+                "in_flight": self._in_flight,
+                "admitted": self._admitted,
+                "mean_wait": self._total_wait / self._admitted if self._admitted else 0.0,
+                "max_wait": self._max_wait,
+                "oldest_wait": max((now - w.enqueued for w in queued), default=0.0),
+            }
+
+
+_limiters: Dict[str, Optional[ModelLimiter]] = {}
+_limiters_lock = threading.Lock()
+
+
+def _limits_for(model: str):
+    from sql_qa.config import as_bool, get_app_config
+
+    config = get_app_config().get("llm_rate_limits")
+    if not config or not as_bool(config.get("enabled", True)):
+        return None
+    limits = dict(config.get("default") or {})
+    limits.update((config.get("models") or {}).get(model) or {})
+    return limits
+
+
+def get_limiter(model: str) -> Optional[ModelLimiter]:
+    """Shared limiter for `model`, None when rate limiting is disabled."""
+    with _limiters_lock:
+        if model not in _limiters:
+            limits = _limits_for(model)
+            _limiters[model] = (
+                ModelLimiter(
+                    model,
+                    rpm=float(limits["rpm"]) if limits.get("rpm") else None,
+                    tpm=float(limits["tpm"]) if limits.get("tpm") else None,
+                    max_concurrency=int(limits.get("max_concurrency") or 0),
+                )
+                if limits is not None
+                else None
+            )
+            if limits is not None:
+                logger.info(f"Rate limiting {model}: {limits}")
+        return _limiters[model]
+
+
+def rate_limited(model: str, payload: Any = None) -> ContextManager[None]:
+    """Slot of `model`'s limiter for a direct model call outside
+    `get_react_agent`, sized from its input `payload`."""
+    limiter = get_limiter(model)
+    if limiter is None:
+        return contextlib.nullcontext()
+    return limiter.slot(estimate_tokens(payload))
+
+
+def get_limiter_stats() -> Dict[str, Dict[str, float]]:
+    with _limiters_lock:
+        limiters = [l for l in _limiters.values() if l is not None]
+    return {limiter.name: limiter.stats() for limiter in limiters}
+
+
+def reset_limiters():
+    with _limiters_lock:
+        _limiters.clear()
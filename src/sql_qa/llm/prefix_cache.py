@@ -0,0 +1,159 @@
+"""Provider prompt-prefix caching.
+
+Prompts are built as `PromptParts`: a stable prefix (system prompt, schema,
+few-shots) and a per-call suffix. A `PrefixCache` turns them into the
+messages sent to a model, marking the prefix the way the provider caches
+it, and keeps track of how often a prefix is reused. Tokens count as saved
+only when the provider reports them read from its cache (usage metadata),
+a reused prefix may still have been billed in full.
+
+- ``anthropic``: the prefix is sent with an ephemeral ``cache_control``
+  block, later calls read it from the provider cache.
+- ``implicit``: providers that cache repeated prefixes on their own
+  (OpenAI, Gemini 2.x) only need the prefix to come first, unchanged.
+- ``local``: stand-in used in tests, records handles without a provider.
+"""
+
+import hashlib
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from shared import tracing
+from shared.cache import LRUCache
+from sql_qa.llm.util import estimate_tokens
+from sql_qa.prompt.template import PromptParts, Role
+
+
+class PrefixHandle(NamedTuple):
+    # content hash of the prefix, the same for every model
+    key: str
+    model: str
+    tokens: int
+    # True when the prefix had already been sent to this model
+    cached: bool
+
+
+def prefix_key(prefix: str) -> str:
+    return hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:16]
+
+
+def cached_input_tokens(messages: Any) -> int:
+    """Input tokens the provider reports as read from its prompt cache."""
+    tokens = 0
+    for message in messages or []:
+        usage = getattr(message, "usage_metadata", None) or {}
+        tokens += (usage.get("input_token_details") or {}).get("cache_read", 0)
+    return tokens
+
+
+class PrefixCache:
+    """Tracks prefixes sent per model, subclasses decide how they are sent."""
+
+    name = "local"
+    # the provider caches a marked prefix for sure, prompts that do not need
+    # the schema only carry it when this holds
+    explicit = False
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = 300.0):
+        # provider caches expire, forget prefixes after the same time
+        self._seen = LRUCache(max_entries=max_entries, ttl=ttl)
+        self._lock = threading.Lock()
+        self.saved_tokens = 0
+
+    def handle(self, model: str, prefix: str) -> PrefixHandle:
+        key = prefix_key(prefix)
+        cached = self._seen.get((model, key)) is not None
+        tokens = estimate_tokens(prefix)
+        self._seen.set((model, key), tokens)
+        if cached:
+            tracing.add("prefix_reuses")
+        return PrefixHandle(key, model, tokens, cached)
+
+    def record_usage(self, response: Any):
+        """Count the cached input tokens reported in an agent response."""
+        messages = response.get("messages") if isinstance(response, dict) else None
+        tokens = cached_input_tokens(messages)
+        if tokens:
+            with self._lock:
+                self.saved_tokens += tokens
+
+    def _prefix_message(self, handle: PrefixHandle, prefix: str) -> Dict[str, Any]:
+        return {"role": Role.SYSTEM, "content": prefix}
+
+    def messages(self, model: str, parts: PromptParts) -> List[Dict[str, Any]]:
+        handle = self.handle(model, parts.prefix)
+        return [
+            self._prefix_message(handle, parts.prefix),
+            {"role": Role.USER, "content": parts.suffix},
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        seen = self._seen.stats()
+        return {
+            "provider": self.name,
+            "prefixes": seen["entries"],
+            "hits": seen["hits"],
+            "misses": seen["misses"],
+            "hit_rate": seen["hit_rate"],
+            "saved_tokens": self.saved_tokens,
+        }
+
+
+class ImplicitPrefixCache(PrefixCache):
+    name = "implicit"
+
+
+class AnthropicPrefixCache(PrefixCache):
+    name = "anthropic"
+    explicit = True
+
+    def _prefix_message(self, handle: PrefixHandle, prefix: str) -> Dict[str, Any]:
+        return {
+            "role": Role.SYSTEM,
+            "content": [
+                {
+                    "type": "text",
+                    "text": prefix,
+                    "cache_control": {"type": "ephemeral"},
+                }
+            ],
+        }
+
+
+PREFIX_CACHES = {
+    "local": PrefixCache,
+    "implicit": ImplicitPrefixCache,
+    "anthropic": AnthropicPrefixCache,
+}
+
+_prefix_caches: Dict[str, PrefixCache] = {}
+_prefix_caches_lock = threading.Lock()
+
+
+def _provider_for(model: str) -> str:
+    from sql_qa.config import get_app_config
+
+    config = get_app_config().get("prompt_cache") or {}
+    provider = config.get("provider") or "auto"
+    if provider != "auto":
+        return provider
+    return "anthropic" if "anthropic" in model or "claude" in model else "implicit"
+
+
+def get_prefix_cache(model: str) -> PrefixCache:
+    """Shared prefix cache for `model`, chosen by `prompt_cache.provider`."""
+    provider = _provider_for(model)
+    with _prefix_caches_lock:
+        if provider not in _prefix_caches:
+            try:
+                cache_class = PREFIX_CACHES[provider]
+            except KeyError:
+                raise ValueError(f"Unknown prompt cache provider: {provider}") from None
+            _prefix_caches[provider] = cache_class()
+        return _prefix_caches[provider]
+
+
+def get_prefix_cache_stats() -> Dict[str, Dict[str, Any]]:
+    with _prefix_caches_lock:
+        caches = dict(_prefix_caches)
+    return {name: cache.stats() for name, cache in caches.items()}
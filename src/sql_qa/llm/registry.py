@@ -0,0 +1,206 @@
+"""Process-wide chat models and compiled agents.
+
+Chat models are built once per model string (and construction arguments)
+and shared by every agent and hook calling them, instead of an
+`init_chat_model` per call. Models of a provider whose chat model takes
+httpx clients (the OpenAI-compatible ones) share one connection pool per
+provider, sized by `llm_clients`; the others keep the pool of their shared
+instance. `get_agent()` keeps compiled agents built on a request path.
+
+Servers call `warm_up()` before taking requests so the first question does
+not pay for building models, and `close_models()`/`aclose_models()` on
+shutdown (or after fork, like `shared.db.dispose_engines`).
+"""
+
+from __future__ import annotations
+
+import atexit
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from shared.logger import logger
+
+if TYPE_CHECKING:
+    import httpx
+    from langchain_core.language_models import BaseChatModel
+
+# providers whose chat model accepts `http_client`/`http_async_client`
+HTTP_CLIENT_PROVIDERS = ("openai", "azure_openai")
+
+# model name prefixes of providers given without a `provider:` prefix
+_INFERRED_PROVIDERS = {
+    "gpt-": "openai",
+    "o1": "openai",
+    "o3": "openai",
+    "claude": "anthropic",
+    "gemini": "google_genai",
+    "mistral": "mistralai",
+}
+
+_models: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], BaseChatModel] = {}
+_agents: Dict[str, Any] = {}
+_http_clients: Dict[str, Tuple[httpx.Client, httpx.AsyncClient]] = {}
+_stats = {"model_builds": 0, "model_hits": 0, "agent_builds": 0, "agent_hits": 0}
+_registry_lock = threading.RLock()
+
+
+def provider_of(model: str) -> str:
+    """Provider of a model string as `init_chat_model` reads it, '' if unknown."""
+    if ":" in model:
+        return model.split(":", 1)[0]
+    for prefix, provider in _INFERRED_PROVIDERS.items():
+        if model.startswith(prefix):
+            return provider
+    return ""
+
+
+def _client_config() -> Dict[str, Any]:
+    from sql_qa.config import get_app_config
+
+    return dict(get_app_config().get("llm_clients") or {})
+
+
+def _http_clients_for(provider: str) -> Tuple[httpx.Client, httpx.AsyncClient]:
+    if provider not in _http_clients:
+        import httpx
+
+        config = _client_config()
+        limits = httpx.Limits(
+            max_connections=int(config.get("max_connections", 100)),
+            max_keepalive_connections=int(config.get("max_keepalive_connections", 20)),
+            keepalive_expiry=float(config.get("keepalive_expiry", 30.0)),
+        )
+        _http_clients[provider] = (
+            httpx.Client(limits=limits),
+            httpx.AsyncClient(limits=limits),
+        )
+        logger.info(f"Created HTTP client pool for {provider}: {limits}")
+    return _http_clients[provider]
+
+
+def _build_chat_model(model: str, **kwargs: Any) -> BaseChatModel:
+    from sql_qa.llm.adapter import get_chat_model_init
+
+    return get_chat_model_init(model, **kwargs)
+
+
+def get_chat_model(model: str, **kwargs: Any) -> BaseChatModel:
+    """The shared chat model for `model` and construction `kwargs`."""
+    key = (model, tuple(sorted((k, repr(v)) for k, v in kwargs.items())))
+    chat_model = _models.get(key)
+    if chat_model is not None:
+        _stats["model_hits"] += 1
+        return chat_model
+    with _registry_lock:
+        if key in _models:
+            _stats["model_hits"] += 1
+            return _models[key]
+        provider = provider_of(model)
+        if provider in HTTP_CLIENT_PROVIDERS:
+            http_client, http_async_client = _http_clients_for(provider)
+            kwargs.setdefault("http_client", http_client)
+            kwargs.setdefault("http_async_client", http_async_client)
+        chat_model = _build_chat_model(model, **kwargs)
+        _models[key] = chat_model
+        _stats["model_builds"] += 1
+        logger.info(f"Created chat model {model}")
+        return chat_model
+
+
+def get_agent(name: str, build: Callable[[], Any]) -> Any:
+    """The agent registered as `name`, built with `build()` on first use."""
+    agent = _agents.get(name)
+    if agent is not None:
+        _stats["agent_hits"] += 1
+        return agent
+    with _registry_lock:
+        if name in _agents:
+            _stats["agent_hits"] += 1
+            return _agents[name]
+        agent = build()
+        _agents[name] = agent
+        _stats["agent_builds"] += 1
+        return agent
+
+
+def configured_models() -> List[str]:
+    """API model strings named in the config, in config order."""
+    from sql_qa.config import get_app_config
+    from sql_qa.llm.adapter import API_MODELS
+
+    app_config = get_app_config()
+    models = [
+        app_config.get(section, {}).get("model")
+        for section in (
+            "orchestrator",
+            "question_proc",
+            "schema_linking",
+            "result_enhancement",
+            "merger",
+        )
+    ]
+    for generation in app_config.get("candidate_generations") or []:
+        for kwargs in generation.values():
+            if hasattr(kwargs, "get"):
+                models.append(kwargs.get("model"))
+    return list(
+        dict.fromkeys(
+            m
+            for m in models
+            if isinstance(m, str) and any(api in m for api in API_MODELS)
+        )
+    )
+
+
+def warm_up(models: Optional[List[str]] = None) -> Dict[str, bool]:
+    """Build the configured models ahead of the first request, skipped when
+    `llm_clients.warm_up` is off. Returns model -> built."""
+    from sql_qa.config import as_bool
+
+    if models is None:
+        if not as_bool(_client_config().get("warm_up", True)):
+            return {}
+        models = configured_models()
+    built = {}
+    for model in models:
+        try:
+            get_chat_model(model)
+            built[model] = True
+        except Exception as e:
+            # the first call on this model will raise it again
+            logger.warning(f"Could not warm up {model}: {e}")
+            built[model] = False
+    return built
+
+
+def get_registry_stats() -> Dict[str, Any]:
+    with _registry_lock:
+        return {
+            **_stats,
+            "models": sorted({model for model, _ in _models}),
+            "agents": sorted(_agents),
+            "http_client_providers": sorted(_http_clients),
+        }
+
+
+def close_models():
+    """Drop every model and agent and close the shared connection pools,
+    async pools are dropped unclosed (see `aclose_models`)."""
+    with _registry_lock:
+        for http_client, _ in _http_clients.values():
+            http_client.close()
+        _http_clients.clear()
+        _models.clear()
+        _agents.clear()
+
+
+async def aclose_models():
+    """`close_models` from the loop owning the async connection pools."""
+    with _registry_lock:
+        async_clients = [client for _, client in _http_clients.values()]
+    for async_client in async_clients:
+        await async_client.aclose()
+    close_models()
+
+
+atexit.register(close_models)
@@ -0,0 +1,490 @@
+"""Latency and failure handling for LLM calls.
+
+Each model gets a rolling latency window and a circuit breaker shared by
+every agent in the process. A call is bounded by a timeout. When it is
+slower than the model's p95, a hedged duplicate is sent, optionally to a
+fallback model, and the first answer wins. Failed calls are retried with
+jittered exponential backoff.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, NamedTuple, Optional, Tuple
+
+from shared import context, tracing
+from shared.logger import logger
+from sql_qa.llm.limiter import ModelLimiter
+from sql_qa.llm.prefix_cache import cached_input_tokens
+from sql_qa.llm.util import estimate_tokens
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the model while its circuit is open."""
+
+
+def _record_usage(span: tracing.Span, args, kwargs, result: Any):
+    """Token counts of an agent call on its span, as reported by the
+    provider when the messages carry usage metadata, estimated otherwise."""
+    messages = result.get("messages") if isinstance(result, dict) else None
+    input_tokens = output_tokens = 0
+    for message in messages or []:
+        usage = getattr(message, "usage_metadata", None) or {}
+        input_tokens += usage.get("input_tokens", 0)
+        output_tokens += usage.get("output_tokens", 0)
+    if not input_tokens:
+        input_tokens = estimate_tokens((args, kwargs))
+    if not output_tokens and messages:
+        output_tokens = estimate_tokens(messages[-1])
+    span.add("input_tokens", input_tokens)
+    span.add("output_tokens", output_tokens)
+    cached_tokens = cached_input_tokens(messages)
+    if cached_tokens:
+        span.add("cached_input_tokens", cached_tokens)
+
+
+class LatencyTracker:
+    """Rolling window of successful call durations."""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures.
+
+    While open every call is rejected. After `reset_timeout` seconds a single
+    trial call goes through (half-open): success closes the circuit and
+    failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def admit(self) -> Optional[str]:
+        """CLOSED when calls go through, HALF_OPEN when this call takes the
+        trial slot, None when it is rejected."""
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return state
+            if state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return state
+            return None
+
+    def allow(self) -> bool:
+        return self.admit() is not None
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+
+    def release_trial(self):
+        """Free the half-open trial slot of a call that ended without an
+        outcome (cancelled), the next call becomes the trial."""
+        with self._lock:
+            self._trial_running = False
+
+
+class ResiliencePolicy(NamedTuple):
+    timeout: Optional[float] = 60.0
+    max_attempts: int = 3
+    backoff_base: float = 1.0
+    backoff_max: float = 20.0
+    hedge_enabled: bool = True
+    # hedge delay until `hedge_min_samples` latencies are known for p95
+    hedge_initial_delay: float = 8.0
+    hedge_min_delay: float = 1.0
+    hedge_min_samples: int = 20
+    fallback_model: Optional[str] = None
+    failure_threshold: int = 5
+    reset_timeout: float = 30.0
+
+    @classmethod
+    def from_config(cls, config) -> "ResiliencePolicy":
+        from sql_qa.config import as_bool
+
+        if not config:
+            return cls()
+        hedge = config.get("hedge") or {}
+        breaker = config.get("circuit_breaker") or {}
+        timeout = config.get("timeout")
+        return cls(
+            timeout=float(timeout) if timeout else None,
+            max_attempts=int(config.get("max_attempts", 3)),
+            backoff_base=float(config.get("backoff_base", 1.0)),
+            backoff_max=float(config.get("backoff_max", 20.0)),
+            hedge_enabled=as_bool(hedge.get("enabled", True)),
+            hedge_initial_delay=float(hedge.get("initial_delay", 8.0)),
+            hedge_min_delay=float(hedge.get("min_delay", 1.0)),
+            hedge_min_samples=int(hedge.get("min_samples", 20)),
+            fallback_model=hedge.get("fallback_model") or None,
+            failure_threshold=int(breaker.get("failure_threshold", 5)),
+            reset_timeout=float(breaker.get("reset_timeout", 30.0)),
+        )
+
+
+_latencies: Dict[str, LatencyTracker] = {}
+_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_latency_tracker(model: str) -> LatencyTracker:
+    with _registry_lock:
+        if model not in _latencies:
+            _latencies[model] = LatencyTracker()
+        return _latencies[model]
+
+
+def get_circuit_breaker(model: str, policy: ResiliencePolicy) -> CircuitBreaker:
+    with _registry_lock:
+        if model not in _breakers:
+            _breakers[model] = CircuitBreaker(
+                policy.failure_threshold, policy.reset_timeout
+            )
+        return _breakers[model]
+
+
+def get_model_health() -> Dict[str, Dict[str, Any]]:
+    """p50/p95 latency, sample count and circuit state per model."""
+    with _registry_lock:
+        models = set(_latencies) | set(_breakers)
+    health = {}
+    for model in sorted(models):
+        tracker = _latencies.get(model)
+        breaker = _breakers.get(model)
+        health[model] = {
+            "samples": len(tracker) if tracker else 0,
+            "p50": tracker.percentile(0.5) if tracker else None,
+            "p95": tracker.percentile(0.95) if tracker else None,
+            "circuit": breaker.state if breaker else CircuitBreaker.CLOSED,
+        }
+    return health
+
+
+def reset_model_health():
+    with _registry_lock:
+        _latencies.clear()
+        _breakers.clear()
+
+
+class _Target(NamedTuple):
+    model: str
+    call: Callable[..., Any]
+    # the call holds its breaker's half-open trial slot
+    trial: bool = False
+
+
+class ResilientCaller:
+    """Runs one model's calls under a `ResiliencePolicy`.
+
+    `fallback` lazily returns `(model name, executor)`, whose `invoke` or
+    `ainvoke` is used for hedged requests. Without it the primary model is
+    hedged against itself. `limiter_for` maps a model name to its rate
+    limiter, every attempt and hedge takes a slot before calling the model.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        policy: ResiliencePolicy,
+        fallback: Optional[Callable[[], Tuple[str, Any]]] = None,
+        limiter_for: Optional[Callable[[str], Optional[ModelLimiter]]] = None,
+    ):
+        self.model = model
+        self.policy = policy
+        self.limiter_for = limiter_for
+        self._fallback_factory = fallback
+        self._fallback: Optional[Tuple[str, Any]] = None
+        self._fallback_lock = threading.Lock()
+
+    def _fallback_target(self, method: str) -> Optional[_Target]:
+        if self._fallback_factory is None:
+            return None
+        with self._fallback_lock:
+            if self._fallback is None:
+                try:
+                    self._fallback = self._fallback_factory()
+                except Exception as e:
+                    logger.error(f"Could not build fallback for {self.model}: {e}")
+                    self._fallback_factory = None
+                    return None
+        model, executor = self._fallback
+        return _Target(model, getattr(executor, method))
+
+    def hedge_delay(self) -> float:
+        tracker = get_latency_tracker(self.model)
+        p95 = None
+        if len(tracker) >= self.policy.hedge_min_samples:
+            p95 = tracker.percentile(0.95)
+        if p95 is None:
+            return self.policy.hedge_initial_delay
+        return max(self.policy.hedge_min_delay, p95)
+
+    def backoff(self, attempt: int) -> float:
+        """Full jitter: uniform in [0, min(max, base * 2^(attempt-1))]."""
+        ceiling = min(
+            self.policy.backoff_max, self.policy.backoff_base * 2 ** (attempt - 1)
+        )
+        return random.uniform(0, ceiling)
+
+    def _hedge_target(self, primary: _Target, method: str) -> Optional[_Target]:
+        if not self.policy.hedge_enabled:
+            return None
+        fallback = self._fallback_target(method)
+        if fallback is not None:
+            admitted = get_circuit_breaker(fallback.model, self.policy).admit()
+            if admitted is not None:
+                return fallback._replace(trial=admitted == CircuitBreaker.HALF_OPEN)
+        admitted = get_circuit_breaker(primary.model, self.policy).admit()
+        if admitted is not None:
+            return primary._replace(trial=admitted == CircuitBreaker.HALF_OPEN)
+        return None
+
+    # --- async
+
+    def _limiter(self, target: _Target) -> Optional[ModelLimiter]:
+        return self.limiter_for(target.model) if self.limiter_for else None
+
+    async def _acall_once(self, target: _Target, args, kwargs) -> Any:
+        breaker = get_circuit_breaker(target.model, self.policy)
+        limiter = self._limiter(target)
+        if limiter is not None:
+            try:
+                await limiter.aacquire(estimate_tokens((args, kwargs)))
+            except asyncio.CancelledError:
+                if target.trial:
+                    breaker.release_trial()
+                raise
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(
+                target.call(*args, **kwargs), self.policy.timeout
+            )
+        except asyncio.CancelledError:
+            # lost a hedge race or the caller went away, not the model's
+            # fault, but a half-open trial must not keep its slot
+            if target.trial:
+                breaker.release_trial()
+            raise
+        except Exception:
+            breaker.record_failure()
+            raise
+        finally:
+            if limiter is not None:
+                limiter.release()
+        breaker.record_success()
+        get_latency_tracker(target.model).record(time.perf_counter() - started)
+        return result
+
+    async def _ahedged(self, primary: _Target, args, kwargs) -> Any:
+        admitted = get_circuit_breaker(primary.model, self.policy).admit()
+        if admitted is None:
+            hedge = self._hedge_target(primary, "ainvoke")
+            if hedge is None or hedge.model == primary.model:
+                raise CircuitOpenError(f"Circuit open for {primary.model}")
+            return await self._acall_once(hedge, args, kwargs)
+
+        primary = primary._replace(trial=admitted == CircuitBreaker.HALF_OPEN)
+        first = asyncio.ensure_future(self._acall_once(primary, args, kwargs))
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay())
+            if not done:
+                hedge = self._hedge_target(primary, "ainvoke")
+                if hedge is not None:
+                    logger.info(
+                        f"{primary.model} slower than {self.hedge_delay():.1f}s, "
+                        f"hedging with {hedge.model}"
+                    )
+                    tracing.add("hedges")
+                    tasks.add(asyncio.ensure_future(self._acall_once(hedge, args, kwargs)))
+            error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def acall(self, call: Callable[..., Any], *args, **kwargs) -> Any:
+        primary = _Target(self.model, call)
+        error: Optional[BaseException] = None
+        with tracing.span("llm", model=self.model) as span:
+            for attempt in range(1, self.policy.max_attempts + 1):
+                try:
+                    result = await self._ahedged(primary, args, kwargs)
+                    _record_usage(span, args, kwargs, result)
+                    return result
+                except Exception as e:
+                    error = e
+                    if attempt == self.policy.max_attempts:
+                        break
+                    delay = self.backoff(attempt)
+                    logger.warning(
+                        f"Retry attempt {attempt} for {self.model} in {delay:.1f}s due to error: {e!r}"
+                    )
+                    span.add("retries")
+                    await asyncio.sleep(delay)
+            raise error
+
+    # --- sync
+
+    def _call_once(self, target: _Target, args, kwargs) -> Any:
+        limiter = self._limiter(target)
+        if limiter is not None:
+            limiter.acquire(estimate_tokens((args, kwargs)))
+        breaker = get_circuit_breaker(target.model, self.policy)
+        started = time.perf_counter()
+        try:
+            result = target.call(*args, **kwargs)
+        except Exception:
+            breaker.record_failure()
+            raise
+        finally:
+            if limiter is not None:
+                limiter.release()
+        breaker.record_success()
+        get_latency_tracker(target.model).record(time.perf_counter() - started)
+        return result
+
+    def _hedged(self, primary: _Target, args, kwargs) -> Any:
+        if not get_circuit_breaker(primary.model, self.policy).allow():
+            hedge = self._hedge_target(primary, "invoke")
+            if hedge is None or hedge.model == primary.model:
+                raise CircuitOpenError(f"Circuit open for {primary.model}")
+            return self._call_once(hedge, args, kwargs)
+        # Threads cannot be cancelled, losers finish in the background and
+        # only update the latency/breaker stats.
+        pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="llm-hedge")
+        try:
+            # calls keep the caller's context, e.g. its span
+            futures = {
+                context.submit(pool, self._call_once, primary, args, kwargs)
+            }
+            done, _ = wait(futures, timeout=self.hedge_delay())
+            if not done:
+                hedge = self._hedge_target(primary, "invoke")
+                if hedge is not None:
+                    tracing.add("hedges")
+                    futures.add(
+                        context.submit(pool, self._call_once, hedge, args, kwargs)
+                    )
+            deadline = (
+                time.monotonic() + self.policy.timeout if self.policy.timeout else None
+            )
+            error: Optional[BaseException] = None
+            while futures:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"{primary.model} timed out")
+                done, futures = wait(futures, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        return future.result()
+                    error = future.exception()
+            raise error
+        finally:
+            pool.shutdown(wait=False)
+
+    def call(self, call: Callable[..., Any], *args, **kwargs) -> Any:
+        primary = _Target(self.model, call)
+        error: Optional[BaseException] = None
+        with tracing.span("llm", model=self.model) as span:
+            for attempt in range(1, self.policy.max_attempts + 1):
+                try:
+                    result = self._hedged(primary, args, kwargs)
+                    _record_usage(span, args, kwargs, result)
+                    return result
+                except Exception as e:
+                    error = e
+                    if attempt == self.policy.max_attempts:
+                        break
+                    delay = self.backoff(attempt)
+                    logger.warning(
+                        f"Retry attempt {attempt} for {self.model} in {delay:.1f}s due to error: {e!r}"
+                    )
+                    span.add("retries")
+                    time.sleep(delay)
+            raise error
+
+    def wrap_async(self, call: Callable[..., Any]) -> Callable[..., Any]:
+        async def wrapper(*args, **kwargs):
+            try:
+                return await self.acall(call, *args, **kwargs)
+            except Exception as e:
+                # callers check for a falsy response, as with the old retry
+                # decorator's error callback
+                logger.error(f"LLM call to {self.model} failed: {e!r}")
+                return None
+
+        return wrapper
+
+    def wrap_sync(self, call: Callable[..., Any]) -> Callable[..., Any]:
+        def wrapper(*args, **kwargs):
+            try:
+                return self.call(call, *args, **kwargs)
+            except Exception as e:
+                logger.error(f"LLM call to {self.model} failed: {e!r}")
+                return None
+
+        return wrapper
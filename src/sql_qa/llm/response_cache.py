@@ -0,0 +1,313 @@
+"""On-disk cache of LLM agent responses.
+
+Responses are keyed by everything that determines them: model, system
+prompt, input messages, response_format schema and temperature. Modes:
+
+- ``off``: no caching.
+- ``read_through``: serve hits, call the model and store on a miss.
+- ``write_only``: always call the model and store, to record a baseline.
+- ``replay_only``: serve hits, a miss fails like an unavailable model, so
+  benchmarks replay offline and never pay for a call.
+
+Entries live in a SQLite file bounded by `max_bytes`, least recently used
+entries are evicted first.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Literal, Optional
+
+from shared import tracing
+from shared.logger import logger
+
+CacheMode = Literal["off", "read_through", "write_only", "replay_only"]
+MODES = ("off", "read_through", "write_only", "replay_only")
+
+
+def _canonical(value: Any) -> Any:
+    """JSON friendly form of a key part, stable across runs."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, type) and hasattr(value, "model_json_schema"):
+        return value.model_json_schema()
+    if hasattr(value, "content") and hasattr(value, "type"):
+        # langchain message, ids and metadata differ between runs
+        return {
+            "type": value.type,
+            "content": _canonical(value.content),
+            "tool_calls": _canonical(getattr(value, "tool_calls", None)),
+        }
+    return repr(value)
+
+
+def response_key(
+    model: Any,
+    prompt: Any,
+    payload: Any,
+    response_format: Any = None,
+    temperature: Optional[float] = None,
+) -> str:
+    text = json.dumps(
+        _canonical(
+            {
+                "model": model,
+                "prompt": prompt,
+                "input": payload,
+                "response_format": response_format,
+                "temperature": temperature,
+            }
+        ),
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS responses (
+        key TEXT PRIMARY KEY,
+        model TEXT,
+        value BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        accessed_at REAL NOT NULL
+    )
+    """
+
+    def __init__(
+        self,
+        path: str,
+        mode: CacheMode = "read_through",
+        max_bytes: Optional[int] = None,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Unknown LLM cache mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(self._SCHEMA)
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)"
+            )
+            self._connection = connection
+        return self._connection
+
+    @property
+    def reads_enabled(self) -> bool:
+        return self.mode in ("read_through", "replay_only")
+
+    @property
+    def writes_enabled(self) -> bool:
+        return self.mode in ("read_through", "write_only")
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            connection.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                (time.time(), key),
+            )
+            connection.commit()
+            self.hits += 1
+        try:
+            return pickle.loads(row[0])
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable LLM cache entry {key}: {e}")
+            return None
+
+    def set(self, key: str, value: Any, model: Optional[str] = None):
+        try:
+            blob = pickle.dumps(value)
+        except Exception as e:
+            logger.warning(f"LLM response not cacheable: {e}")
+            return
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, blob, len(blob), now, now),
+            )
+            self.writes += 1
+            self._evict(connection)
+            connection.commit()
+
+    def _evict(self, connection: sqlite3.Connection):
+        if self.max_bytes is None:
+            return
+        (total,) = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        # oldest first until back under the bound
+        freed = 0
+        victims = []
+        for key, size in connection.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at"
+        ):
+            if total - freed <= self.max_bytes:
+                break
+            victims.append((key,))
+            freed += size
+        connection.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+    def clear(self):
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM responses")
+            connection.commit()
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            connection = self._connect()
+            entries, size = connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "mode": self.mode,
+                "entries": entries,
+                "bytes": size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "writes": self.writes,
+                "evictions": self.evictions,
+            }
+
+    def _lookup(self, key: str, model: str):
+        """`(hit, value)`, in replay mode a miss is logged as an error."""
+        if not self.reads_enabled:
+            return False, None
+        value = self.get(key)
+        if value is not None:
+            tracing.add("llm_cache_hits")
+            return True, value
+        if self.mode == "replay_only":
+            logger.error(f"LLM cache miss in replay mode for {model} ({key[:12]})")
+            return True, None
+        return False, None
+
+    def wrap_sync(
+        self, call: Callable[..., Any], model: str, key_for: Callable[[Any], str]
+    ) -> Callable[..., Any]:
+        """`call(payload, ...)` going through the cache, `key_for(payload)`
+        builds the key."""
+
+        def wrapper(payload, *args, **kwargs):
+            if self.mode == "off":
+                return call(payload, *args, **kwargs)
+            key = key_for(payload)
+            hit, value = self._lookup(key, model)
+            if hit:
+                return value
+            value = call(payload, *args, **kwargs)
+            if value is not None and self.writes_enabled:
+                self.set(key, value, model)
+            return value
+
+        return wrapper
+
+    def wrap_async(
+        self, call: Callable[..., Any], model: str, key_for: Callable[[Any], str]
+    ) -> Callable[..., Any]:
+        async def wrapper(payload, *args, **kwargs):
+            if self.mode == "off":
+                return await call(payload, *args, **kwargs)
+            key = key_for(payload)
+            hit, value = self._lookup(key, model)
+            if hit:
+                return value
+            value = await call(payload, *args, **kwargs)
+            if value is not None and self.writes_enabled:
+                self.set(key, value, model)
+            return value
+
+        return wrapper
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Process wide cache configured by `llm_cache`."""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            from sql_qa.config import get_app_config
+
+            config = get_app_config().get("llm_cache") or {}
+            max_bytes = config.get("max_bytes")
+            _response_cache = ResponseCache(
+                config.get("path") or "./.cache/llm_cache.sqlite",
+                mode=config.get("mode") or "off",
+                max_bytes=int(max_bytes) if max_bytes else None,
+            )
+        return _response_cache
+
+
+def set_response_cache_mode(mode: CacheMode):
+    """Switch the mode at runtime, e.g. from a benchmark CLI flag."""
+    if mode not in MODES:
+        raise ValueError(f"Unknown LLM cache mode: {mode}")
+    get_response_cache().mode = mode
+
+
+def cache_agent_calls(
+    agent_executor: Any,
+    model: str,
+    prompt: Any = None,
+    response_format: Any = None,
+    temperature: Optional[float] = None,
+):
+    """Route `agent_executor.invoke`/`ainvoke` through the response cache.
+
+    The mode is read on every call, so it can still be changed afterwards.
+    """
+    cache = get_response_cache()
+
+    def key_for(payload) -> str:
+        return response_key(model, prompt, payload, response_format, temperature)
+
+    agent_executor.invoke = cache.wrap_sync(agent_executor.invoke, model, key_for)
+    agent_executor.ainvoke = cache.wrap_async(agent_executor.ainvoke, model, key_for)
+    return agent_executor
@@ -1,26 +1,28 @@
-from typing import List, Literal, cast
+import asyncio
+from typing import List, Literal, Optional, Set, Tuple, cast
 from langgraph.graph.graph import CompiledGraph
 from langgraph.types import Command, Send
 from shared.logger import logger
-from shared.db import get_db, execute_sql
-from sql_qa.config import get_app_config, turn_logger
+from shared.tracing import traced
+from shared.db import aexecute_sql, canonicalize_sql, get_db, sqlglot_dialect
+from sql_qa.config import as_bool, get_app_config, turn_logger
 from sql_qa.llm.adapter import get_react_agent
 from sql_qa.llm.generation import LLMGeneration
 from sql_qa.llm.type import (
     STRAT_GRAPH_NODE as NODE,
     CandidateGenState,
     SQLGenerationResponse,
+    StrategyCandidate,
     StrategyState,
 )
 from sql_qa.prompt.constant import Text2SqlConstant
 from sql_qa.prompt.template import Role
 from langgraph.graph import END, START, StateGraph
 
-app_config = get_app_config()
-
 
 class StrategyFactory:
     def __init__(self, return_all: bool = False):
+        app_config = get_app_config()
         candidate_generation_config = app_config.candidate_generations
         merger_config = app_config.merger
         self.return_all = return_all
@@ -38,6 +40,14 @@ class StrategyFactory:
         for config in candidate_generation_config:
             self.generators.append(LLMGeneration({}, **config))
 
+        strategy_config = app_config.get("strategy") or {}
+        # all: wait for every generator then merge, race: see arace
+        self.mode = strategy_config.get("mode", "all")
+        self.race_config = strategy_config.get("race") or {}
+        self.voting_config = strategy_config.get("voting") or {}
+        # strategies still running after a race was won, kept referenced
+        self._background: Set[asyncio.Task] = set()
+
         self.graph: CompiledGraph
 
         self._build_graph()
@@ -45,13 +55,16 @@ class StrategyFactory:
 
     def _build_graph(self):
         graph_builder = StateGraph(StrategyState)
-        graph_builder.add_node(NODE.strategy_gen, self.agenerate)
-        graph_builder.add_node(NODE.merge, self.merge)
-
-        graph_builder.add_conditional_edges(
-            START, self.route_to_strategy, [NODE.strategy_gen]
-        )
-        graph_builder.add_edge(NODE.strategy_gen, NODE.merge)
+        graph_builder.add_node(NODE.merge, self.amerge)
+        if self.mode == "race":
+            graph_builder.add_node(NODE.race, self.arace)
+            graph_builder.add_edge(START, NODE.race)
+        else:
+            graph_builder.add_node(NODE.strategy_gen, self.agenerate)
+            graph_builder.add_conditional_edges(
+                START, self.route_to_strategy, [NODE.strategy_gen]
+            )
+            graph_builder.add_edge(NODE.strategy_gen, NODE.merge)
         graph_builder.add_edge(NODE.merge, END)
 
         self.graph = graph_builder.compile()
@@ -63,6 +76,16 @@ class StrategyFactory:
         except:
             logger.warning(f"No strategy found for: {strategy}")
             return Command(goto="merge")
+        candidate = await self._run_generator(generator, state)
+        return Command(
+            goto="merge",
+            update={"logs": [candidate]},
+        )
+
+    async def _run_generator(
+        self, generator: LLMGeneration, state: StrategyState
+    ) -> StrategyCandidate:
+        strategy = generator.prompt_type
         gen_graph = generator.graph
         gen_payload: CandidateGenState = {}
         gen_payload.update(
@@ -74,40 +97,175 @@ class StrategyFactory:
         log_msg = (
             f"Generator {generator.prompt_type} result: {result['is_sql_correct']}."
             f"\nDetails: {result['sql']}. "
-            f"\nExecution result: {result['execution_result']}"
+            f"\nExecution result: {result.get('execution_summary') or result['execution_result']}"
         )
         logger.info(log_msg)
         turn_logger.log(strategy, log_msg)
 
         result["strategy"] = generator.prompt_type
 
-        update: StrategyState = {}
-        update.update(
-            {
-                "logs": [
-                    {
-                        "strategy": strategy,
-                        "thoughts": result["correct_thoughts"],
-                        "sql": result["sql"],
-                        "execution_result": result["execution_result"],
-                        "is_success": bool(len(result["correct_thoughts"])),
-                    }
-                ]
-            }
-        )
+        return {
+            "strategy": strategy,
+            "thoughts": result["correct_thoughts"],
+            "sql": result["sql"],
+            "execution_result": result["execution_result"],
+            "is_success": bool(len(result["correct_thoughts"])),
+            "is_valid": bool(result.get("is_sql_correct") and result["sql"]),
+            "result_fingerprint": result.get("execution_fingerprint"),
+        }
 
-        return Command(
-            goto="merge",
-            update=update,
+    def _agreement_groups(
+        self, candidates: List[StrategyCandidate]
+    ) -> List[List[StrategyCandidate]]:
+        """Valid candidates grouped by equivalence, largest group first.
+
+        Two candidates agree when their canonical SQL is the same or their
+        results have the same order-insensitive row fingerprint.
+        """
+        dialect = sqlglot_dialect(self._db)
+        groups: List[List[StrategyCandidate]] = []
+        group_keys: List[Set[Tuple[str, str]]] = []
+        for candidate in candidates:
+            if not candidate.get("is_valid"):
+                continue
+            sql = candidate["sql"]
+            keys = {("sql", canonicalize_sql(sql, dialect) or sql.strip())}
+            if candidate.get("result_fingerprint"):
+                keys.add(("rows", candidate["result_fingerprint"]))
+            matches = [i for i, existing in enumerate(group_keys) if existing & keys]
+            if not matches:
+                groups.append([candidate])
+                group_keys.append(keys)
+                continue
+            # a candidate can bridge two groups, e.g. same SQL as one and
+            # same rows as another
+            first, *others = matches
+            groups[first].append(candidate)
+            group_keys[first] |= keys
+            for i in reversed(others):
+                groups[first].extend(groups.pop(i))
+                group_keys[first] |= group_keys.pop(i)
+        # stable: on ties the group that finished first stays first
+        return sorted(groups, key=len, reverse=True)
+
+    def _vote(self, candidates: List[StrategyCandidate]) -> Optional[StrategyCandidate]:
+        """Majority candidate when the valid candidates clearly agree.
+
+        The largest agreement group wins when it holds at least
+        `voting.min_votes` candidates and more than `voting.min_share` of
+        the valid ones; otherwise the merger LLM has to decide.
+        """
+        groups = self._agreement_groups(candidates)
+        if not groups:
+            return None
+        votes = len(groups[0])
+        valid = sum(len(group) for group in groups)
+        if votes < int(self.voting_config.get("min_votes", 2)):
+            return None
+        if votes / valid <= float(self.voting_config.get("min_share", 0.5)):
+            return None
+        return groups[0][0]
+
+    def _quorum_winner(
+        self, candidates: List[StrategyCandidate]
+    ) -> Optional[StrategyCandidate]:
+        """Candidate satisfying the race quorum, None while it is not met.
+
+        first: the first validated candidate whose SQL executed.
+        agree: the first of `k` valid candidates that agree, see
+        `_agreement_groups`.
+        """
+        valid = [c for c in candidates if c.get("is_valid")]
+        if not valid:
+            return None
+        quorum = self.race_config.get("quorum", "first")
+        if quorum == "first":
+            return valid[0]
+        k = min(int(self.race_config.get("k", 2)), len(self.generators))
+        groups = self._agreement_groups(valid)
+        if len(groups[0]) >= k:
+            return groups[0][0]
+        return None
+
+    def _demote(self, task: asyncio.Task):
+        """Let a losing strategy finish in the background, only logging it."""
+        # the turn is saved without waiting for the task, which must not
+        # write to its row any more
+        task.get_context().run(turn_logger.detach_turn)
+
+        def done(task: asyncio.Task):
+            self._background.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                logger.warning(f"Background strategy failed: {task.exception()}")
+
+        self._background.add(task)
+        task.add_done_callback(done)
+
+    async def arace(self, state: StrategyState) -> Command[Literal["merge", END]]:
+        """Run every generator concurrently and return as soon as the quorum
+        is met, falling back to merge when all finish without one.
+
+        Strategies still running are cancelled, or demoted to background
+        when `strategy.race.losers` is `background`.
+        """
+        tasks = [
+            asyncio.create_task(self._run_generator(generator, state))
+            for generator in self.generators
+        ]
+        logger.info(f"Racing {len(tasks)} generators")
+        candidates: List[StrategyCandidate] = []
+        winner = None
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    candidates.append(await next_done)
+                except Exception as e:
+                    logger.error(f"Strategy failed: {e}")
+                    continue
+                winner = self._quorum_winner(candidates)
+                if winner is not None:
+                    break
+        finally:
+            pending = [task for task in tasks if not task.done()]
+            if pending and winner is not None and (
+                self.race_config.get("losers", "cancel") == "background"
+            ):
+                for task in pending:
+                    self._demote(task)
+            elif pending:
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        if winner is None:
+            return Command(goto=NODE.merge, update={"logs": candidates})
+        logger.info(
+            f"Race won by {winner['strategy']} after {len(candidates)}/{len(tasks)} strategies"
         )
+        turn_logger.log("race_winner", winner["strategy"])
+        # the agent answers with the last log, keep the winner there
+        logs = [c for c in candidates if c is not winner] + [winner]
+        return Command(goto=END, update={"logs": logs})
 
-    def merge(self, state: StrategyState) -> Command[Literal[END]]:
+    @traced("merge")
+    async def amerge(self, state: StrategyState) -> Command[Literal[END]]:
         logs = state["logs"]
         if not len(logs):
             return Command(goto=END)
 
+        if as_bool(self.voting_config.get("enabled", True)):
+            winner = self._vote(logs)
+            if winner is not None:
+                logger.info(f"Candidates agree on {winner['strategy']}, skipping merger")
+                turn_logger.log("vote_winner", winner["strategy"])
+                return Command(
+                    goto=END,
+                    update={"logs": [{**winner, "strategy": NODE.vote}]},
+                )
+
         success_sqls = [s["sql"] for s in logs]
         merger_prompt = Text2SqlConstant.merger.format(
+            dialect=get_app_config().database.dialect.upper(),
             candidates="\n".join(
                 [
                     (f"Câu lệnh SQL {i+1}: " "\n```sql\n" f"{r}" "\n```")
@@ -117,7 +275,7 @@ class StrategyFactory:
         )
         turn_logger.log("merger_prompt", merger_prompt)
         try:
-            merger_response = self.merger_adapter.invoke(
+            merger_response = await self.merger_adapter.ainvoke(
                 {
                     "messages": [
                         {
@@ -143,7 +301,7 @@ class StrategyFactory:
         turn_logger.log("merger_result", merger_structured_response)
         update: StrategyState = {}
         sql = merger_structured_response["sql"]
-        exec_result, is_success = execute_sql(self._db, sql)
+        exec_result, is_success = await aexecute_sql(self._db, sql)
         update.update(
             {
                 "logs": [
@@ -1,12 +1,12 @@
 from sql_qa.config import get_app_config
 from sql_qa.llm.adapter import get_react_agent
+from sql_qa.llm.registry import get_agent
 from sql_qa.schema.graph import EnhancementState
 from shared.tool import get_current_date, get_current_time
 from sql_qa.prompt.template import Role
 
 from sql_qa.schema.tool import EnhancementResponse
 
-app_config = get_app_config()
 
 _SUFFIX_PROMPT = """
 **Lưu ý**:
@@ -20,11 +20,14 @@ _SUFFIX_PROMPT = """
 async def llm_clarify_date_time_tool(
     state: EnhancementState,
 ) -> EnhancementResponse:
-    agent_executor = get_react_agent(
-        model=app_config.orchestrator.model,
-        tools=[get_current_date, get_current_time],
-        prompt=None,
-        response_format=EnhancementResponse,
+    agent_executor = get_agent(
+        "clarify_date_time",
+        lambda: get_react_agent(
+            model=get_app_config().orchestrator.model,
+            tools=[get_current_date, get_current_time],
+            prompt=None,
+            response_format=EnhancementResponse,
+        ),
     )
     user_question = state.get("user_question", "")
     response = await agent_executor.ainvoke(
@@ -64,12 +67,14 @@ Thời gian hiện tại là: get_current_time()
 async def llm_intent_clarify_tool(
     state: EnhancementState,
 ) -> EnhancementResponse:
-    _agent_class = get_react_agent(app_config.orchestrator.model, original=True)
-    agent_executor = _agent_class(
-        model=app_config.orchestrator.model,
-        tools=[],
-        prompt=None,
-        response_format=EnhancementResponse,
+    agent_executor = get_agent(
+        "clarify_intent",
+        lambda: get_react_agent(
+            model=get_app_config().orchestrator.model,
+            tools=[],
+            prompt=None,
+            response_format=EnhancementResponse,
+        ),
     )
     user_question = state.get("user_question", "")
     response = await agent_executor.ainvoke(
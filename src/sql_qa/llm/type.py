@@ -64,6 +64,9 @@ class CandidateGenState(
 ):
     user_question: str
     execution_result: Optional[Any]
+    execution_summary: Optional[str]
+    # QueryResult.fingerprint() of the last execution
+    execution_fingerprint: Optional[str]
     is_execution_correct: bool
     strategy: Optional[str]
     enhanced_result: Optional[str]
@@ -82,6 +85,8 @@ class STRAT_GRAPH_NODE(NamedTuple):
     merge = "merge"
     strategy_gen = "strategy_gen"
     route = "route"
+    race = "race"
+    vote = "vote"
 
 
 class StrategyCandidate(TypedDict):
@@ -90,6 +95,9 @@ class StrategyCandidate(TypedDict):
     sql: Optional[str]
     execution_result: Optional[str]
     is_success: Optional[bool]
+    # validated and executed without error
+    is_valid: Optional[bool]
+    result_fingerprint: Optional[str]
 
 
 class StrategyState(TypedDict):
@@ -97,3 +105,16 @@ class StrategyState(TypedDict):
     user_question: str
     strategy: str
     logs: Annotated[List[StrategyCandidate], operator.add]
+
+
+class SqlAgentState(SqlLinkingTablesResponse, SQLGenerationResponse):
+    user_question: str
+    is_success: bool
+    final_sql: str
+    final_result: str
+    error: str
+    raw_result: str
+    candidate_generation: Optional[List[CandidateGenState]]
+    # "exact" | "semantic" when the answer came from the answer cache
+    answer_cache: Optional[str]
+    # schema_linking: List[Any]
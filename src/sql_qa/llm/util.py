@@ -1,4 +1,7 @@
+from typing import Any
+
 from shared.logger import logger
+from sql_qa.prompt.budget import count_tokens
 from tenacity import RetryCallState
 
 
@@ -12,3 +15,21 @@ def on_llm_retry_fail(retry_state: RetryCallState) -> None:
         )
     except Exception as e:
         logger.error(str(e))
+
+
+def estimate_tokens(payload: Any) -> int:
+    """Rough prompt size in tokens (see `count_tokens`) of an agent input:
+    strings, messages and nested dicts/lists of them."""
+    tokens = 0
+    stack = [payload]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            tokens += count_tokens(item)
+        elif isinstance(item, dict):
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+        elif hasattr(item, "content"):
+            stack.append(item.content)
+    return tokens + 1
@@ -0,0 +1,177 @@
+"""Concurrent, resumable benchmark runs.
+
+Questions are answered by a pool of asyncio workers. Every finished
+question is appended to a JSONL file right away, with its stage timings,
+so a crashed or interrupted run resumes where it stopped: questions whose
+ID already has a record are skipped. Questions that raised are retried on
+resume, those the agent answered (successfully or not) are not.
+
+LLM calls made by the workers run at `BATCH` priority, they share the
+per-model rate limiters with interactive traffic and queue behind it.
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+)
+
+from shared.logger import logger
+from shared.tracing import record_stages
+from sql_qa.llm.limiter import BATCH, llm_priority
+
+# status of a record
+OK = "ok"
+FAILED = "failed"
+ERROR = "error"
+
+
+class BenchmarkItem(NamedTuple):
+    id: str
+    question: str
+
+
+class JsonlSink:
+    """Append-only JSONL file of benchmark records, one line per question."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Records written so far, later records of an ID win."""
+        if not os.path.exists(self.path):
+            return []
+        records: Dict[str, Dict[str, Any]] = {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # a line torn by a crash, the question runs again
+                    logger.warning(f"Skipping unreadable line {number} of {self.path}")
+                    continue
+                records[record["id"]] = record
+        return list(records.values())
+
+    def completed_ids(self) -> Set[str]:
+        return {r["id"] for r in self.records() if r.get("status") != ERROR}
+
+    def write(self, record: Dict[str, Any]):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            torn = False
+            if os.path.exists(self.path) and os.path.getsize(self.path):
+                with open(self.path, "rb") as f:
+                    f.seek(-1, os.SEEK_END)
+                    torn = f.read(1) != b"\n"
+            self._file = open(self.path, "a", encoding="utf-8")
+            if torn:
+                # start on a new line after a line torn by a crash
+                self._file.write("\n")
+        self._file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _record(
+    item: BenchmarkItem,
+    response: Optional[Dict[str, Any]],
+    error: Optional[str],
+    started_at: float,
+    elapsed: float,
+    stages: Dict[str, float],
+) -> Dict[str, Any]:
+    if response is None:
+        status = ERROR
+    else:
+        status = OK if response.get("is_success") else FAILED
+    response = response or {}
+    return {
+        "id": item.id,
+        "question": item.question,
+        "status": status,
+        "sql": response.get("final_sql"),
+        "result": response.get("final_result"),
+        "error": error if error is not None else response.get("error"),
+        "answer_cache": response.get("answer_cache"),
+        "started_at": started_at,
+        "elapsed": round(elapsed, 4),
+        "stages": {name: round(seconds, 4) for name, seconds in stages.items()},
+    }
+
+
+async def run_benchmark(
+    items: Iterable[BenchmarkItem],
+    answer: Callable[[str], Awaitable[Dict[str, Any]]],
+    sink: JsonlSink,
+    workers: int = 4,
+    on_record: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """Answer every item not already in `sink` with `workers` concurrent
+    calls of `answer(question)`, writing one record per item."""
+    completed = sink.completed_ids()
+    queue: asyncio.Queue = asyncio.Queue()
+    skipped = 0
+    for item in items:
+        if item.id in completed:
+            skipped += 1
+        else:
+            queue.put_nowait(item)
+    total = queue.qsize()
+    if skipped:
+        logger.info(f"Resuming benchmark, {skipped} questions already done")
+    counts = {OK: 0, FAILED: 0, ERROR: 0}
+
+    async def worker():
+        while True:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            response, error = None, None
+            started_at = time.time()
+            start = time.perf_counter()
+            with record_stages() as stages:
+                try:
+                    response = await answer(item.question)
+                except Exception as e:
+                    logger.error(f"Error processing question {item.id}: {e}")
+                    error = str(e)
+            record = _record(
+                item, response, error, started_at, time.perf_counter() - start, stages
+            )
+            sink.write(record)
+            counts[record["status"]] += 1
+            if on_record is not None:
+                on_record(record)
+
+    start = time.perf_counter()
+    with llm_priority(BATCH):
+        await asyncio.gather(*(worker() for _ in range(max(1, min(workers, total)))))
+    elapsed = time.perf_counter() - start
+    return {
+        "total": total,
+        "skipped": skipped,
+        **counts,
+        "elapsed": elapsed,
+        "throughput": total / elapsed if elapsed else 0.0,
+    }
@@ -7,16 +7,21 @@ csv.field_size_limit(100 * 1024 * 1024)
 from typing import List, Tuple, Optional, Set, Iterator, Dict, Any, Literal, Union
 from pydantic import BaseModel, Field, field_validator
 import re
-from shared.db import get_db
+from shared.db import execute_query, get_db
 import click
 from enum import Enum, auto
 import json
 from pathlib import Path
-from tqdm import tqdm
-import sqlglot
 from sql_qa.config import get_app_config
+from sql_qa.llm.limiter import BATCH, llm_priority, rate_limited
+from sql_qa.llm.response_cache import (
+    MODES as CACHE_MODES,
+    cache_agent_calls,
+    set_response_cache_mode,
+)
 
-from langgraph.prebuilt import create_react_agent
+# sqlglot, tqdm and langgraph are imported where used, the CLI starts
+# without them
 
 # from langchain.chat_models import init_chat_model
 
@@ -26,9 +31,6 @@ class MetricType(Enum):
     EXECUTION_MATCH = auto()
 
 
-app_config = get_app_config()
-
-
 class DetailedResult(BaseModel):
     question: str = Field(description="User's natural language question")
     generated: str = Field(description="SQL query generated by the model")
@@ -91,9 +93,11 @@ class SQLMetrics:
         Returns:
             Normalized SQL query string
         """
+        import sqlglot
+
         try:
             return sqlglot.transpile(
-                sql, write=app_config.database.dialect.lower(), pretty=True
+                sql, write=get_app_config().database.dialect.lower(), pretty=True
             )[0]
         except Exception:
             return ""
@@ -105,13 +109,15 @@ class SQLMetrics:
             sql: SQL query string
 
         Returns:
-            Query results as a list of tuples, or None if execution fails
+            Every row of the query as a list of tuples, or None if execution
+            fails. Execution match compares full results, not the row-capped
+            prefix the agent sees.
         """
-        try:
-            return self.db.run(sql)
-        except Exception as e:
-            print(f"Error executing query: {e}")
+        result = execute_query(self.db, sql)
+        if not result.is_success:
+            print(f"Error executing query: {result.error}")
             return None
+        return result.fetch_all()
 
     def evaluate_queries(
         self, predicted_queries: List[str], ground_truth_queries: List[str]
@@ -166,8 +172,10 @@ class SQLMetrics:
                     question=pred,
                     generated=pred,
                     ground_truth=truth,
-                    ground_truth_result=truth_results[0][0] if truth_results else None,
-                    generated_result=pred_results[0][0] if pred_results else None,
+                    ground_truth_result=(
+                        str(truth_results[0][0]) if truth_results else None
+                    ),
+                    generated_result=str(pred_results[0][0]) if pred_results else None,
                     metrics=query_results,
                 )
             )
@@ -222,9 +230,16 @@ def read_sql_pairs_from_csv(csv_file: str) -> Iterator[Dict[str, Any]]:
 
 
 @click.group()
-def cli():
+@click.option(
+    "--llm-cache",
+    type=click.Choice(CACHE_MODES),
+    default=None,
+    help="LLM response cache mode, overrides llm_cache.mode",
+)
+def cli(llm_cache: Optional[str]):
     """SQL evaluation metrics CLI."""
-    pass
+    if llm_cache:
+        set_response_cache_mode(llm_cache)
 
 
 @cli.command()
@@ -265,6 +280,8 @@ def evaluate_files(
     with open(ground_truth_file, "r", encoding="utf-8") as f:
         ground_truth_queries = [line.strip() for line in f if line.strip()]
 
+    from tqdm import tqdm
+
     # Evaluate queries with progress bar
     detailed_results = []
     metric_scores = {metric: 0 for metric in metric_types}
@@ -303,8 +320,10 @@ def evaluate_files(
                 question=pred,
                 generated=pred,
                 ground_truth=truth,
-                ground_truth_result=truth_results[0][0] if truth_results else None,
-                generated_result=pred_results[0][0] if pred_results else None,
+                ground_truth_result=(
+                    str(truth_results[0][0]) if truth_results else None
+                ),
+                generated_result=str(pred_results[0][0]) if pred_results else None,
                 metrics=query_results,
             )
         )
@@ -589,6 +608,8 @@ class LLMMetrics:
             model: The LLM model to use for evaluation. If None, uses the default model from config.
             prompt: The prompt template to use for evaluation. Defaults to detailed evaluation.
         """
+        from langgraph.prebuilt import create_react_agent
+
         self.tools = []
         self.prompt = prompt
 
@@ -597,8 +618,14 @@ class LLMMetrics:
         if prompt == JUDGE_BINARY_PROMPT:
             response_format = BinaryEvaluationResponse
 
-        self.agent_executor = create_react_agent(
-            model, self.tools, prompt=prompt, response_format=response_format
+        self.model = model
+        self.agent_executor = cache_agent_calls(
+            create_react_agent(
+                model, self.tools, prompt=prompt, response_format=response_format
+            ),
+            str(model),
+            prompt=prompt,
+            response_format=response_format,
         )
 
     def evaluate_query_pair(
@@ -631,9 +658,10 @@ class LLMMetrics:
             )
 
             try:
-                response = self.agent_executor.invoke(
-                    {"messages": [{"role": "user", "content": prompt}]}
-                )
+                payload = {"messages": [{"role": "user", "content": prompt}]}
+                # evaluation traffic queues behind interactive turns
+                with llm_priority(BATCH), rate_limited(str(self.model), payload):
+                    response = self.agent_executor.invoke(payload)
             except Exception as e:
                 print(f"LLM API error: {str(e)}")
                 return self._get_error_response("LLM API error")
@@ -735,6 +763,8 @@ class LLMMetrics:
         Returns:
             EvaluationResult containing requested metrics
         """
+        from tqdm import tqdm
+
         detailed_results = []
         # Initialize metrics based on prompt type
         if self.prompt == JUDGE_BINARY_PROMPT:
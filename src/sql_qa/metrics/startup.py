@@ -0,0 +1,104 @@
+"""Cold start benchmark of the entry points.
+
+Every run starts a fresh interpreter, nothing is reused between runs but
+the OS file cache (as for a restarted server). `python -X importtime`
+breaks an import down per module to find what to defer.
+"""
+
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+import click
+
+# name -> interpreter arguments, the process exits once the entry point is
+# ready to serve
+COMMANDS: Dict[str, List[str]] = {
+    "cli": ["-m", "sql_qa.serving.sql", "--help"],
+    "mcp-server": ["-m", "sql_qa.serving.sql", "mcp-server", "--help"],
+    "benchmark": ["-m", "sql_qa.serving.sql", "benchmark", "--help"],
+    "evaluation": ["-m", "sql_qa.metrics.evaluation", "--help"],
+    "traces": ["-m", "sql_qa.metrics.traces", "--help"],
+}
+
+
+def run_seconds(args: List[str]) -> float:
+    """Wall time of `python <args>` in a new interpreter."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, *args], capture_output=True, text=True, timeout=300
+    )
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise click.ClickException(
+            f"`python {' '.join(args)}` failed:\n{result.stderr.strip()}"
+        )
+    return elapsed
+
+
+def import_times(module: str) -> List[Tuple[str, float, float]]:
+    """(module, self seconds, cumulative seconds) of every module loaded by
+    `import <module>` in a new interpreter, in import order."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        timeout=300,
+    )
+    if result.returncode != 0:
+        raise ImportError(result.stderr.strip().splitlines()[-1])
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:") :].split("|")
+        times.append((name.strip(), int(own) / 1e6, int(cumulative) / 1e6))
+    return times
+
+
+def cumulative_import_time(module: str) -> float:
+    """Seconds `import <module>` takes in a new interpreter."""
+    for name, _, cumulative in import_times(module):
+        if name == module:
+            return cumulative
+    raise ValueError(f"{module} not in the importtime output")
+
+
+@click.group()
+def cli():
+    """Startup time reports."""
+    pass
+
+
+@cli.command()
+@click.option("--runs", default=5, help="Cold starts per entry point")
+@click.argument("names", nargs=-1, type=click.Choice(sorted(COMMANDS)))
+def startup(runs: int, names: Tuple[str, ...]):
+    """Time until each entry point is ready, over fresh interpreters."""
+    baseline = statistics.median(run_seconds(["-c", "pass"]) for _ in range(runs))
+    click.echo(f"{'entry point':<14}{'median':>9}{'min':>9}{'max':>9}")
+    click.echo(f"{'(python)':<14}{baseline:>9.3f}")
+    for name in names or COMMANDS:
+        seconds = [run_seconds(COMMANDS[name]) for _ in range(runs)]
+        click.echo(
+            f"{name:<14}{statistics.median(seconds):>9.3f}"
+            f"{min(seconds):>9.3f}{max(seconds):>9.3f}"
+        )
+
+
+@cli.command()
+@click.argument("module")
+@click.option("--top", default=20, help="Number of modules listed")
+def imports(module: str, top: int):
+    """Slowest modules loaded by importing MODULE, by cumulative time."""
+    times = import_times(module)
+    total = next(c for name, _, c in times if name == module)
+    click.echo(f"import {module}: {total:.3f}s")
+    for name, own, cumulative in sorted(times, key=lambda t: -t[2])[:top]:
+        click.echo(f"{cumulative:>8.3f}{own:>8.3f}  {name}")
+
+
+if __name__ == "__main__":
+    cli()
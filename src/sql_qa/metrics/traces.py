@@ -0,0 +1,57 @@
+import json
+from typing import Optional
+
+import click
+
+from shared.tracing import read_spans, summarize_spans
+
+
+@click.group()
+def cli():
+    """Span trace reports."""
+    pass
+
+
+@cli.command()
+@click.argument("spans_file", type=click.Path(exists=True))
+@click.option(
+    "--name",
+    default=None,
+    help="Only spans whose name starts with this, e.g. cot_generation.",
+)
+@click.option(
+    "--sort",
+    default="total",
+    type=click.Choice(["total", "mean", "p95", "count"]),
+    help="Column to sort the report by",
+)
+@click.option("--output-file", default=None, help="Also write the report as JSON")
+def summary(spans_file: str, name: Optional[str], sort: str, output_file: Optional[str]):
+    """Latency, token and cache statistics per span name."""
+    import pandas as pd
+
+    spans = read_spans(spans_file)
+    if name:
+        spans = [s for s in spans if s["name"].startswith(name)]
+    if not spans:
+        click.echo("No spans found")
+        return
+    report = summarize_spans(spans)
+    turns = sum(1 for s in spans if s.get("parent_id") is None and s["name"] == "turn")
+
+    df = pd.DataFrame.from_dict(report, orient="index").sort_values(
+        sort, ascending=False
+    )
+    with pd.option_context(
+        "display.max_columns", None, "display.width", 200, "display.precision", 3
+    ):
+        click.echo(df.fillna(0))
+    click.echo(f"Spans: {len(spans)}, turns: {turns}")
+    if output_file:
+        with open(output_file, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        click.echo(f"Report written to {output_file}")
+
+
+if __name__ == "__main__":
+    cli()
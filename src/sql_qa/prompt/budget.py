@@ -0,0 +1,152 @@
+"""Token budgets for prompts.
+
+Token counts are a local estimate, no tokenizer download or API call:
+words and punctuation are counted the way BPE tokenizers split them, long
+words as one token per 4 characters. It errs on the high side, which is
+the safe side for a budget.
+
+A `PromptBudget` bounds a formatted `PromptTemplate`; when the prompt is
+over budget its trimmable fields (execution results, evidence) are shrunk
+in order until it fits. Schemas are fitted separately, see
+`sql_qa.schema.render.fit_schema`.
+"""
+
+import re
+from typing import Any, Callable, Dict, Mapping, Optional
+
+from shared.logger import logger
+
+# (text, max_tokens) -> text of at most max_tokens
+Trimmer = Callable[[str, int], str]
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_ROW_SPLIT_RE = re.compile(r"(?<=\)), (?=\()")
+# room kept for the "... [n tokens omitted]" note
+_NOTE_TOKENS = 12
+
+
+def _piece_tokens(piece: str) -> int:
+    return (len(piece) + 3) // 4
+
+
+def count_tokens(text: str) -> int:
+    """Estimated number of tokens in `text`."""
+    return sum(_piece_tokens(piece) for piece in _TOKEN_RE.findall(text))
+
+
+def _cut(text: str, max_tokens: int) -> str:
+    """Longest prefix of `text` within `max_tokens`."""
+    used = 0
+    for match in _TOKEN_RE.finditer(text):
+        used += _piece_tokens(match.group())
+        if used > max_tokens:
+            return text[: match.start()].rstrip()
+    return text
+
+
+def truncate_text(text: str, max_tokens: int) -> str:
+    """Head of `text` within `max_tokens`, ending with a note of what was cut."""
+    total = count_tokens(text)
+    if total <= max_tokens:
+        return text
+    kept = _cut(text, max(max_tokens - _NOTE_TOKENS, 0))
+    # end on a line boundary unless that throws away most of what fits
+    line_end = kept.rfind("\n")
+    if line_end > len(kept) // 2:
+        kept = kept[:line_end]
+    return f"{kept}\n... [{total - count_tokens(kept)} tokens omitted]"
+
+
+def summarize_rows(text: str, max_tokens: int) -> str:
+    """First rows of an execution result within `max_tokens`.
+
+    Understands both `QueryResult.to_text` (a list of tuples) and
+    `QueryResult.summary` (one row per line). Errors and other text are
+    truncated like `truncate_text`.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    body = text.split("\n... ", 1)[0]
+    if "\n" in body:
+        rows, opening, closing, separator = body.split("\n"), "", "", "\n"
+    elif body.startswith("[(") and body.endswith(")]"):
+        rows, opening, closing, separator = (
+            _ROW_SPLIT_RE.split(body[1:-1]),
+            "[",
+            "]",
+            ", ",
+        )
+    else:
+        return truncate_text(text, max_tokens)
+
+    budget = max_tokens - _NOTE_TOKENS - count_tokens(opening + closing)
+    kept = []
+    for row in rows:
+        budget -= count_tokens(row)
+        if budget < 0:
+            break
+        kept.append(row)
+    if not kept:
+        return truncate_text(text, max_tokens)
+    omitted = len(rows) - len(kept)
+    more = f"{omitted}+" if body != text else str(omitted)
+    return f"{opening}{separator.join(kept)}{closing}\n... {more} more rows"
+
+
+class PromptBudget:
+    """Most tokens a formatted prompt may take, and how to get there.
+
+    `trimmers` maps template fields to the function shrinking them, in the
+    order fields are given up: the first one is shrunk as far as needed
+    (down to `min_field_tokens`) before the next one is touched. Fields
+    without a trimmer are never changed.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int,
+        trimmers: Optional[Mapping[str, Trimmer]] = None,
+        min_field_tokens: int = 64,
+    ):
+        self.max_tokens = max_tokens
+        self.trimmers = dict(trimmers or {})
+        self.min_field_tokens = min_field_tokens
+
+    def fit(self, template: str, values: Mapping[str, Any]) -> Dict[str, Any]:
+        """`values` with trimmable fields shrunk so `template` fits."""
+        values = dict(values)
+        overflow = count_tokens(template.format(**values)) - self.max_tokens
+        for field, trim in self.trimmers.items():
+            if overflow <= 0:
+                break
+            if field not in values:
+                continue
+            text = str(values[field])
+            size = count_tokens(text)
+            target = max(size - overflow, self.min_field_tokens)
+            if target >= size:
+                continue
+            values[field] = trim(text, target)
+            overflow -= size - count_tokens(values[field])
+        if overflow > 0:
+            logger.warning(
+                f"Prompt still {overflow} tokens over its {self.max_tokens} budget"
+            )
+        return values
+
+
+def budget_limit(name: str) -> Optional[int]:
+    """Token limit `prompt_budget.<name>`, None when unset or disabled."""
+    from sql_qa.config import as_bool, get_app_config
+
+    config = get_app_config().get("prompt_budget") or {}
+    if not as_bool(config.get("enabled", True)):
+        return None
+    limit = config.get(name)
+    return int(limit) if limit else None
+
+
+def prompt_budget(name: str, trimmers: Mapping[str, Trimmer]) -> Optional[PromptBudget]:
+    """`PromptBudget` for the `prompt_budget.<name>` limit, if any."""
+    limit = budget_limit(name)
+    return None if limit is None else PromptBudget(limit, trimmers)
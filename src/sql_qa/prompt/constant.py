@@ -1,8 +1,5 @@
 from re import template
 from sql_qa.prompt.template import PromptTemplate, Role, TemplateMetadata
-from sql_qa.config import get_app_config
-
-app_config = get_app_config()
 
 
 class DomainConstant:
@@ -263,22 +260,20 @@ class Text2SqlConstant:
     - Phải tuân thủ đúng cú pháp và các quy tắc của hệ quản trị cơ sở dữ liệu {dialect}.
     - Câu truy vấn SQL phải chứa thông tin có ý nghĩa và dễ hiểu cho người dùng.
     
-    """.format(
-        dialect=app_config.database.dialect.upper()
-    )
+    """
     _gen_suffix = f"""
     **Đầu vào**:
     - Câu hỏi SQL: {{question}}
-    - Cấu trúc cơ sở dữ liệu: {{schema}}
+    - Cấu trúc cơ sở dữ liệu: xem `Cấu trúc cơ sở dữ liệu` ở phần đầu
     - Bằng chứng: 
 {{evidence}}
     - Nhắc lại câu hỏi SQL: {{question}}
-    - Hệ quản trị cơ sở dữ liệu: {app_config.database.dialect.upper()}
+    - Hệ quản trị cơ sở dữ liệu: {{dialect}}
 
     --- 
     
     **Đầu ra**:
-    - Câu lệnh {app_config.database.dialect.upper()}: 
+    - Câu lệnh {{dialect}}: 
     - Giải thích: 
     """
     system: PromptTemplate = PromptTemplate(
@@ -292,6 +287,24 @@ Là một quản trị viên cơ sở dữ liệu chuyên nghiệp và giàu kin
             tags=["system"],
         ),
     )
+    # Shared prefix of the generation, validation and fixing prompts. It only
+    # depends on the filtered schema, so it stays identical across retries
+    # and strategies and can be cached by the provider.
+    context: PromptTemplate = PromptTemplate(
+        template="""
+Là một quản trị viên cơ sở dữ liệu chuyên nghiệp và giàu kinh nghiệm, nhiệm vụ của bạn là phân tích câu hỏi của người dùng và lược đồ cơ sở dữ liệu {dialect} để cung cấp thông tin liên quan. Bạn được cung cấp `Câu hỏi` của người dùng và `Lược đồ DB` chứa cấu trúc cơ sở dữ liệu.
+
+**Cấu trúc cơ sở dữ liệu**:
+{schema}
+{examples}
+        """,
+        role=Role.SYSTEM,
+        metadata=TemplateMetadata(
+            version="1.0",
+            author="msc-sql",
+            tags=["system", "schema"],
+        ),
+    )
     table_linking: PromptTemplate = PromptTemplate(
         template="""
 Hãy suy nghĩ từng bước. Xác định và liệt kê tất cả các tên bảng liên quan từ lược đồ DB dựa trên câu hỏi của người dùng và lược đồ cơ sở dữ liệu được cung cấp. Hãy đảm bảo bạn bao gồm tất cả các bảng liên quan.
@@ -359,7 +372,7 @@ Bạn là chuyên gia SQL có nhiệm vụ tạo câu truy vấn SQL dựa trên
 - Gạch chân các thực thể (ví dụ: người dùng, sản phẩm, đơn hàng) và các điều kiện/tiêu chí (ví dụ: ngày, số lượng, trạng thái).
 
 **Bước 2: Xác định Bảng và Liên kết (JOIN) cần thiết**
-- Dựa vào Bước 1 và `Cấu trúc cơ sở dữ liệu: {{schema}}`, hãy liệt kê các bảng có khả năng chứa thông tin liên quan.
+- Dựa vào Bước 1 và `Cấu trúc cơ sở dữ liệu` ở phần đầu, hãy liệt kê các bảng có khả năng chứa thông tin liên quan.
 - Kiểm tra `Bằng chứng: {{evidence}}` để hiểu rõ hơn về mối quan hệ giữa các bảng và ý nghĩa của các cột.
 - Nếu cần thông tin từ nhiều bảng, hãy xác định các mối quan hệ (ví dụ: khóa chính/khóa ngoại) và quyết định loại JOIN (INNER JOIN, LEFT JOIN, v.v.) phù hợp. Mục tiêu là thu thập tất cả dữ liệu cần thiết để trả lời câu hỏi.
 
@@ -421,7 +434,7 @@ Bạn là một chuyên gia chuyển đổi câu hỏi tự nhiên thành câu l
     *   Chỉ trả về các cột ID nếu câu hỏi SQL yêu cầu *cụ thể* ID, hoặc nếu không có bất kỳ cột mô tả nào khác phù hợp.
     *   Sử dụng `AS` (Alias) để đặt tên cột thân thiện hơn nếu tên gốc khó hiểu.
 ---
-**Cấu trúc cơ sở dữ liệu:** {{schema}}
+**Cấu trúc cơ sở dữ liệu:** xem ở phần đầu
 **Bằng chứng (Các bản ghi mẫu và mô tả cột):** 
 {{evidence}}
 **Câu hỏi SQL:** {{question}}
@@ -503,7 +516,7 @@ Bạn là một chuyên gia chuyển đổi câu hỏi tự nhiên thành câu l
 
 ---
 
-**Cấu trúc cơ sở dữ liệu:** {{schema}}
+**Cấu trúc cơ sở dữ liệu:** xem ở phần đầu
 **Bằng chứng (Các bản ghi mẫu và mô tả cột):** 
 {{evidence}}
 
@@ -587,8 +600,7 @@ Bạn là một chuyên gia cơ sở dữ liệu SQL được giao nhiệm vụ
 
 ======= Nhiệm vụ của bạn ======= 
 ************************** 
-Các câu lệnh tạo bảng 
-{{schema}} 
+Các câu lệnh tạo bảng: xem `Cấu trúc cơ sở dữ liệu` ở phần đầu 
 ************************** 
 Câu hỏi gốc là: 
 - Câu hỏi: {{question}} 
@@ -629,7 +641,7 @@ Bạn là chuyên gia SQL có nhiệm vụ kiểm tra tính hợp lệ của câ
 - Sử dụng đúng số lượng tham số cho các hàm
 - Ép kiểu sang đúng kiểu dữ liệu
 - Sử dụng đúng cột cho các phép nối
-- Cú pháp có đúng hệ quản trị cơ sở dữ liệu: {app_config.database.dialect.upper()}
+- Cú pháp có đúng hệ quản trị cơ sở dữ liệu: {{dialect}}
 
 Nếu có bất kỳ lỗi nào trong số các lỗi trên, trả về `false`. Nếu không có lỗi nào, chỉ cần trả về `true`.
         """,
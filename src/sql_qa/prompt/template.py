@@ -5,6 +5,8 @@ from enum import Enum
 import json
 import re
 
+from sql_qa.prompt.budget import PromptBudget
+
 
 class Role(str, Enum):
     """Enum for different roles in a conversation."""
@@ -21,6 +23,27 @@ class Message(BaseModel):
     content: str
 
 
+class PromptParts(BaseModel):
+    """A prompt split into a stable prefix and a per-call suffix.
+
+    The prefix (system prompt, schema, few-shots) is byte-identical for every
+    call that shares it, so providers can cache it; only the suffix changes
+    between retries and strategies.
+    """
+
+    prefix: str
+    suffix: str
+
+    def to_messages(self) -> List[Message]:
+        return [
+            Message(role=Role.SYSTEM, content=self.prefix),
+            Message(role=Role.USER, content=self.suffix),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.prefix}\n{self.suffix}"
+
+
 class TemplateMetadata(BaseModel):
     """Metadata for a prompt template."""
 
@@ -40,16 +63,19 @@ class PromptTemplate(BaseModel):
         default_factory=TemplateMetadata, description="Metadata for the template"
     )
 
-    def format(self, **kwargs) -> str:
+    def format(self, budget: Optional[PromptBudget] = None, **kwargs) -> str:
         """
         Format the template with provided variables.
 
         Args:
+            budget: Token budget, trimmable variables are shrunk to fit it
             **kwargs: Variables to substitute in the template
 
         Returns:
             Formatted prompt string
         """
+        if budget is not None:
+            kwargs = budget.fit(self.template, kwargs)
 
         # Use string Template for safe substitution
         return self.template.format(**kwargs)
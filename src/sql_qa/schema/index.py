@@ -0,0 +1,216 @@
+from collections import defaultdict
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+)
+
+from sql_qa.schema.render import schema_fingerprint, table_fingerprint
+
+if TYPE_CHECKING:
+    from sql_qa.schema.store import Column, Schema, Table
+
+
+def normalize_name(name: str) -> str:
+    return name.strip().lower()
+
+
+def short_name(name: str) -> str:
+    """Table name without its database/schema qualifier, normalized."""
+    return normalize_name(name).rsplit(".", 1)[-1]
+
+
+class ForeignKey(NamedTuple):
+    source_table: str
+    source_column: str
+    target_table: str
+    target_column: str
+    raw: str
+
+
+class JoinTree(NamedTuple):
+    tables: Set[str]
+    foreign_keys: List[ForeignKey]
+    # terminals not reachable from the rest within the hop bound
+    disconnected: Set[str]
+
+
+class SchemaIndex:
+    """Lookup structures precompiled from one `Schema`.
+
+    Built once when the schema is added to the store so searches are
+    dictionary lookups and graph walks instead of re-normalizing names and
+    re-parsing foreign-key strings on every call.
+    """
+
+    def __init__(self, schema: "Schema"):
+        self.schema = schema
+        self.tables: Dict[str, "Table"] = {}
+        self.positions: Dict[str, int] = {}
+        self.by_name: Dict[str, str] = {}
+        self.by_short_name: Dict[str, List[str]] = defaultdict(list)
+        self.columns: Dict[str, Dict[str, "Column"]] = {}
+        self.foreign_keys: List[ForeignKey] = []
+        self.fks_by_table: Dict[str, List[ForeignKey]] = defaultdict(list)
+        self.adjacency: Dict[str, Set[str]] = defaultdict(set)
+        self.edges: Dict[FrozenSet[str], List[ForeignKey]] = defaultdict(list)
+
+        for position, table in enumerate(schema.tables or []):
+            self.tables[table.name] = table
+            self.positions[table.name] = position
+            self.by_name[normalize_name(table.name)] = table.name
+            self.by_short_name[short_name(table.name)].append(table.name)
+            self.columns[table.name] = {
+                normalize_name(column.name): column for column in table.columns
+            }
+        fingerprints = [table_fingerprint(table) for table in schema.tables or []]
+        self.table_fingerprints: Dict[str, str] = {
+            table.name: fingerprint
+            for table, fingerprint in zip(schema.tables or [], fingerprints)
+        }
+        self.fingerprint = schema_fingerprint(schema, fingerprints)
+        self._lowered = [(normalize_name(name), name) for name in self.tables]
+
+        for raw in schema.foreign_keys or []:
+            fk = self._parse_foreign_key(raw)
+            if fk is None:
+                continue
+            self.foreign_keys.append(fk)
+            self.fks_by_table[fk.source_table].append(fk)
+            if fk.target_table != fk.source_table:
+                self.fks_by_table[fk.target_table].append(fk)
+            self.adjacency[fk.source_table].add(fk.target_table)
+            self.adjacency[fk.target_table].add(fk.source_table)
+            self.edges[frozenset((fk.source_table, fk.target_table))].append(fk)
+
+    def _resolve_column_ref(self, ref: str) -> Optional[tuple]:
+        """Split `table.column` (table possibly qualified) into its parts."""
+        ref = ref.strip()
+        if "." not in ref:
+            return None
+        table, column = ref.rsplit(".", 1)
+        table = table.strip()
+        resolved = self.by_name.get(normalize_name(table))
+        if resolved is None:
+            # Unknown tables are kept verbatim so FKs to tables missing from
+            # the schema still show up in adjacency, as they did before.
+            resolved = table
+        return resolved, column.strip()
+
+    def _parse_foreign_key(self, raw: str) -> Optional[ForeignKey]:
+        parts = raw.split("=")
+        if len(parts) != 2:
+            return None
+        source = self._resolve_column_ref(parts[0])
+        target = self._resolve_column_ref(parts[1])
+        if source is None or target is None:
+            return None
+        return ForeignKey(source[0], source[1], target[0], target[1], raw)
+
+    def lookup(self, name: str) -> Optional["Table"]:
+        table_name = self.by_name.get(normalize_name(name))
+        return self.tables.get(table_name) if table_name else None
+
+    def column(self, table_name: str, column_name: str) -> Optional["Column"]:
+        return self.columns.get(table_name, {}).get(normalize_name(column_name))
+
+    def match(self, query: str, mode: str) -> Set[str]:
+        """Table names matching `query`: by unqualified name for "same",
+        by substring for "exact"/"connected"."""
+        if mode == "same":
+            return set(self.by_short_name.get(normalize_name(query), ()))
+        query = normalize_name(query)
+        return {name for lowered, name in self._lowered if query in lowered}
+
+    def neighbors(self, table_name: str) -> Set[str]:
+        return self.adjacency.get(table_name, set())
+
+    def _position(self, table_name: str) -> int:
+        return self.positions.get(table_name, len(self.positions))
+
+    def _nearest_path(
+        self, tree: Set[str], targets: Set[str], max_hops: Optional[int]
+    ) -> Optional[List[str]]:
+        """Shortest path from any table of `tree` to the closest of `targets`.
+
+        Layered BFS bounded by `max_hops`. Among equally short paths the one
+        through the least connected intermediate tables wins: hub tables
+        (status/reference lookups) join everything and are poor bridges.
+        """
+        cost: Dict[str, int] = {table: 0 for table in tree}
+        parent: Dict[str, Optional[str]] = {table: None for table in tree}
+        frontier = sorted(tree, key=self._position)
+        depth = 0
+        while frontier and (max_hops is None or depth < max_hops):
+            depth += 1
+            layer: Dict[str, int] = {}
+            for table in frontier:
+                for neighbor in self.adjacency.get(table, ()):
+                    if neighbor in parent and neighbor not in layer:
+                        continue
+                    penalty = 0 if neighbor in targets else len(self.adjacency[neighbor])
+                    candidate = cost[table] + penalty
+                    if neighbor not in layer or candidate < layer[neighbor]:
+                        layer[neighbor] = candidate
+                        parent[neighbor] = table
+            cost.update(layer)
+            reached = [table for table in layer if table in targets]
+            if reached:
+                end = min(reached, key=lambda t: (layer[t], self._position(t)))
+                path = [end]
+                while parent[path[-1]] is not None:
+                    path.append(parent[path[-1]])
+                return path[::-1]
+            frontier = sorted(layer, key=self._position)
+        return None
+
+    def join_tree(
+        self, tables: Iterable[str], max_hops: Optional[int] = None
+    ) -> JoinTree:
+        """Small tree of FK joins linking `tables`.
+
+        Greedy Steiner-tree approximation: grow the tree from the first table
+        by repeatedly attaching the nearest remaining table along its shortest
+        FK path of at most `max_hops` joins. Tables that cannot be reached
+        start their own component.
+        """
+        remaining = sorted(set(tables), key=self._position)
+        if not remaining:
+            return JoinTree(set(), [], set())
+        tree = {remaining.pop(0)}
+        edges: List[ForeignKey] = []
+        targets = set(remaining)
+        while targets:
+            path = self._nearest_path(tree, targets, max_hops)
+            if path is None:
+                # Nothing reachable from the tree; continue from the next table.
+                table = min(targets, key=self._position)
+                tree.add(table)
+                targets.discard(table)
+                continue
+            for left, right in zip(path, path[1:]):
+                edges.extend(self.edges[frozenset((left, right))])
+            tree.update(path)
+            targets -= tree
+        joined = {t for fk in edges for t in (fk.source_table, fk.target_table)}
+        disconnected = {t for t in tree if t not in joined} if len(tree) > 1 else set()
+        return JoinTree(tree, edges, disconnected)
+
+    def foreign_keys_between(self, tables: Iterable[str]) -> List[str]:
+        """Raw FK strings whose both ends are in `tables`, in schema order."""
+        tables = set(tables)
+        return [
+            fk.raw
+            for fk in self.foreign_keys
+            if fk.source_table in tables and fk.target_table in tables
+        ]
+
+    def ordered(self, tables: Iterable[str]) -> List["Table"]:
+        """Known tables among `tables`, in schema order."""
+        known = [name for name in set(tables) if name in self.tables]
+        return [self.tables[name] for name in sorted(known, key=self.positions.get)]
@@ -0,0 +1,385 @@
+"""Build `Schema` objects straight from the connected database.
+
+The catalog is read with one bulk query for columns and one for foreign
+keys per database, instead of a round-trip per table. Example values are
+sampled from a few rows per table, concurrently on the shared engine pool,
+and the result can be cached to disk as the same JSON `Schema.load` reads.
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import click
+from sqlalchemy import exc, text
+from sqlalchemy.engine import Engine
+
+from shared.context import submit
+from shared.logger import logger
+from sql_qa.schema.store import Column, Schema, Table
+
+_COLUMNS_SQL = {
+    "mysql": """
+        SELECT c.TABLE_NAME, c.COLUMN_NAME, c.COLUMN_TYPE, c.COLUMN_COMMENT,
+               t.TABLE_COMMENT, t.TABLE_ROWS
+        FROM information_schema.COLUMNS c
+        JOIN information_schema.TABLES t
+          ON t.TABLE_SCHEMA = c.TABLE_SCHEMA AND t.TABLE_NAME = c.TABLE_NAME
+        WHERE c.TABLE_SCHEMA = COALESCE(:db_schema, DATABASE())
+          AND t.TABLE_TYPE = 'BASE TABLE'
+        ORDER BY c.TABLE_NAME, c.ORDINAL_POSITION
+    """,
+    # information_schema has no comments in postgres, pg_catalog has both
+    "postgresql": """
+        SELECT c.relname, a.attname, format_type(a.atttypid, a.atttypmod),
+               col_description(c.oid, a.attnum), obj_description(c.oid, 'pg_class'),
+               c.reltuples
+        FROM pg_catalog.pg_class c
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+        JOIN pg_catalog.pg_attribute a ON a.attrelid = c.oid
+        WHERE n.nspname = COALESCE(:db_schema, current_schema())
+          AND c.relkind IN ('r', 'p') AND a.attnum > 0 AND NOT a.attisdropped
+        ORDER BY c.relname, a.attnum
+    """,
+    "sqlite": """
+        SELECT m.name, p.name, p.type, NULL, NULL, NULL
+        FROM sqlite_master m JOIN pragma_table_info(m.name) p
+        WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%'
+        ORDER BY m.name, p.cid
+    """,
+}
+
+_FOREIGN_KEYS_SQL = {
+    "mysql": """
+        SELECT TABLE_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME
+        FROM information_schema.KEY_COLUMN_USAGE
+        WHERE TABLE_SCHEMA = COALESCE(:db_schema, DATABASE())
+          AND REFERENCED_TABLE_NAME IS NOT NULL
+        ORDER BY TABLE_NAME, CONSTRAINT_NAME, ORDINAL_POSITION
+    """,
+    "postgresql": """
+        SELECT cl.relname, att.attname, fcl.relname, fatt.attname
+        FROM pg_catalog.pg_constraint con
+        JOIN pg_catalog.pg_class cl ON cl.oid = con.conrelid
+        JOIN pg_catalog.pg_namespace n ON n.oid = cl.relnamespace
+        JOIN pg_catalog.pg_class fcl ON fcl.oid = con.confrelid
+        CROSS JOIN LATERAL unnest(con.conkey, con.confkey) AS k(attnum, fattnum)
+        JOIN pg_catalog.pg_attribute att
+          ON att.attrelid = con.conrelid AND att.attnum = k.attnum
+        JOIN pg_catalog.pg_attribute fatt
+          ON fatt.attrelid = con.confrelid AND fatt.attnum = k.fattnum
+        WHERE con.contype = 'f' AND n.nspname = COALESCE(:db_schema, current_schema())
+        ORDER BY cl.relname, con.conname
+    """,
+    "sqlite": """
+        SELECT m.name, f."from", f."table", f."to"
+        FROM sqlite_master m JOIN pragma_foreign_key_list(m.name) f
+        WHERE m.type = 'table'
+        ORDER BY m.name, f.id, f.seq
+    """,
+}
+
+# Above this estimated row count postgres samples with TABLESAMPLE instead of
+# reading the first rows, which tend to be the oldest and least varied.
+_TABLESAMPLE_MIN_ROWS = 100_000
+_EXAMPLE_MAX_CHARS = 50
+
+
+class _CatalogTable(NamedTuple):
+    name: str
+    description: Optional[str]
+    estimated_rows: Optional[float]
+    columns: List[Tuple[str, str, str]]
+
+
+def _dialect_name(engine: Engine) -> str:
+    name = engine.dialect.name
+    return "mysql" if name == "mariadb" else name
+
+
+def read_catalog(
+    engine: Engine, db_schema: Optional[str] = None
+) -> Tuple[Dict[str, _CatalogTable], List[str]]:
+    """Tables with their columns, and FKs as `table.column=table.column`."""
+    dialect = _dialect_name(engine)
+    if dialect not in _COLUMNS_SQL:
+        return _read_catalog_inspector(engine, db_schema)
+    params = {"db_schema": db_schema}
+    tables: Dict[str, _CatalogTable] = {}
+    with engine.connect() as conn:
+        for row in conn.execute(text(_COLUMNS_SQL[dialect]), params):
+            table_name, column, type_, comment, table_comment, estimate = row
+            table = tables.get(table_name)
+            if table is None:
+                table = tables[table_name] = _CatalogTable(
+                    table_name,
+                    table_comment or None,
+                    float(estimate) if estimate is not None else None,
+                    [],
+                )
+            table.columns.append((column, str(type_ or "").upper(), comment or ""))
+        foreign_keys = [
+            f"{source}.{source_column}={target}.{target_column}"
+            for source, source_column, target, target_column in conn.execute(
+                text(_FOREIGN_KEYS_SQL[dialect]), params
+            )
+        ]
+    return tables, foreign_keys
+
+
+def _read_catalog_inspector(
+    engine: Engine, db_schema: Optional[str]
+) -> Tuple[Dict[str, _CatalogTable], List[str]]:
+    """Fallback for dialects without a bulk query, one round-trip per table."""
+    from sqlalchemy import inspect
+
+    logger.warning(
+        f"No bulk catalog query for {engine.dialect.name}, using the SQLAlchemy inspector"
+    )
+    inspector = inspect(engine)
+    tables: Dict[str, _CatalogTable] = {}
+    foreign_keys: List[str] = []
+    for table_name in inspector.get_table_names(schema=db_schema):
+        comment = inspector.get_table_comment(table_name, schema=db_schema)
+        tables[table_name] = _CatalogTable(
+            table_name,
+            comment.get("text") or None,
+            None,
+            [
+                (c["name"], str(c["type"]).upper(), c.get("comment") or "")
+                for c in inspector.get_columns(table_name, schema=db_schema)
+            ],
+        )
+        for fk in inspector.get_foreign_keys(table_name, schema=db_schema):
+            for source, target in zip(fk["constrained_columns"], fk["referred_columns"]):
+                foreign_keys.append(
+                    f"{table_name}.{source}={fk['referred_table']}.{target}"
+                )
+    return tables, foreign_keys
+
+
+def _sample_sql(
+    engine: Engine, table: _CatalogTable, rows: int, db_schema: Optional[str] = None
+) -> str:
+    quote = engine.dialect.identifier_preparer.quote
+    columns = ", ".join(quote(name) for name, _, _ in table.columns)
+    source = quote(table.name)
+    if db_schema:
+        source = f"{quote(db_schema)}.{source}"
+    if (
+        _dialect_name(engine) == "postgresql"
+        and table.estimated_rows
+        and table.estimated_rows > _TABLESAMPLE_MIN_ROWS
+    ):
+        # Enough blocks for ~50x the wanted rows, SYSTEM sampling is block level.
+        percent = min(100.0, max(0.01, 100.0 * rows * 50 / table.estimated_rows))
+        source += f" TABLESAMPLE SYSTEM ({percent:.4f})"
+    return f"SELECT {columns} FROM {source} LIMIT {int(rows)}"
+
+
+def _format_examples(values: List[Any], max_examples: int) -> Optional[str]:
+    examples = []
+    for value in values:
+        if value is None or isinstance(value, (bytes, bytearray, memoryview)):
+            continue
+        if isinstance(value, str) and len(value) > _EXAMPLE_MAX_CHARS:
+            value = value[:_EXAMPLE_MAX_CHARS] + "..."
+        elif not isinstance(value, (str, int, float, bool)):
+            value = str(value)
+        if value not in examples:
+            examples.append(value)
+        if len(examples) >= max_examples:
+            break
+    return str(examples) if examples else None
+
+
+def _sample_table(
+    engine: Engine,
+    table: _CatalogTable,
+    rows: int,
+    max_examples: int,
+    db_schema: Optional[str] = None,
+) -> Dict[str, Optional[str]]:
+    try:
+        with engine.connect() as conn:
+            sql = _sample_sql(engine, table, rows, db_schema)
+            result = conn.execute(text(sql)).fetchall()
+    except exc.SQLAlchemyError as e:
+        logger.warning(f"Could not sample {table.name}: {e}")
+        return {}
+    return {
+        name: _format_examples([row[i] for row in result], max_examples)
+        for i, (name, _, _) in enumerate(table.columns)
+    }
+
+
+def _cache_path(engine: Engine, db_schema: Optional[str], cache_dir: str) -> str:
+    key = f"{engine.url.render_as_string(hide_password=True)}|{db_schema or ''}"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, f"introspect-{digest}.json")
+
+
+def _load_cached(path: str, ttl: Optional[float]) -> Optional[Schema]:
+    if not os.path.exists(path):
+        return None
+    if ttl is not None and time.time() - os.path.getmtime(path) > ttl:
+        return None
+    try:
+        return Schema.load(path)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable schema cache {path}: {e}")
+        return None
+
+
+def save_schema(schema: Schema, path: str):
+    """Write `schema` as the JSON `Schema.load` reads, atomically."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(schema.model_dump(mode="json"), f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, path)
+
+
+def catalog_signature(engine: Engine, db_schema: Optional[str] = None) -> str:
+    """Hash of tables, columns and FKs, cheap enough to poll for changes."""
+    tables, foreign_keys = read_catalog(engine, db_schema)
+    payload = [
+        [(t.name, t.description, t.columns) for t in tables.values()],
+        foreign_keys,
+    ]
+    return hashlib.sha1(json.dumps(payload).encode("utf-8")).hexdigest()
+
+
+def introspect_schema(
+    engine: Engine,
+    name: Optional[str] = None,
+    db_schema: Optional[str] = None,
+    sample_rows: int = 3,
+    max_examples: int = 3,
+    concurrency: int = 4,
+    cache_dir: Optional[str] = None,
+    ttl: Optional[float] = None,
+    refresh: bool = False,
+) -> Schema:
+    """Read tables, columns, comments and FKs of `engine`'s database.
+
+    `sample_rows` rows are read per table to fill `Column.example` (0 skips
+    sampling). With `cache_dir`, the result is reused for `ttl` seconds
+    unless `refresh` is set.
+    """
+    path = _cache_path(engine, db_schema, cache_dir) if cache_dir else None
+    if path and not refresh:
+        cached = _load_cached(path, ttl)
+        if cached is not None:
+            return cached
+
+    started = time.perf_counter()
+    tables, foreign_keys = read_catalog(engine, db_schema)
+    examples: Dict[str, Dict[str, Optional[str]]] = {}
+    if sample_rows > 0 and tables:
+        workers = max(1, min(concurrency, len(tables)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                table_name: submit(
+                    pool,
+                    _sample_table,
+                    engine,
+                    table,
+                    sample_rows,
+                    max_examples,
+                    db_schema,
+                )
+                for table_name, table in tables.items()
+            }
+            examples = {
+                table_name: future.result()
+                for table_name, future in futures.items()
+            }
+
+    schema = Schema(
+        name=name or db_schema or engine.url.database or engine.dialect.name,
+        description=f"Schema introspected from {engine.dialect.name} database",
+        tables=[
+            Table(
+                name=table.name,
+                description=table.description,
+                columns=[
+                    Column(
+                        name=column,
+                        type=type_,
+                        description=comment,
+                        example=examples.get(table.name, {}).get(column),
+                    )
+                    for column, type_, comment in table.columns
+                ],
+            )
+            for table in tables.values()
+        ],
+        foreign_keys=foreign_keys,
+    )
+    logger.info(
+        f"Introspected {len(tables)} tables and {len(foreign_keys)} foreign keys "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+    if path:
+        save_schema(schema, path)
+    return schema
+
+
+def introspect_from_config(engine: Engine, refresh: bool = False) -> Schema:
+    from sql_qa.config import get_app_config
+
+    config = get_app_config().get("schema_introspection") or {}
+    return introspect_schema(
+        engine,
+        name=config.get("name") or None,
+        db_schema=config.get("db_schema") or None,
+        sample_rows=int(config.get("sample_rows", 3)),
+        max_examples=int(config.get("max_examples", 3)),
+        concurrency=int(config.get("concurrency", 4)),
+        cache_dir=config.get("cache_dir") or None,
+        ttl=float(config["ttl"]) if config.get("ttl") else None,
+        refresh=refresh,
+    )
+
+
+@click.command()
+@click.option("--output", "-o", required=True, help="Schema JSON file to write")
+@click.option("--conn", default=None, help="Database URL, defaults to DB_CONN")
+@click.option("--name", default=None, help="Schema name, defaults to the database name")
+@click.option("--db-schema", default=None, help="Database schema/namespace to read")
+@click.option("--sample-rows", default=3, show_default=True, type=int)
+@click.option("--concurrency", default=4, show_default=True, type=int)
+def cli(
+    output: str,
+    conn: Optional[str],
+    name: Optional[str],
+    db_schema: Optional[str],
+    sample_rows: int,
+    concurrency: int,
+):
+    """Introspect the database into a schema JSON usable as SCHEMA_PATH."""
+    from shared.db import get_engine
+
+    started = time.perf_counter()
+    schema = introspect_schema(
+        get_engine(conn),
+        name=name,
+        db_schema=db_schema,
+        sample_rows=sample_rows,
+        concurrency=concurrency,
+    )
+    save_schema(schema, output)
+    click.echo(
+        f"Wrote {len(schema.tables or [])} tables to {output} "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,196 @@
+import os
+import threading
+from typing import Callable, List, NamedTuple, Optional, Set, Tuple
+
+from shared.logger import logger
+from sql_qa.schema.retrieval import SchemaRetriever
+from sql_qa.schema.store import Schema, SchemaStore
+
+
+class SchemaDiff(NamedTuple):
+    added: Set[str]
+    removed: Set[str]
+    changed: Set[str]
+    foreign_keys_changed: bool
+    description_changed: bool
+
+    @property
+    def is_empty(self) -> bool:
+        return not (
+            self.added
+            or self.removed
+            or self.changed
+            or self.foreign_keys_changed
+            or self.description_changed
+        )
+
+    def __str__(self) -> str:
+        return (
+            f"+{sorted(self.added)} -{sorted(self.removed)} ~{sorted(self.changed)}"
+            f"{' fks' if self.foreign_keys_changed else ''}"
+        )
+
+
+def diff_schemas(old: Schema, new: Schema) -> SchemaDiff:
+    old_tables = {table.name: table for table in old.tables or []}
+    new_tables = {table.name: table for table in new.tables or []}
+    return SchemaDiff(
+        added=new_tables.keys() - old_tables.keys(),
+        removed=old_tables.keys() - new_tables.keys(),
+        changed={
+            name
+            for name in old_tables.keys() & new_tables.keys()
+            if old_tables[name] != new_tables[name]
+        },
+        foreign_keys_changed=(old.foreign_keys or []) != (new.foreign_keys or []),
+        description_changed=old.description != new.description,
+    )
+
+
+class SchemaVersion(NamedTuple):
+    """Immutable snapshot of everything derived from one schema version.
+
+    Requests take one snapshot and use it to the end, so a reload never
+    changes the schema under an in-flight request.
+    """
+
+    version: int
+    schema: Schema
+    store: SchemaStore
+    retriever: Optional[SchemaRetriever]
+
+
+class SchemaManager:
+    """Keeps the current `SchemaVersion` up to date with its source.
+
+    `loader` returns the latest `Schema`, `signature` is a cheap probe (file
+    mtime, ...) so the loader only runs when the source may have changed.
+    A background thread polls every `interval` seconds; `refresh()` can also
+    be called directly. A new version is only built when the diff is not
+    empty, reusing the indexes, embeddings and rendered prompts of unchanged
+    tables, and is swapped in with a single reference assignment.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], Schema],
+        signature: Optional[Callable[[], object]] = None,
+        interval: float = 30.0,
+        retriever_factory: Optional[
+            Callable[[Schema, SchemaStore], SchemaRetriever]
+        ] = None,
+    ):
+        self.loader = loader
+        self.signature = signature
+        self.interval = interval
+        self.retriever_factory = retriever_factory
+        self._listeners: List[Callable[[SchemaVersion, SchemaDiff], None]] = []
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._signature = self.signature() if self.signature else None
+        self._current = self._build(loader(), version=1)
+
+    @classmethod
+    def from_path(cls, path: str, **kwargs) -> "SchemaManager":
+        def signature() -> Optional[Tuple[int, int]]:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return None
+            return stat.st_mtime_ns, stat.st_size
+
+        return cls(lambda: Schema.load(path), signature=signature, **kwargs)
+
+    @classmethod
+    def from_database(cls, engine, **kwargs) -> "SchemaManager":
+        """Introspect the live database, re-reading it only when the catalog
+        (tables, columns, FKs) changes."""
+        from sql_qa.schema.introspect import catalog_signature, introspect_from_config
+
+        loaded = False
+
+        def loader() -> Schema:
+            # The first load may come from the disk cache, reloads may not.
+            nonlocal loaded
+            schema = introspect_from_config(engine, refresh=loaded)
+            loaded = True
+            return schema
+
+        return cls(loader, signature=lambda: catalog_signature(engine), **kwargs)
+
+    @property
+    def current(self) -> SchemaVersion:
+        return self._current
+
+    def subscribe(self, listener: Callable[[SchemaVersion, SchemaDiff], None]):
+        """Call `listener(version, diff)` after every swap."""
+        self._listeners.append(listener)
+
+    def _build(
+        self,
+        schema: Schema,
+        version: int,
+        previous: Optional[SchemaVersion] = None,
+    ) -> SchemaVersion:
+        if previous is None or previous.schema.name != schema.name:
+            store = SchemaStore()
+            store.add_schema(schema)
+        else:
+            store = previous.store.with_schema(schema)
+        index = store.get_index(schema.name)
+        if previous is not None and previous.retriever is not None:
+            retriever = previous.retriever.rebuild(schema, index)
+        elif self.retriever_factory is not None:
+            retriever = self.retriever_factory(schema, store)
+        else:
+            retriever = None
+        return SchemaVersion(version, schema, store, retriever)
+
+    def refresh(self, force: bool = False) -> Optional[SchemaDiff]:
+        """Reload the schema if its source changed, returns the applied diff.
+
+        Loader errors (e.g. a half-written file) keep the current version.
+        """
+        with self._refresh_lock:
+            signature = self.signature() if self.signature else None
+            if not force and self.signature and signature == self._signature:
+                return None
+            try:
+                schema = self.loader()
+            except Exception as e:
+                logger.warning(f"Schema reload failed, keeping current version: {e}")
+                return None
+            self._signature = signature
+            current = self._current
+            diff = diff_schemas(current.schema, schema)
+            if diff.is_empty and schema.name == current.schema.name:
+                return None
+            new_version = self._build(schema, current.version + 1, previous=current)
+            self._current = new_version
+        logger.info(f"Schema reloaded to version {new_version.version}: {diff}")
+        for listener in self._listeners:
+            try:
+                listener(new_version, diff)
+            except Exception as e:
+                logger.error(f"Schema reload listener failed: {e}")
+        return diff
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.refresh()
+
+    def start(self) -> "SchemaManager":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="schema-reload", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,229 @@
+import hashlib
+import json
+import re
+from typing import TYPE_CHECKING, Callable, Dict, List, Literal, Optional, Set, Tuple
+
+from sql_qa.prompt.budget import count_tokens
+
+if TYPE_CHECKING:
+    from sql_qa.schema.store import Schema, Table
+
+RenderFormat = Literal["mschema", "ddl", "json"]
+
+
+def _digest(payload) -> str:
+    text = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def table_fingerprint(table: "Table") -> str:
+    return _digest(table.model_dump(mode="json"))
+
+
+def schema_fingerprint(
+    schema: "Schema", table_fingerprints: Optional[List[str]] = None
+) -> str:
+    """Content hash of a schema, changes whenever the schema file does.
+
+    `table_fingerprints` can be passed when already computed, in table order.
+    """
+    if table_fingerprints is None:
+        table_fingerprints = [table_fingerprint(t) for t in schema.tables or []]
+    return _digest(
+        [schema.name, schema.description, table_fingerprints, schema.foreign_keys]
+    )
+
+
+def _mschema_table(table: "Table") -> str:
+    header = f"# Table: {table.name}"
+    if table.description:
+        header += f", {table.description}"
+    columns = []
+    for column in table.columns:
+        parts = [f"{column.name}:{column.type}"]
+        if column.description:
+            parts.append(column.description)
+        if column.example:
+            parts.append(f"Examples: {column.example}")
+        columns.append(f"({', '.join(parts)})")
+    return "\n".join([header, "[", ",\n".join(columns), "]"])
+
+
+def render_mschema(schema: "Schema") -> str:
+    """M-Schema style text: one block per table, then the foreign keys."""
+    lines = [f"【DB_ID】 {schema.name}"]
+    if schema.description:
+        lines.append(schema.description)
+    lines.append("【Schema】")
+    lines.extend(_mschema_table(table) for table in schema.tables or [])
+    if schema.foreign_keys:
+        lines.append("【Foreign keys】")
+        lines.extend(schema.foreign_keys)
+    return "\n".join(lines)
+
+
+def _ddl_comment(text: str) -> str:
+    return " ".join(text.split())
+
+
+def render_ddl(schema: "Schema") -> str:
+    """CREATE TABLE statements with descriptions as comments."""
+    references: Dict[str, list] = {}
+    for fk in schema.foreign_keys or []:
+        source, _, target = fk.partition("=")
+        table, _, column = source.strip().rpartition(".")
+        references.setdefault(table, []).append((column, target.strip()))
+
+    statements = []
+    for table in schema.tables or []:
+        lines = []
+        if table.description:
+            lines.append(f"-- {_ddl_comment(table.description)}")
+        lines.append(f"CREATE TABLE {table.name} (")
+        body = []
+        for column in table.columns:
+            line = f"  {column.name} {column.type}"
+            comment = [_ddl_comment(column.description)] if column.description else []
+            if column.example:
+                comment.append(f"e.g. {_ddl_comment(column.example)}")
+            if comment:
+                line += f" -- {'; '.join(comment)}"
+            body.append(line)
+        for column, target in references.get(table.name, []):
+            target_table, _, target_column = target.rpartition(".")
+            body.append(
+                f"  FOREIGN KEY ({column}) REFERENCES {target_table}({target_column})"
+            )
+        # Comments run to the end of line, so separators go before them.
+        for i, line in enumerate(body[:-1]):
+            code, sep, comment = line.partition(" -- ")
+            body[i] = f"{code},{sep}{comment}"
+        lines.extend(body)
+        lines.append(");")
+        statements.append("\n".join(lines))
+    return "\n\n".join(statements)
+
+
+def render_json(schema: "Schema") -> str:
+    return json.dumps(
+        schema.model_dump(mode="json", exclude_none=True),
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+
+
+RENDERERS: Dict[str, Callable[["Schema"], str]] = {
+    "mschema": render_mschema,
+    "ddl": render_ddl,
+    "json": render_json,
+}
+
+
+def render_schema(schema: "Schema", fmt: RenderFormat = "mschema") -> str:
+    try:
+        renderer = RENDERERS[fmt]
+    except KeyError:
+        raise ValueError(f"Unknown schema render format: {fmt}") from None
+    return renderer(schema)
+
+
+# example values longer than this are cut before anything is dropped
+_EXAMPLE_CHARS = 40
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+def _words(text: Optional[str]) -> Set[str]:
+    return set(_WORD_RE.findall(text.lower())) if text else set()
+
+
+def _key_columns(schema: "Schema") -> Set[Tuple[str, str]]:
+    """Columns never dropped: the first of each table (usually the primary
+    key) and both sides of every foreign key."""
+    keys = {
+        (table.name, table.columns[0].name)
+        for table in schema.tables or []
+        if table.columns
+    }
+    for fk in schema.foreign_keys or []:
+        for side in fk.split("="):
+            table, _, column = side.strip().rpartition(".")
+            keys.add((table, column))
+    return keys
+
+
+def _short_example(example: Optional[str]) -> Optional[str]:
+    if not example or len(example) <= _EXAMPLE_CHARS:
+        return example
+    return example[:_EXAMPLE_CHARS].rstrip() + "..."
+
+
+def _shrink(
+    schema: "Schema",
+    examples: Callable[[Optional[str]], Optional[str]],
+    dropped: Set[Tuple[str, str]],
+) -> "Schema":
+    tables = [
+        table.model_copy(
+            update={
+                "columns": [
+                    column.model_copy(update={"example": examples(column.example)})
+                    for column in table.columns
+                    if (table.name, column.name) not in dropped
+                ]
+            }
+        )
+        for table in schema.tables or []
+    ]
+    return schema.model_copy(update={"tables": tables})
+
+
+def fit_schema(
+    schema: "Schema",
+    max_tokens: int,
+    fmt: RenderFormat = "mschema",
+    question: Optional[str] = None,
+) -> "Schema":
+    """Copy of `schema` whose rendering takes at most `max_tokens`.
+
+    Each step only runs when the previous one was not enough: long example
+    values are cut, then examples are dropped, then the columns sharing the
+    fewest words with `question` (later columns first on ties). Key columns
+    are always kept, so the result can still be over budget.
+    """
+
+    def fits(candidate: "Schema") -> bool:
+        return count_tokens(render_schema(candidate, fmt)) <= max_tokens
+
+    if fits(schema):
+        return schema
+    shortened = _shrink(schema, _short_example, set())
+    if fits(shortened):
+        return shortened
+
+    question_words = _words(question)
+    keys = _key_columns(schema)
+    droppable = [
+        (
+            len(question_words & (_words(column.name) | _words(column.description))),
+            -position,
+            (table.name, column.name),
+        )
+        for table in schema.tables or []
+        for position, column in enumerate(table.columns)
+        if (table.name, column.name) not in keys
+    ]
+    droppable.sort()
+    order = [name for _, _, name in droppable]
+
+    def without_examples(example: Optional[str]) -> None:
+        return None
+
+    # fewest dropped columns that fit, rendering O(log n) times
+    low, high = 0, len(order)
+    while low < high:
+        middle = (low + high) // 2
+        if fits(_shrink(schema, without_examples, set(order[:middle]))):
+            high = middle
+        else:
+            low = middle + 1
+    return _shrink(schema, without_examples, set(order[:low]))
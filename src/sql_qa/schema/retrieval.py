@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import re
+import zlib
+from typing import Dict, List, Optional, Protocol, Tuple
+
+import numpy as np
+
+from shared.logger import logger
+from sql_qa.schema.index import SchemaIndex
+from sql_qa.schema.store import Schema, Table
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class Embedder(Protocol):
+    name: str
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]: ...
+
+    def embed_query(self, text: str) -> List[float]: ...
+
+
+class HashingEmbedder:
+    """Dependency-free stand-in embedder.
+
+    Hashes word unigrams, bigrams and the parts of snake_case identifiers into
+    a fixed size vector. Lexical only, but fast, deterministic and good enough
+    to pre-filter tables whose names or descriptions share words with the
+    question.
+    """
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _tokens(self, text: str) -> List[str]:
+        words = []
+        for word in _TOKEN_RE.findall(text.lower()):
+            words.append(word)
+            if "_" in word:
+                words.extend(part for part in word.split("_") if part)
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in self._tokens(text):
+            vector[zlib.crc32(token.encode("utf-8")) % self.dim] += 1.0
+        return np.log1p(vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class HuggingFaceEmbedder:
+    """In-process sentence-transformers model through langchain_huggingface."""
+
+    def __init__(self, model: str):
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        self.name = model
+        self._embeddings = HuggingFaceEmbeddings(model_name=model)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embeddings.embed_query(text)
+
+
+def get_embedder(retrieval_config) -> Embedder:
+    kind = retrieval_config.get("embedder", "hashing")
+    if kind == "hashing":
+        return HashingEmbedder(int(retrieval_config.get("dim", 1024)))
+    if kind == "huggingface":
+        return HuggingFaceEmbedder(retrieval_config.model)
+    raise ValueError(f"Unknown schema embedder: {kind}")
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def table_documents(table: Table) -> List[str]:
+    """One document for the table itself and one per column."""
+    documents = [f"{table.name}: {table.description or ''}"]
+    for column in table.columns:
+        documents.append(f"{table.name}.{column.name}: {column.description}")
+    return documents
+
+
+class SchemaRetriever:
+    """Vector index over table and column descriptions of one `Schema`.
+
+    A table scores as its best matching document, so a question about a
+    single column still finds its table. Embeddings are persisted under
+    `cache_dir`, keyed by embedder and schema content, so restarts only
+    re-embed when the schema changes.
+    """
+
+    def __init__(
+        self,
+        schema: Schema,
+        embedder: Embedder,
+        cache_dir: Optional[str] = None,
+        index: Optional[SchemaIndex] = None,
+        previous: Optional["SchemaRetriever"] = None,
+    ):
+        self.schema = schema
+        self.embedder = embedder
+        self.cache_dir = cache_dir
+        self.index = index or SchemaIndex(schema)
+        documents: List[str] = []
+        owners: List[int] = []
+        for position, table in enumerate(schema.tables or []):
+            for document in table_documents(table):
+                documents.append(document)
+                owners.append(position)
+        self.documents = documents
+        self._owners = np.asarray(owners, dtype=np.int64)
+        self.fingerprint = hashlib.sha1(
+            json.dumps([embedder.name, documents], ensure_ascii=False).encode("utf-8")
+        ).hexdigest()[:16]
+        self._vectors = self._load_or_build(cache_dir, previous)
+
+    @classmethod
+    def from_config(
+        cls, schema: Schema, retrieval_config, index: Optional[SchemaIndex] = None
+    ) -> "SchemaRetriever":
+        return cls(
+            schema,
+            get_embedder(retrieval_config),
+            cache_dir=retrieval_config.get("cache_dir") or None,
+            index=index,
+        )
+
+    def _cache_path(self, cache_dir: str) -> str:
+        safe_name = re.sub(r"[^\w.-]", "_", self.schema.name)
+        return os.path.join(cache_dir, f"{safe_name}-{self.fingerprint}.npz")
+
+    def rebuild(
+        self, schema: Schema, index: Optional[SchemaIndex] = None
+    ) -> "SchemaRetriever":
+        """Retriever for a new version of the schema, only documents that
+        changed are embedded again."""
+        return SchemaRetriever(
+            schema, self.embedder, self.cache_dir, index=index, previous=self
+        )
+
+    def _embed(self, previous: Optional["SchemaRetriever"]) -> np.ndarray:
+        known: Dict[str, np.ndarray] = {}
+        if previous is not None and previous.embedder.name == self.embedder.name:
+            known = dict(zip(previous.documents, previous._vectors))
+        missing = list(dict.fromkeys(d for d in self.documents if d not in known))
+        if missing:
+            vectors = _normalize(
+                np.asarray(self.embedder.embed_documents(missing), dtype=np.float32)
+            )
+            known.update(zip(missing, vectors))
+        if previous is not None:
+            logger.info(
+                f"Schema index rebuilt, embedded {len(missing)} of {len(self.documents)} documents"
+            )
+        return np.stack([known[document] for document in self.documents])
+
+    def _load_or_build(
+        self, cache_dir: Optional[str], previous: Optional["SchemaRetriever"] = None
+    ) -> np.ndarray:
+        path = self._cache_path(cache_dir) if cache_dir else None
+        if path and os.path.exists(path):
+            try:
+                with np.load(path) as data:
+                    vectors = data["vectors"]
+                if vectors.shape[0] == len(self.documents):
+                    logger.info(f"Loaded schema index from {path}")
+                    return vectors
+            except (OSError, KeyError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable schema index {path}: {e}")
+        if not self.documents:
+            return np.zeros((0, 0), dtype=np.float32)
+        vectors = self._embed(previous)
+        if path:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = f"{path}.tmp.npz"
+            np.savez(tmp_path, vectors=vectors)
+            os.replace(tmp_path, path)
+            logger.info(f"Saved schema index for {len(self.documents)} documents to {path}")
+        return vectors
+
+    def score_tables(self, question: str) -> List[Tuple[str, float]]:
+        """Every table with its similarity to `question`, best first."""
+        tables = self.schema.tables or []
+        if not tables or self._vectors.size == 0:
+            return []
+        query = _normalize(
+            np.asarray(self.embedder.embed_query(question), dtype=np.float32)
+        )
+        similarities = self._vectors @ query
+        scores = np.full(len(tables), -np.inf, dtype=np.float32)
+        np.maximum.at(scores, self._owners, similarities)
+        order = np.argsort(-scores, kind="stable")
+        return [(tables[i].name, float(scores[i])) for i in order]
+
+    def retrieve(self, question: str, top_k: int) -> List[str]:
+        return [name for name, _ in self.score_tables(question)[:top_k]]
+
+    def filter_schema(self, question: str, top_k: int) -> Schema:
+        """`schema` narrowed to the `top_k` tables closest to `question`.
+
+        The full schema is returned when it has no more than `top_k` tables.
+        """
+        if len(self.schema.tables or []) <= top_k:
+            return self.schema
+        selected = self.retrieve(question, top_k)
+        return Schema(
+            name=self.schema.name,
+            description=self.schema.description,
+            tables=self.index.ordered(selected),
+            foreign_keys=self.index.foreign_keys_between(selected),
+        )
+
@@ -1,8 +1,13 @@
-from typing import List, Literal, TypedDict, Optional, Dict, Set
+from typing import Any, List, Literal, TypedDict, Optional, Dict, Set
 from collections import defaultdict
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
 import json
-from sql_qa.config import settings
+from shared.logger import logger
+from sql_qa.config import get_app_config
+from shared.cache import LRUCache
+from sql_qa.schema.index import SchemaIndex
+from sql_qa.prompt.budget import count_tokens
+from sql_qa.schema.render import RenderFormat, fit_schema, render_schema
 
 
 class Column(BaseModel):
@@ -36,78 +41,150 @@ class Schema(BaseModel):
 
 class SchemaStore(BaseModel):
     schemas: Dict[str, Schema] = {}
+    _indexes: Dict[str, SchemaIndex] = PrivateAttr(default_factory=dict)
+    # rendered prompt text per (table versions, FKs, format), shared by the
+    # stores derived through with_schema so unchanged subsets stay cached
+    _render_cache: LRUCache = PrivateAttr(
+        default_factory=lambda: LRUCache(max_entries=256)
+    )
 
     def get_schema(self, schema_name: str) -> Schema:
         return self.schemas[schema_name]
 
     def add_schema(self, schema: Schema):
         self.schemas[schema.name] = schema
+        self._indexes[schema.name] = SchemaIndex(schema)
+
+    def with_schema(self, schema: Schema) -> "SchemaStore":
+        """New store with `schema` added or replaced, leaving this one as is.
+
+        Indexes of the other schemas and the render cache are shared.
+        """
+        store = SchemaStore(schemas={**self.schemas, schema.name: schema})
+        store._indexes.update(
+            (name, index) for name, index in self._indexes.items() if name != schema.name
+        )
+        store._indexes[schema.name] = SchemaIndex(schema)
+        store._render_cache = self._render_cache
+        return store
+
+    def get_index(self, schema_name: str) -> SchemaIndex:
+        schema = self.schemas[schema_name]
+        index = self._indexes.get(schema_name)
+        # Schemas assigned directly to `schemas` skip add_schema, index lazily.
+        if index is None or index.schema is not schema:
+            index = self._indexes[schema_name] = SchemaIndex(schema)
+        return index
+
+    def render(
+        self,
+        schemas: Optional[Dict[str, Schema]] = None,
+        fmt: RenderFormat = "mschema",
+        max_tokens: Optional[int] = None,
+        question: Optional[str] = None,
+    ) -> str:
+        """Prompt text for `schemas`, e.g. a `search_tables` result, or for
+        every stored schema.
+
+        Subsets of stored schemas are rendered once per distinct set of
+        tables. Keys carry each table's content fingerprint, so a schema
+        change only misses for the subsets holding a changed table.
+
+        With `max_tokens`, text over the budget is shrunk by `fit_schema`
+        (keeping the columns most related to `question`), each schema
+        getting a share of the budget proportional to its size.
+        """
+        schemas = self.schemas if schemas is None else schemas
+        rendered = [
+            (schema, self._render_cached(schema_name, schema, fmt))
+            for schema_name, schema in schemas.items()
+            if schema
+        ]
+        text = "\n\n".join(part for _, part in rendered)
+        if max_tokens is None:
+            return text
+        total = count_tokens(text)
+        if total <= max_tokens:
+            return text
+        logger.info(f"Schema prompt of {total} tokens over budget ({max_tokens})")
+        return "\n\n".join(
+            render_schema(
+                fit_schema(
+                    schema, max_tokens * count_tokens(part) // total, fmt, question
+                ),
+                fmt,
+            )
+            for schema, part in rendered
+        )
+
+    def _render_cached(self, schema_name: str, schema: Schema, fmt: str) -> str:
+        if schema_name not in self.schemas:
+            return render_schema(schema, fmt)
+        index = self.get_index(schema_name)
+        key = (
+            schema_name,
+            schema.description,
+            frozenset(
+                (table.name, index.table_fingerprints.get(table.name))
+                for table in schema.tables or []
+            ),
+            None if schema.foreign_keys is None else tuple(schema.foreign_keys),
+            fmt,
+        )
+        text = self._render_cache.get(key)
+        if text is None:
+            text = render_schema(schema, fmt)
+            self._render_cache.set(key, text, namespace=schema_name)
+        return text
+
+    def render_stats(self) -> Dict[str, Any]:
+        return self._render_cache.stats()
 
     def search_tables(
         self,
         queries: List[str],
         mode: Literal["exact", "connected", "same"] = "same",
         include_foreign_keys: bool = False,
+        max_hops: Optional[int] = 3,
     ) -> Dict[str, Schema]:
         """
-        Search for tables matching queries with two modes:
-        - exact: only return tables that match the queries
-        - connected: return matching tables plus all tables connected via foreign keys
+        Search for tables matching queries with three modes:
+        - same: return tables whose unqualified name equals a query
+        - exact: only return tables whose name contains a query
+        - connected: return matching tables plus the bridge tables of the
+          smallest FK join tree linking them
 
         Args:
             queries: List of table names to search for
-            mode: "exact" or "connected"
+            mode: "same", "exact" or "connected"
             include_foreign_keys: If True, only include foreign key relationships between selected tables
+            max_hops: In connected mode, the most joins allowed between two matched tables (None for unbounded)
 
         Returns:
             Dict[str, Schema] with filtered schema information
         """
-        # First, find all matching tables
         matching_tables: Dict[str, Set[str]] = defaultdict(set)
-        for schema_name, schema in self.schemas.items():
-            for table in schema.tables:
-                for query in queries:
-                    if mode == "same":
-                        if query.lower() == table.name.lower().rsplit(".", 1)[-1]:
-                            matching_tables[schema_name].add(table.name)
-                    elif (
-                        mode == "connected"
-                        or mode == "exact"
-                        and query.lower() in table.name.lower()
-                    ):
-                        matching_tables[schema_name].add(table.name)
-                    else:
-                        continue
+        for schema_name in self.schemas:
+            index = self.get_index(schema_name)
+            for query in queries:
+                if mode == "connected":
+                    # Prefer whole-name matches so seeds stay precise.
+                    matched = index.match(query, "same") or index.match(query, "exact")
+                else:
+                    matched = index.match(query, mode)
+                matching_tables[schema_name].update(matched)
 
         if mode == "exact" or mode == "same":
             return self._create_filtered_schemas(matching_tables, include_foreign_keys)
 
-        # For connected mode, find all related tables
         connected_tables: Dict[str, Set[str]] = defaultdict(set)
-        for schema_name, schema in self.schemas.items():
-            if not schema.foreign_keys:
-                continue
-
-            # Add initially matching tables
-            connected_tables[schema_name].update(matching_tables[schema_name])
-
-            # Find all tables connected via foreign keys
-            for fk in schema.foreign_keys:
-                # Parse foreign key string (assuming format: "table1.column1 -> table2.column2")
-                try:
-                    source, target = fk.split("=")
-                    source_table = source.split(".")[0].strip()
-                    target_table = target.split(".")[0].strip()
-
-                    # If either table is in matching_tables, add both to connected_tables
-                    if (
-                        source_table in matching_tables[schema_name]
-                        or target_table in matching_tables[schema_name]
-                    ):
-                        connected_tables[schema_name].add(source_table)
-                        connected_tables[schema_name].add(target_table)
-                except ValueError:
-                    continue  # Skip malformed foreign key strings
+        for schema_name, tables in matching_tables.items():
+            join_tree = self.get_index(schema_name).join_tree(tables, max_hops)
+            if join_tree.disconnected:
+                logger.info(
+                    f"No join path within {max_hops} hops for: {sorted(join_tree.disconnected)}"
+                )
+            connected_tables[schema_name] = join_tree.tables
 
         return self._create_filtered_schemas(connected_tables, include_foreign_keys)
 
@@ -120,42 +197,24 @@ class SchemaStore(BaseModel):
         for schema_name, schema in self.schemas.items():
             if schema_name not in selected_tables:
                 continue
+            index = self.get_index(schema_name)
 
             # Create new schema with only selected tables
             filtered_schema = Schema(
                 name=schema.name,
                 description=schema.description,
-                tables=[
-                    table
-                    for table in schema.tables
-                    if table.name in selected_tables[schema_name]
-                ],
+                tables=index.ordered(selected_tables[schema_name]),
             )
 
             print(
                 f"filtered_schema: {[table.name for table in filtered_schema.tables]}"
             )
 
-            # Handle foreign keys
+            # Only include foreign keys between selected tables
             if include_foreign_keys and schema.foreign_keys:
-                filtered_fks = []
-                # print(f"schema.foreign_keys: {schema.foreign_keys}")
-                for fk in schema.foreign_keys:
-                    try:
-                        source, target = fk.split("=")
-                        source_table = source.split(".")[0].strip()
-                        target_table = target.split(".")[0].strip()
-
-                        # Only include foreign keys between selected tables
-                        if (
-                            source_table in selected_tables[schema_name]
-                            and target_table in selected_tables[schema_name]
-                        ):
-                            filtered_fks.append(fk)
-                    except ValueError:
-                        continue
-
-                filtered_schema.foreign_keys = filtered_fks
+                filtered_schema.foreign_keys = index.foreign_keys_between(
+                    selected_tables[schema_name]
+                )
 
             filtered_schemas[schema_name] = filtered_schema
 
@@ -167,7 +226,7 @@ class SchemaStore(BaseModel):
 
 if __name__ == "__main__":
     # Load and initialize schema
-    schema = Schema.load(settings.schema_path)
+    schema = Schema.load(get_app_config().schema_path)
     store = SchemaStore()
     store.add_schema(schema)
 
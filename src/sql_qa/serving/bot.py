@@ -11,7 +11,6 @@ import pathlib
 
 import uvicorn
 
-from sql_qa.agent.orchestrator import get_orchestrator_executor
 from sql_qa.config import get_app_config
 from shared.logger import logger
 
@@ -24,14 +23,6 @@ from openai.types.chat import (
 from openai.types.chat.chat_completion import ChatCompletion, Choice
 from sql_qa.utils.invocation import ainvoke_agent
 
-
-app_config = get_app_config()
-
-logger.info(
-    "--------------------------------Starting server--------------------------------"
-)
-logger.info(app_config)
-
 agent_executor: CompiledGraph
 
 
@@ -108,8 +99,18 @@ def start(host, port, reload, workers):
     # checkpointer = InMemorySaver()
     checkpointer = None
 
+    logger.info(
+        "--------------------------------Starting server--------------------------------"
+    )
+    logger.info(get_app_config())
+
     async def main() -> None:
+        # the agents and their MCP client load with the server, not the CLI
+        from sql_qa.agent.orchestrator import get_orchestrator_executor
+        from sql_qa.llm.registry import aclose_models, warm_up
+
         global agent_executor
+        warm_up()
         agent_executor = await get_orchestrator_executor(checkpointer)
         server_config = uvicorn.Config(
             app,
@@ -121,7 +122,10 @@ def start(host, port, reload, workers):
         )
         server = uvicorn.Server(server_config)
         logger.info(f"Starting server at {host}:{port}")
-        await server.serve()
+        try:
+            await server.serve()
+        finally:
+            await aclose_models()
 
     asyncio.run(main())
 
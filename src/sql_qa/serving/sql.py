@@ -1,29 +1,43 @@
 import asyncio
+import functools
+from typing import TYPE_CHECKING
+
 import click
-import pandas as pd
-from tqdm import tqdm
 
 from sql_qa.config import get_app_config, turn_logger
 from shared.logger import logger, with_a_turn_logger
 
-from sql_qa.agent.sql import SqlAgentState
-from sql_qa.agent.sql import SqlAgent
-
+from sql_qa.llm.response_cache import MODES as CACHE_MODES, set_response_cache_mode
+from sql_qa.llm.type import SqlAgentState
 
-app_config = get_app_config()
+# The agent (langgraph, langchain, the DB driver) and the benchmark's pandas
+# are imported on the code paths using them, commands start without them.
+if TYPE_CHECKING:
+    from sql_qa.agent.sql import SqlAgent
 
-logger.info(
-    "--------------------------------Starting CLI--------------------------------"
-)
-logger.info(app_config)
 
+@functools.lru_cache(maxsize=None)
+def get_sql_agent() -> "SqlAgent":
+    """The CLI's agent, built on the first question."""
+    from sql_qa.agent.sql import SqlAgent
 
-sql_agent = SqlAgent(app_config)
+    return SqlAgent(get_app_config())
 
 
 @click.group()
-def app():
-    pass
+@click.option(
+    "--llm-cache",
+    type=click.Choice(CACHE_MODES),
+    default=None,
+    help="LLM response cache mode, replay_only reruns a benchmark offline",
+)
+def app(llm_cache):
+    logger.info(
+        "--------------------------------Starting CLI--------------------------------"
+    )
+    logger.info(get_app_config())
+    if llm_cache:
+        set_response_cache_mode(llm_cache)
 
 
 @app.command()
@@ -45,7 +59,7 @@ def cli():
 async def arun_turn(user_question: str) -> SqlAgentState:
     turn_logger.log("question", user_question)
     question = user_question
-    response = await sql_agent.arun(question)
+    response = await get_sql_agent().arun(question)
     if response["is_success"]:
         print(f"Bot: {response[ 'final_result' ]}")
     else:
@@ -58,55 +72,71 @@ async def arun_turn(user_question: str) -> SqlAgentState:
 @app.command()
 @click.option("--file", type=click.File("r", encoding="utf-8"), required=True)
 @click.option("--col-question", type=str, default="question")
-def benchmark(file, col_question):
-    async def arun():
-        # Read CSV file with header
-        df = pd.read_csv(file, encoding="utf-8")
-
-        assert col_question in df.columns
-        total_questions = len(df)
-        logger.info(f"Starting benchmark with {total_questions} questions")
-
-        # Initialize the runner
-
-        # Create output file with initial data
-        output_file = file.name.replace(".csv", "_results.csv")
-        df["generated_sql_query"] = None
-        df["generated_query_result"] = None
-        df["generated_sql_error"] = None
-        # df["generated_domain_raw_result"] = None
-        df.to_csv(output_file, index=False, encoding="utf-8")
-
-        # Process each question and save results immediately
-        pbar = tqdm(
-            total=total_questions,
-            position=0,
-            leave=True,
-            desc="Processing questions",
-            unit="q",
+@click.option(
+    "--col-id",
+    type=str,
+    default=None,
+    help="Column identifying questions across resumed runs, the row number by default",
+)
+@click.option(
+    "--workers",
+    type=int,
+    default=None,
+    help="Questions answered concurrently, `benchmark.workers` by default",
+)
+@click.option(
+    "--parquet", is_flag=True, help="Also export the results as Parquet (pyarrow)"
+)
+def benchmark(file, col_question, col_id, workers, parquet):
+    import pandas as pd
+    from tqdm import tqdm
+
+    from sql_qa.metrics.benchmark import BenchmarkItem, JsonlSink, run_benchmark
+
+    benchmark_config = get_app_config().get("benchmark") or {}
+    workers = workers or int(benchmark_config.get("workers", 4))
+
+    df = pd.read_csv(file, encoding="utf-8")
+    assert col_question in df.columns
+    assert col_id is None or col_id in df.columns
+    ids = [str(i) for i in (df[col_id] if col_id else df.index)]
+    items = [BenchmarkItem(i, q) for i, q in zip(ids, df[col_question])]
+    logger.info(f"Starting benchmark with {len(items)} questions, {workers} workers")
+
+    # records are appended as questions finish, rerunning resumes the file
+    base_name = file.name.replace(".csv", "")
+    sink = JsonlSink(f"{base_name}_results.jsonl")
+    pbar = tqdm(
+        total=len(items),
+        initial=len(sink.completed_ids() & set(ids)),
+        position=0,
+        leave=True,
+        desc="Processing questions",
+        unit="q",
+    )
+
+    def on_record(record):
+        pbar.update(1)
+
+    try:
+        stats = asyncio.run(
+            run_benchmark(items, arun_turn, sink, workers=workers, on_record=on_record)
         )
-
-        for idx, question in enumerate(df[col_question]):
-            try:
-                response = await arun_turn(question)
-                # Update dataframe in memory
-                df.at[idx, "generated_sql_query"] = response["final_sql"]
-                df.at[idx, "generated_query_result"] = response["final_result"]
-                df.at[idx, "generated_sql_error"] = response["error"]
-                # df.at[idx, "generated_domain_raw_result"] = response["raw_result"]
-            except Exception as e:
-                logger.error(f"Error processing question {idx + 1}: {str(e)}")
-                df.at[idx, "generated_sql_error"] = str(e)
-            finally:
-                # Save after each question
-                df.to_csv(output_file, index=False, encoding="utf-8")
-                pbar.update(1)
-                pbar.set_description(f"Processed {pbar.n}/{total_questions} questions")
-
+    finally:
+        sink.close()
         pbar.close()
-        logger.info(f"Results saved to {output_file}")
+    logger.info(f"Benchmark finished: {stats}")
 
-    asyncio.run(arun())
+    records = {r["id"]: r for r in sink.records()}
+    df["generated_sql_query"] = [records.get(i, {}).get("sql") for i in ids]
+    df["generated_query_result"] = [records.get(i, {}).get("result") for i in ids]
+    df["generated_sql_error"] = [records.get(i, {}).get("error") for i in ids]
+    df["elapsed"] = [records.get(i, {}).get("elapsed") for i in ids]
+    output_file = f"{base_name}_results.csv"
+    df.to_csv(output_file, index=False, encoding="utf-8")
+    if parquet:
+        pd.DataFrame(records.values()).to_parquet(f"{base_name}_results.parquet")
+    logger.info(f"Results saved to {output_file}")
 
 
 @app.command()
@@ -148,6 +178,11 @@ def mcp_server(transport, port, host, path, mock):
             description="Database query tool. Analyze the input question then generate a SQL query, execute it and return the result",
         )
     else:
+        from sql_qa.llm.registry import warm_up
+
+        # build models and the agent before taking the first question
+        warm_up()
+        get_sql_agent()
         mcp.tool(
             arun_turn,
             name="retrieve_data",
@@ -0,0 +1,11 @@
+import os
+import tempfile
+
+# Tests must not write spans, log files or turn logs into the repo: tracing
+# is off and everything the app logs goes to a throwaway directory. Set
+# before the config is composed or the logger is imported.
+_LOG_DIR = tempfile.mkdtemp(prefix="text2sql-tests-")
+os.environ["TRACING"] = "false"
+os.environ["LOG_DIR"] = _LOG_DIR
+os.environ["TRACING_PATH"] = os.path.join(_LOG_DIR, "spans.jsonl")
+os.environ["TURN_LOG_FILE"] = os.path.join(_LOG_DIR, "turn_log.jsonl")
@@ -0,0 +1,79 @@
+from sql_qa.agent.cache import AnswerCache, normalize_question
+from sql_qa.schema.retrieval import HashingEmbedder
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_normalize_question():
+    assert (
+        normalize_question("  Doanh số tháng 4   theo chi nhánh? ")
+        == "doanh số tháng 4 theo chi nhánh"
+    )
+    # diacritics are meaningful
+    assert normalize_question("tháng") != normalize_question("thang")
+
+
+def test_exact_hit_and_partitions():
+    cache = AnswerCache()
+    cache.store("Doanh số tháng 4?", "acme", "v1", "SELECT 1", "[(1,)]")
+
+    entry, kind = cache.lookup("doanh số   tháng 4", "acme", "v1")
+    assert kind == "exact"
+    assert entry.final_sql == "SELECT 1"
+
+    # other tenants and schema versions do not see it
+    assert cache.lookup("doanh số tháng 4", "other", "v1") is None
+    assert cache.lookup("doanh số tháng 4", "acme", "v2") is None
+
+    stats = cache.stats()
+    assert stats["exact_hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["hit_rate"] == 1 / 3
+
+
+def test_semantic_hit():
+    cache = AnswerCache(embedder=HashingEmbedder(), similarity_threshold=0.6)
+    cache.store(
+        "doanh số tháng 4 theo chi nhánh", "acme", "v1", "SELECT 1", "[(1,)]"
+    )
+
+    entry, kind = cache.lookup("doanh số theo chi nhánh tháng 4", "acme", "v1")
+    assert kind == "semantic"
+    assert entry.final_sql == "SELECT 1"
+    assert cache.lookup("số lượng khách hàng mới", "acme", "v1") is None
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def test_data_ttl_refresh():
+    clock = Clock()
+    cache = AnswerCache(data_ttl=60, clock=clock)
+    entry = cache.store("q", "acme", "v1", "SELECT 1", "old")
+    assert not cache.is_stale(entry)
+
+    clock.now = 61
+    entry, _ = cache.lookup("q", "acme", "v1")
+    assert cache.is_stale(entry)
+    refreshed = cache.refresh(entry, "acme", "v1", "new")
+    assert not cache.is_stale(refreshed)
+    assert cache.lookup("q", "acme", "v1")[0].final_result == "new"
+    assert cache.stats()["refreshes"] == 1
+
+
+def test_eviction_and_invalidation():
+    cache = AnswerCache(max_entries=2, embedder=HashingEmbedder())
+    cache.store("a", "acme", "v1", "SELECT 1", "")
+    cache.store("b", "acme", "v1", "SELECT 2", "")
+    cache.store("c", "other", "v1", "SELECT 3", "")
+
+    assert cache.lookup("a", "acme", "v1") is None
+    assert cache.stats()["evictions"] == 1
+
+    assert cache.invalidate("other") == 1
+    assert cache.lookup("c", "other", "v1") is None
+    assert cache.lookup("b", "acme", "v1") is not None
@@ -0,0 +1,98 @@
+import asyncio
+from types import SimpleNamespace
+
+from sql_qa.agent.cache import AnswerCache
+from sql_qa.agent.sql import SqlAgent
+
+
+class FakeGraph:
+    def __init__(self, agent, manager):
+        self.agent = agent
+        self.manager = manager
+        self.seen = None
+
+    async def ainvoke(self, payload):
+        pinned = self.agent._schema_version()
+        # a reload during the turn does not change the turn's schema
+        self.manager.current = "v2"
+        await asyncio.sleep(0)
+        self.seen = (pinned, self.agent._schema_version())
+        return {**payload, "is_success": True, "final_sql": "SELECT 1"}
+
+
+def test_schema_version_pinned_outside_the_state():
+    agent = SqlAgent.__new__(SqlAgent)
+    agent.schema_manager = SimpleNamespace(current="v1")
+    agent.answer_cache = None
+    agent.graph = FakeGraph(agent, agent.schema_manager)
+
+    response = asyncio.run(agent.arun("q"))
+
+    assert agent.graph.seen == ("v1", "v1")
+    # the returned state is logged and served, it must not carry the schema
+    assert "schema_version" not in response
+    assert agent._schema_version() == "v2"
+
+
+class AnswerGraph:
+    def __init__(self, candidate):
+        self.candidate = candidate
+        self.calls = 0
+
+    async def ainvoke(self, payload):
+        self.calls += 1
+        return {
+            **payload,
+            "is_success": True,
+            "final_sql": self.candidate["sql"],
+            "final_result": self.candidate["execution_result"],
+            "candidate_generation": [self.candidate],
+        }
+
+
+def _cached_agent(candidate):
+    index = SimpleNamespace(fingerprint="f1")
+    store = SimpleNamespace(get_index=lambda name: index)
+    agent = SqlAgent.__new__(SqlAgent)
+    agent.schema_manager = SimpleNamespace(
+        current=SimpleNamespace(store=store, schema=SimpleNamespace(name="s"))
+    )
+    agent.answer_cache = AnswerCache()
+    agent.graph = AnswerGraph(candidate)
+    return agent
+
+
+def test_failed_merge_not_cached():
+    agent = _cached_agent(
+        {
+            "strategy": "merge",
+            "sql": "SELECT nope FROM t",
+            "execution_result": "no such column: nope",
+            "is_success": False,
+        }
+    )
+
+    asyncio.run(agent.arun("q"))
+    response = asyncio.run(agent.arun("q"))
+
+    assert agent.graph.calls == 2
+    assert "answer_cache" not in response
+    assert agent.answer_cache.stats()["entries"] == 0
+
+
+def test_executed_answer_cached():
+    agent = _cached_agent(
+        {
+            "strategy": "merge",
+            "sql": "SELECT 1",
+            "execution_result": "1",
+            "is_success": True,
+        }
+    )
+
+    asyncio.run(agent.arun("q"))
+    response = asyncio.run(agent.arun("q"))
+
+    assert agent.graph.calls == 1
+    assert response["answer_cache"] == "exact"
+    assert response["final_sql"] == "SELECT 1"
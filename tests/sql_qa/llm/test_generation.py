@@ -0,0 +1,152 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from langchain_community.utilities import SQLDatabase
+
+from sql_qa.llm.generation import LLMGeneration
+from sql_qa.llm.type import (
+    SQLGenerationResponse,
+    SQLQueryFixerResponse,
+    SQLQueryValidationResponse,
+)
+
+_DELAY = 0.2
+
+
+class FakeAdapter:
+    def __init__(self, structured_responses, delay=_DELAY):
+        self.structured_responses = list(structured_responses)
+        self.delay = delay
+        self.calls = 0
+        self.payloads = []
+
+    async def ainvoke(self, payload, *args, **kwargs):
+        self.payloads.append(payload)
+        await asyncio.sleep(self.delay)
+        response = self.structured_responses[
+            min(self.calls, len(self.structured_responses) - 1)
+        ]
+        self.calls += 1
+        return {
+            "messages": [SimpleNamespace(content=str(response))],
+            "structured_response": response,
+        }
+
+    def invoke(self, *args, **kwargs):
+        raise AssertionError("candidate graph must not block on invoke")
+
+
+def _make_generator(adapters, model="fake"):
+
+    def fake_get_react_agent(*args, response_format=None, **kwargs):
+        return adapters[response_format]
+
+    with patch(
+        "sql_qa.llm.generation.get_react_agent", side_effect=fake_get_react_agent
+    ), patch(
+        "sql_qa.llm.generation.get_db",
+        return_value=SQLDatabase.from_uri("sqlite:///:memory:"),
+    ):
+        return LLMGeneration(
+            {},
+            prompt_type="direct_generation",
+            query_validation_kwargs={"model": model},
+            query_fixer_kwargs={"model": model},
+            generation_kwargs={"model": model},
+        )
+
+
+def _adapters(sql="SELECT 1", fixed_sql="SELECT 2"):
+    return {
+        SQLGenerationResponse: FakeAdapter([{"sql": sql, "explaination": "gen"}]),
+        SQLQueryValidationResponse: FakeAdapter(
+            [{"is_sql_correct": True, "explaination": "ok"}]
+        ),
+        SQLQueryFixerResponse: FakeAdapter(
+            [{"sql": fixed_sql, "explaination": "fixed"}]
+        ),
+    }
+
+
+def test_candidate_graphs_overlap():
+    generators = [_make_generator(_adapters()) for _ in range(3)]
+    payload = {"user_question": "q", "schema": "s"}
+
+    async def run():
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *[g.graph.ainvoke(payload) for g in generators]
+        )
+        return results, time.perf_counter() - start
+
+    results, elapsed = asyncio.run(run())
+
+    assert all(r["is_sql_correct"] for r in results)
+    # candidate + validate per graph, sequential would take 3 * 2 * _DELAY
+    assert elapsed < 3 * 2 * _DELAY
+
+
+def test_fix_query_uses_fixed_sql():
+    adapters = _adapters(sql="SELECT * FROM missing_table", fixed_sql="SELECT 2")
+    generator = _make_generator(adapters)
+
+    result = asyncio.run(
+        generator.graph.ainvoke({"user_question": "q", "schema": "s"})
+    )
+
+    assert adapters[SQLQueryFixerResponse].calls == 1
+    assert result["sql"] == "SELECT 2"
+    assert result["execution_result"] == "[(2,)]"
+
+
+def test_adapter_error_routes_back_instead_of_raising():
+    adapters = _adapters()
+    generator = _make_generator(adapters)
+
+    async def boom(*args, **kwargs):
+        raise RuntimeError("provider down")
+
+    adapters[SQLQueryValidationResponse].ainvoke = boom
+
+    result = asyncio.run(
+        generator.graph.ainvoke({"user_question": "q", "schema": "s"})
+    )
+    assert result["run_iter"] >= 1
+
+
+def test_nodes_share_the_schema_prefix():
+    adapters = _adapters(sql="SELECT * FROM missing_table", fixed_sql="SELECT 2")
+    # a provider caching the marked prefix for sure
+    generator = _make_generator(adapters, model="anthropic:claude")
+
+    asyncio.run(
+        generator.graph.ainvoke({"user_question": "q", "schema": "CREATE TABLE t"})
+    )
+
+    payloads = [p for adapter in adapters.values() for p in adapter.payloads]
+    assert len(payloads) == 3
+    prefixes = {p["messages"][0]["content"][0]["text"] for p in payloads}
+    suffixes = {p["messages"][-1]["content"] for p in payloads}
+    # generation, validation and fixing differ only after the cached prefix
+    assert len(prefixes) == 1
+    assert "CREATE TABLE t" in prefixes.pop()
+    assert len(suffixes) == 3
+    assert not any("CREATE TABLE t" in suffix for suffix in suffixes)
+
+
+def test_validation_is_schema_free_without_explicit_caching():
+    adapters = _adapters()
+    generator = _make_generator(adapters)
+
+    asyncio.run(
+        generator.graph.ainvoke({"user_question": "q", "schema": "CREATE TABLE t"})
+    )
+
+    (generation,) = adapters[SQLGenerationResponse].payloads
+    (validation,) = adapters[SQLQueryValidationResponse].payloads
+    assert "CREATE TABLE t" in generation["messages"][0]["content"]
+    assert not any(
+        "CREATE TABLE t" in m["content"] for m in validation["messages"]
+    )
@@ -0,0 +1,188 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from sql_qa.llm.limiter import (
+    BATCH,
+    INTERACTIVE,
+    ModelLimiter,
+    llm_priority,
+    rate_limited,
+)
+from sql_qa.llm.util import estimate_tokens
+
+
+def test_concurrency_cap():
+    limiter = ModelLimiter("m", max_concurrency=2)
+    running = 0
+    peak = 0
+
+    async def call():
+        nonlocal running, peak
+        async with limiter.aslot():
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    async def main():
+        await asyncio.gather(*(call() for _ in range(6)))
+
+    asyncio.run(main())
+    assert peak == 2
+    assert limiter.stats()["admitted"] == 6
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_priority_order():
+    limiter = ModelLimiter("m", max_concurrency=1)
+    order = []
+
+    async def call(name, priority):
+        with llm_priority(priority):
+            async with limiter.aslot():
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+    async def main():
+        # holds the only slot while the others queue up
+        first = asyncio.create_task(call("first", BATCH))
+        await asyncio.sleep(0)
+        batch = asyncio.create_task(call("batch", BATCH))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(call("interactive", INTERACTIVE))
+        await asyncio.sleep(0)
+        assert limiter.stats()["queue_depth"] == 2
+        assert limiter.stats()["queue_depth_interactive"] == 1
+        await asyncio.gather(first, batch, interactive)
+
+    asyncio.run(main())
+    assert order == ["first", "interactive", "batch"]
+
+
+def test_requests_per_minute():
+    now = [0.0]
+    limiter = ModelLimiter("m", rpm=60, clock=lambda: now[0])
+    # the bucket starts full
+    for _ in range(60):
+        limiter.acquire()
+        limiter.release()
+
+    acquired = threading.Event()
+
+    def call():
+        limiter.acquire()
+        acquired.set()
+
+    thread = threading.Thread(target=call)
+    thread.start()
+    assert not acquired.wait(0.05)
+    assert limiter.stats()["queue_depth"] == 1
+
+    # one request per second refills
+    now[0] = 1.0
+    assert acquired.wait(2)
+    thread.join()
+
+
+def test_tokens_per_minute():
+    now = [0.0]
+    limiter = ModelLimiter("m", tpm=60, clock=lambda: now[0])
+    limiter.acquire(50)
+    limiter.release()
+
+    acquired = threading.Event()
+
+    def call():
+        limiter.acquire(11)
+        acquired.set()
+
+    thread = threading.Thread(target=call)
+    thread.start()
+    # 10 tokens left, refilling at 1 token per second
+    now[0] = 0.5
+    assert not acquired.wait(0.05)
+    now[0] = 1.0
+    assert acquired.wait(2)
+    thread.join()
+
+
+def test_release_wakes_waiter_held_by_bucket():
+    limiter = ModelLimiter("m", rpm=60, max_concurrency=1)
+    for _ in range(59):
+        limiter.acquire()
+        limiter.release()
+    limiter.acquire()
+
+    acquired = threading.Event()
+
+    def call():
+        limiter.acquire()
+        acquired.set()
+
+    thread = threading.Thread(target=call)
+    thread.start()
+    assert not acquired.wait(0.05)
+    # the slot is free now but the bucket is empty for about a second
+    limiter.release()
+    assert not acquired.wait(0.5)
+    assert acquired.wait(3)
+    thread.join()
+
+
+def test_async_release_wakes_waiter_held_by_bucket():
+    limiter = ModelLimiter("m", rpm=60, max_concurrency=1)
+
+    async def main():
+        for _ in range(59):
+            await limiter.aacquire()
+            limiter.release()
+        await limiter.aacquire()
+        waiting = asyncio.create_task(limiter.aacquire())
+        await asyncio.sleep(0.05)
+        limiter.release()
+        await asyncio.wait_for(waiting, 3)
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_leaves_queue():
+    limiter = ModelLimiter("m", max_concurrency=1)
+
+    async def main():
+        await limiter.aacquire()
+        waiting = asyncio.create_task(limiter.aacquire())
+        await asyncio.sleep(0)
+        assert limiter.stats()["queue_depth"] == 1
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert limiter.stats()["queue_depth"] == 0
+        limiter.release()
+        assert limiter.stats()["in_flight"] == 0
+
+    asyncio.run(main())
+
+
+def test_sync_slot_waits_for_release():
+    limiter = ModelLimiter("m", max_concurrency=1)
+    limiter.acquire()
+    threading.Timer(0.05, limiter.release).start()
+
+    started = time.perf_counter()
+    with limiter.slot():
+        assert time.perf_counter() - started >= 0.04
+    assert limiter.stats()["max_wait"] >= 0.04
+
+
+def test_rate_limited_disabled_model(monkeypatch):
+    monkeypatch.setattr("sql_qa.llm.limiter.get_limiter", lambda model: None)
+    with rate_limited("m", "hello"):
+        pass
+
+
+def test_estimate_tokens():
+    payload = {"messages": [{"role": "user", "content": "x" * 400}]}
+    assert 100 <= estimate_tokens(payload) <= 105
@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+from sql_qa.llm.prefix_cache import (
+    AnthropicPrefixCache,
+    PrefixCache,
+    prefix_key,
+)
+from sql_qa.prompt.template import PromptParts, Role
+
+
+def test_local_cache_tracks_reuse_per_model():
+    cache = PrefixCache()
+    parts = PromptParts(prefix="system + schema " * 50, suffix="question 1")
+
+    first = cache.handle("m", parts.prefix)
+    second = cache.handle("m", parts.prefix)
+    other_model = cache.handle("other", parts.prefix)
+
+    assert not first.cached
+    assert second.cached
+    assert not other_model.cached
+    assert first.key == second.key == prefix_key(parts.prefix)
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    # reuse alone saves nothing until the provider reports cached tokens
+    assert stats["saved_tokens"] == 0
+
+
+def test_saved_tokens_come_from_usage_metadata():
+    cache = PrefixCache()
+    usage = {"input_tokens": 120, "input_token_details": {"cache_read": 100}}
+    messages = [
+        SimpleNamespace(usage_metadata=None),
+        SimpleNamespace(usage_metadata=usage),
+    ]
+    cache.record_usage({"messages": messages})
+    cache.record_usage(None)
+    assert cache.stats()["saved_tokens"] == 100
+
+
+def test_messages_put_prefix_first():
+    messages = PrefixCache().messages("m", PromptParts(prefix="p", suffix="s"))
+    assert messages == [
+        {"role": Role.SYSTEM, "content": "p"},
+        {"role": Role.USER, "content": "s"},
+    ]
+
+
+def test_anthropic_marks_prefix_for_caching():
+    messages = AnthropicPrefixCache().messages(
+        "anthropic:claude", PromptParts(prefix="p", suffix="s")
+    )
+    block = messages[0]["content"][0]
+    assert block["text"] == "p"
+    assert block["cache_control"] == {"type": "ephemeral"}
+    assert messages[1]["content"] == "s"
+
+
+def test_prompt_parts_messages():
+    parts = PromptParts(prefix="p", suffix="s")
+    assert [m.role for m in parts.to_messages()] == [Role.SYSTEM, Role.USER]
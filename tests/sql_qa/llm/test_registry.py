@@ -0,0 +1,100 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from sql_qa.llm import registry
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    calls = []
+
+    def build(model, **kwargs):
+        if "broken" in model:
+            raise ImportError("provider package not installed")
+        calls.append((model, kwargs))
+        time.sleep(0.01)
+        return SimpleNamespace(model=model, kwargs=kwargs)
+
+    registry.close_models()
+    monkeypatch.setattr(registry, "_build_chat_model", build)
+    yield calls
+    asyncio.run(registry.aclose_models())
+
+
+def test_model_built_once(builds):
+    models = []
+    threads = [
+        threading.Thread(
+            target=lambda: models.append(registry.get_chat_model("google_genai:g"))
+        )
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(builds) == 1
+    assert all(model is models[0] for model in models)
+    other = registry.get_chat_model("google_genai:g", temperature=0)
+    assert other is not models[0]
+    assert registry.get_chat_model("google_genai:g", temperature=0) is other
+    assert len(builds) == 2
+    assert registry.get_registry_stats()["models"] == ["google_genai:g"]
+
+
+def test_provider_http_pool_shared(builds):
+    a = registry.get_chat_model("openai:gpt-4o")
+    b = registry.get_chat_model("gpt-4o-mini")
+    c = registry.get_chat_model("google_genai:g")
+    assert a.kwargs["http_client"] is b.kwargs["http_client"]
+    assert a.kwargs["http_async_client"] is b.kwargs["http_async_client"]
+    assert "http_client" not in c.kwargs
+    assert registry.get_registry_stats()["http_client_providers"] == ["openai"]
+
+
+def test_provider_of():
+    assert registry.provider_of("google_genai:gemini-2.0-flash") == "google_genai"
+    assert registry.provider_of("gpt-4o") == "openai"
+    assert registry.provider_of("claude-3-5-sonnet") == "anthropic"
+    # as the baseline init_chat_model calls, with an API key
+    assert registry.provider_of("gemini-2.0-flash") == "google_genai"
+    assert registry.provider_of("Qwen/Qwen2.5-7B") == ""
+
+
+def test_agent_built_once(builds):
+    built = []
+
+    def build():
+        built.append(1)
+        return object()
+
+    agent = registry.get_agent("clarify", build)
+    assert registry.get_agent("clarify", build) is agent
+    assert len(built) == 1
+    registry.close_models()
+    assert registry.get_agent("clarify", build) is not agent
+
+
+def test_warm_up(builds):
+    built = registry.warm_up(["google_genai:g", "broken:model"])
+    assert built == {"google_genai:g": True, "broken:model": False}
+    registry.get_chat_model("google_genai:g")
+    assert len(builds) == 1
+
+
+def test_warm_up_configured_models(builds):
+    models = registry.configured_models()
+    assert models == ["google_genai:gemini-2.0-flash"]
+    assert registry.warm_up() == {"google_genai:gemini-2.0-flash": True}
+
+
+def test_aclose_models(builds):
+    model = registry.get_chat_model("openai:gpt-4o")
+    asyncio.run(registry.aclose_models())
+    assert model.kwargs["http_client"].is_closed
+    assert model.kwargs["http_async_client"].is_closed
+    assert registry.get_registry_stats()["models"] == []
@@ -0,0 +1,227 @@
+import asyncio
+import time
+
+import pytest
+
+from shared.tracing import span
+from sql_qa.llm.resilience import (
+    CircuitBreaker,
+    ResilientCaller,
+    _breakers,
+    ResiliencePolicy,
+    get_latency_tracker,
+    get_model_health,
+    reset_model_health,
+)
+
+
+@pytest.fixture(autouse=True)
+def _clean_health():
+    reset_model_health()
+    yield
+    reset_model_health()
+
+
+def _policy(**kwargs):
+    defaults = dict(
+        timeout=1.0,
+        max_attempts=1,
+        backoff_base=0.0,
+        backoff_max=0.0,
+        hedge_initial_delay=0.05,
+        hedge_min_delay=0.01,
+        hedge_min_samples=3,
+    )
+    defaults.update(kwargs)
+    return ResiliencePolicy(**defaults)
+
+
+class FakeExecutor:
+    def __init__(self, delays, result="ok"):
+        self.delays = list(delays)
+        self.result = result
+        self.calls = 0
+        self.cancelled = 0
+
+    async def ainvoke(self, *args, **kwargs):
+        delay = self.delays[min(self.calls, len(self.delays) - 1)]
+        self.calls += 1
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+    def invoke(self, *args, **kwargs):
+        delay = self.delays[min(self.calls, len(self.delays) - 1)]
+        self.calls += 1
+        time.sleep(delay)
+        return self.result
+
+
+def test_hedge_to_fallback_wins_and_cancels_primary():
+    primary = FakeExecutor([1.0], result="slow")
+    fallback = FakeExecutor([0.0], result="fast")
+    caller = ResilientCaller(
+        "primary", _policy(timeout=2.0), fallback=lambda: ("fallback", fallback)
+    )
+
+    started = time.perf_counter()
+    result = asyncio.run(caller.wrap_async(primary.ainvoke)())
+
+    assert result == "fast"
+    assert time.perf_counter() - started < 0.5
+    assert primary.cancelled == 1
+    assert fallback.calls == 1
+
+
+def test_fast_call_is_not_hedged():
+    primary = FakeExecutor([0.0])
+    fallback = FakeExecutor([0.0])
+    caller = ResilientCaller("primary", _policy(), fallback=lambda: ("fallback", fallback))
+
+    assert asyncio.run(caller.wrap_async(primary.ainvoke)()) == "ok"
+    assert fallback.calls == 0
+    assert len(get_latency_tracker("primary")) == 1
+
+
+def test_hedge_delay_follows_p95():
+    caller = ResilientCaller("model", _policy(hedge_min_samples=3))
+    assert caller.hedge_delay() == 0.05
+
+    for seconds in (0.2, 0.3, 0.4):
+        get_latency_tracker("model").record(seconds)
+    assert caller.hedge_delay() == 0.4
+
+
+def test_timeout_is_retried():
+    primary = FakeExecutor([5.0, 0.0])
+    caller = ResilientCaller(
+        "primary",
+        _policy(timeout=0.05, max_attempts=2, hedge_enabled=False),
+    )
+
+    async def run():
+        with span("node") as node:
+            assert await caller.wrap_async(primary.ainvoke)("question") == "ok"
+        return node
+
+    node = asyncio.run(run())
+    assert primary.calls == 2
+    # the llm span's counters rolled up into the node
+    assert node.counters["retries"] == 1
+    assert node.counters["input_tokens"] > 0
+
+
+def test_final_failure_returns_none():
+    primary = FakeExecutor([0.0], result=ValueError("boom"))
+    caller = ResilientCaller("primary", _policy(max_attempts=3))
+
+    assert asyncio.run(caller.wrap_async(primary.ainvoke)()) is None
+    assert primary.calls == 3
+
+
+def test_open_circuit_skips_model():
+    primary = FakeExecutor([0.0], result=ValueError("boom"))
+    caller = ResilientCaller("primary", _policy(failure_threshold=2, max_attempts=2))
+
+    assert asyncio.run(caller.wrap_async(primary.ainvoke)()) is None
+    assert get_model_health()["primary"]["circuit"] == CircuitBreaker.OPEN
+
+    assert asyncio.run(caller.wrap_async(primary.ainvoke)()) is None
+    assert primary.calls == 2
+
+
+def test_circuit_half_open_after_reset_timeout():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    now[0] = 10.0
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    # only one trial call at a time
+    assert not breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    now[0] = 20.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_cancelled_half_open_trial_frees_the_slot():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+    breaker.record_failure()
+    now[0] = 10.0
+    _breakers["primary"] = breaker
+    primary = FakeExecutor([5.0])
+    caller = ResilientCaller("primary", _policy(timeout=10.0, hedge_enabled=False))
+
+    async def run():
+        trial = asyncio.ensure_future(caller.wrap_async(primary.ainvoke)())
+        await asyncio.sleep(0.05)
+        # e.g. a losing strategy cancelled by the race mode
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+    asyncio.run(run())
+    assert primary.cancelled == 1
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+
+
+def test_cancelled_call_keeps_another_calls_trial():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+    _breakers["primary"] = breaker
+    primary = FakeExecutor([5.0])
+    caller = ResilientCaller("primary", _policy(timeout=10.0, hedge_enabled=False))
+
+    async def run():
+        # admitted while the circuit was closed
+        call = asyncio.ensure_future(caller.wrap_async(primary.ainvoke)())
+        await asyncio.sleep(0.05)
+        breaker.record_failure()
+        now[0] = 10.0
+        # another call takes the half-open trial
+        assert breaker.allow()
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+
+    asyncio.run(run())
+    assert not breaker.allow()
+
+
+def test_sync_hedge():
+    primary = FakeExecutor([0.5], result="slow")
+    fallback = FakeExecutor([0.0], result="fast")
+    caller = ResilientCaller("primary", _policy(), fallback=lambda: ("fallback", fallback))
+
+    assert caller.wrap_sync(primary.invoke)() == "fast"
+
+
+def test_policy_from_config():
+    policy = ResiliencePolicy.from_config(
+        {
+            "timeout": "30",
+            "max_attempts": "4",
+            "hedge": {"enabled": "false", "fallback_model": ""},
+            "circuit_breaker": {"failure_threshold": 2},
+        }
+    )
+    assert policy.timeout == 30.0
+    assert policy.max_attempts == 4
+    assert not policy.hedge_enabled
+    assert policy.fallback_model is None
+    assert policy.failure_threshold == 2
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from pydantic import BaseModel
+
+from sql_qa.llm.response_cache import ResponseCache, response_key
+
+
+class Answer(BaseModel):
+    sql: str
+
+
+class FakeAgent:
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, payload, config=None):
+        self.calls += 1
+        return {"messages": [AIMessage(content=f"answer {self.calls}")]}
+
+    async def ainvoke(self, payload, config=None):
+        return self.invoke(payload, config)
+
+
+def _payload(text="question"):
+    return {"messages": [{"role": "user", "content": text}]}
+
+
+def _key(payload):
+    return response_key("model", "system", payload, Answer, 0.0)
+
+
+def test_key_is_deterministic():
+    assert _key(_payload()) == _key(_payload())
+    assert _key(_payload()) != _key(_payload("other"))
+    assert response_key("a", "p", _payload()) != response_key("b", "p", _payload())
+    assert response_key("m", "p", _payload(), Answer) != response_key(
+        "m", "p", _payload()
+    )
+    # message ids change between runs, they are not part of the key
+    assert response_key("m", "p", [HumanMessage("hi", id="1")]) == response_key(
+        "m", "p", [HumanMessage("hi", id="2")]
+    )
+
+
+def test_read_through(tmp_path):
+    cache = ResponseCache(str(tmp_path / "llm.sqlite"))
+    agent = FakeAgent()
+    invoke = cache.wrap_sync(agent.invoke, "model", _key)
+
+    first = invoke(_payload())
+    second = invoke(_payload())
+    assert agent.calls == 1
+    assert second["messages"][-1].content == first["messages"][-1].content
+    invoke(_payload("other"))
+    assert agent.calls == 2
+    assert cache.stats()["hits"] == 1
+
+
+def test_persists_across_instances(tmp_path):
+    path = str(tmp_path / "llm.sqlite")
+    agent = FakeAgent()
+    writer = ResponseCache(path, mode="write_only")
+    asyncio.run(writer.wrap_async(agent.ainvoke, "model", _key)(_payload()))
+    asyncio.run(writer.wrap_async(agent.ainvoke, "model", _key)(_payload()))
+    assert agent.calls == 2
+    writer.close()
+
+    replay = ResponseCache(path, mode="replay_only")
+    ainvoke = replay.wrap_async(agent.ainvoke, "model", _key)
+    response = asyncio.run(ainvoke(_payload()))
+    assert response["messages"][-1].content == "answer 2"
+    # a replay miss fails like an unavailable model instead of calling it
+    assert asyncio.run(ainvoke(_payload("unseen"))) is None
+    assert agent.calls == 2
+
+
+def test_off_mode_does_not_touch_disk(tmp_path):
+    path = tmp_path / "llm.sqlite"
+    cache = ResponseCache(str(path), mode="off")
+    agent = FakeAgent()
+    invoke = cache.wrap_sync(agent.invoke, "model", _key)
+    invoke(_payload())
+    invoke(_payload())
+    assert agent.calls == 2
+    assert not path.exists()
+
+
+def test_failed_calls_are_not_cached(tmp_path):
+    cache = ResponseCache(str(tmp_path / "llm.sqlite"))
+    responses = iter([None, {"messages": []}])
+    invoke = cache.wrap_sync(lambda payload: next(responses), "model", _key)
+    assert invoke(_payload()) is None
+    assert invoke(_payload()) == {"messages": []}
+
+
+def test_size_bounded_eviction(tmp_path):
+    cache = ResponseCache(str(tmp_path / "llm.sqlite"), max_bytes=250)
+    for i in range(5):
+        cache.set(f"key{i}", "x" * 100)
+    stats = cache.stats()
+    assert stats["bytes"] <= 250
+    assert stats["evictions"] >= 3
+    assert cache.get("key4") is not None
+    assert cache.get("key0") is None
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        ResponseCache("unused", mode="sometimes")
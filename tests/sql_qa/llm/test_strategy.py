@@ -0,0 +1,179 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from langchain_community.utilities import SQLDatabase
+
+from shared.turn_log import BufferedTurnLogger, JsonlTurnSink
+from sql_qa.llm.strategy import StrategyFactory
+
+
+class FakeGraph:
+    def __init__(
+        self, delay, sql, is_sql_correct=True, result="[(1,)]", fingerprint=None
+    ):
+        self.delay = delay
+        self.sql = sql
+        self.is_sql_correct = is_sql_correct
+        self.result = result
+        self.fingerprint = fingerprint or result
+        self.cancelled = False
+
+    async def ainvoke(self, payload):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return {
+            "is_sql_correct": self.is_sql_correct,
+            "sql": self.sql,
+            "execution_result": self.result,
+            "execution_fingerprint": self.fingerprint,
+            "correct_thoughts": [{"name": "candidate", "value": "ok"}],
+        }
+
+
+class MergerAdapter:
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, *args, **kwargs):
+        self.calls += 1
+        return {"structured_response": {"sql": "SELECT 9", "explaination": "merged"}}
+
+
+def _factory(graphs, mode="race", voting=None, **race_config):
+    with patch(
+        "sql_qa.llm.strategy.get_react_agent", return_value=MergerAdapter()
+    ), patch("sql_qa.llm.strategy.LLMGeneration"), patch(
+        "sql_qa.llm.strategy.get_db",
+        return_value=SQLDatabase.from_uri("sqlite:///:memory:"),
+    ):
+        factory = StrategyFactory()
+    factory.generators = [
+        SimpleNamespace(prompt_type=f"strategy_{i}", graph=graph)
+        for i, graph in enumerate(graphs)
+    ]
+    factory.mode = mode
+    factory.race_config = race_config
+    factory.voting_config = voting or {}
+    factory._build_graph()
+    return factory
+
+
+def _run(factory):
+    async def run():
+        start = time.perf_counter()
+        result = await factory.graph.ainvoke({"user_question": "q", "schema": "s"})
+        return result, time.perf_counter() - start
+
+    return asyncio.run(run())
+
+
+def test_race_first_valid_wins_and_cancels_the_rest():
+    slow = FakeGraph(2.0, "SELECT 2")
+    factory = _factory(
+        [FakeGraph(0.05, "SELECT 0", is_sql_correct=False), FakeGraph(0.1, "SELECT 1"), slow]
+    )
+    result, elapsed = _run(factory)
+    assert elapsed < 1.0
+    assert slow.cancelled
+    assert result["logs"][-1]["sql"] == "SELECT 1"
+    assert [log["strategy"] for log in result["logs"]] == ["strategy_0", "strategy_1"]
+
+
+def test_race_agree_waits_for_k_matching_candidates():
+    factory = _factory(
+        [
+            FakeGraph(0.05, "SELECT a FROM t", result="[(1,)]"),
+            FakeGraph(0.1, "SELECT b FROM t", result="[(2,)]"),
+            FakeGraph(0.15, "select  a from t", result="[(1,)]"),
+            FakeGraph(2.0, "SELECT c FROM t"),
+        ],
+        quorum="agree",
+        k=2,
+    )
+    result, elapsed = _run(factory)
+    assert elapsed < 1.0
+    assert result["logs"][-1]["sql"] == "SELECT a FROM t"
+    assert len(result["logs"]) == 3
+
+
+def test_race_background_losers_keep_running():
+    slow = FakeGraph(0.3, "SELECT 2")
+    factory = _factory([FakeGraph(0.05, "SELECT 1"), slow], losers="background")
+
+    async def run():
+        result = await factory.graph.ainvoke({"user_question": "q", "schema": "s"})
+        assert len(factory._background) == 1
+        await asyncio.gather(*factory._background)
+        return result
+
+    result = asyncio.run(run())
+    assert result["logs"][-1]["sql"] == "SELECT 1"
+    assert not slow.cancelled
+    assert not factory._background
+
+
+def test_race_background_losers_do_not_log_to_the_saved_turn(tmp_path):
+    turn_logger = BufferedTurnLogger(JsonlTurnSink(str(tmp_path / "turns.jsonl")))
+    factory = _factory(
+        [FakeGraph(0.05, "SELECT 1"), FakeGraph(0.3, "SELECT 2")],
+        losers="background",
+    )
+
+    async def run():
+        row = turn_logger.new_turn()
+        await factory.graph.ainvoke({"user_question": "q", "schema": "s"})
+        turn_logger.save_turn()
+        await asyncio.gather(*factory._background)
+        return row
+
+    with patch("sql_qa.llm.strategy.turn_logger", turn_logger):
+        row = asyncio.run(run())
+    turn_logger.close()
+    assert "strategy_0" in row
+    assert "strategy_1" not in row
+
+
+def test_vote_skips_merger_when_candidates_agree():
+    factory = _factory(
+        [
+            FakeGraph(0.01, "SELECT a FROM t ORDER BY a", fingerprint="rows-1"),
+            FakeGraph(0.02, "SELECT a FROM t", fingerprint="rows-1"),
+            FakeGraph(0.03, "SELECT b FROM t", fingerprint="rows-2"),
+        ],
+        mode="all",
+    )
+    result, _ = _run(factory)
+    assert factory.merger_adapter.calls == 0
+    final = result["logs"][-1]
+    assert final["strategy"] == "vote"
+    assert final["sql"] in ("SELECT a FROM t ORDER BY a", "SELECT a FROM t")
+
+
+def test_vote_falls_back_to_merger_on_disagreement():
+    factory = _factory(
+        [
+            FakeGraph(0.01, "SELECT a FROM t", fingerprint="rows-1"),
+            FakeGraph(0.02, "SELECT b FROM t", fingerprint="rows-2"),
+        ],
+        mode="all",
+    )
+    result, _ = _run(factory)
+    assert factory.merger_adapter.calls == 1
+    assert result["logs"][-1]["sql"] == "SELECT 9"
+
+
+def test_agreement_groups_merge_on_sql_or_rows():
+    factory = _factory([], mode="all")
+    candidates = [
+        {"strategy": "a", "sql": "SELECT 1", "is_valid": True, "result_fingerprint": "x"},
+        {"strategy": "b", "sql": "select   1", "is_valid": True, "result_fingerprint": "y"},
+        {"strategy": "c", "sql": "SELECT 2", "is_valid": True, "result_fingerprint": "y"},
+        {"strategy": "d", "sql": "SELECT 3", "is_valid": False, "result_fingerprint": "x"},
+    ]
+    groups = factory._agreement_groups(candidates)
+    assert [[c["strategy"] for c in g] for g in groups] == [["a", "b", "c"]]
@@ -0,0 +1,74 @@
+import asyncio
+import json
+
+from shared.tracing import traced
+from sql_qa.llm.limiter import BATCH, current_priority
+from sql_qa.metrics.benchmark import BenchmarkItem, JsonlSink, run_benchmark
+
+
+class Agent:
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @traced("generation")
+    async def _generate(self, question):
+        await asyncio.sleep(0.01)
+
+    async def answer(self, question):
+        self.calls.append(question)
+        assert current_priority() == BATCH
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await self._generate(question)
+        finally:
+            self.in_flight -= 1
+        if question in self.fail:
+            raise RuntimeError("provider down")
+        return {"is_success": True, "final_sql": f"SELECT '{question}'", "final_result": ""}
+
+
+def _items(n):
+    return [BenchmarkItem(str(i), f"q{i}") for i in range(n)]
+
+
+def test_concurrent_run_records_every_question(tmp_path):
+    sink = JsonlSink(str(tmp_path / "results.jsonl"))
+    agent = Agent(fail={"q3"})
+    stats = asyncio.run(run_benchmark(_items(10), agent.answer, sink, workers=4))
+    sink.close()
+
+    assert agent.max_in_flight == 4
+    assert stats["total"] == 10
+    assert stats["ok"] == 9 and stats["error"] == 1
+    records = {r["id"]: r for r in sink.records()}
+    assert records["0"]["sql"] == "SELECT 'q0'"
+    assert records["0"]["stages"]["generation"] >= 0.01
+    assert records["3"]["status"] == "error"
+    assert records["3"]["error"] == "provider down"
+
+
+def test_resume_skips_completed_questions(tmp_path):
+    path = tmp_path / "results.jsonl"
+    sink = JsonlSink(str(path))
+    asyncio.run(run_benchmark(_items(3), Agent(fail={"q1"}).answer, sink))
+    sink.close()
+    # a crash while writing leaves a torn last line
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"id": "2", "sta')
+
+    agent = Agent()
+    stats = asyncio.run(run_benchmark(_items(5), agent.answer, sink, workers=2))
+    sink.close()
+
+    # q1 raised last time and is retried, q0 and q2 are not
+    assert sorted(agent.calls) == ["q1", "q3", "q4"]
+    assert stats["skipped"] == 2
+    records = {r["id"]: r for r in sink.records()}
+    assert len(records) == 5
+    assert records["1"]["status"] == "ok"
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert all(json.loads(line) for line in lines[-3:])
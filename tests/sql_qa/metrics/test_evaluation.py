@@ -123,3 +123,24 @@ def test_eval_raw_sql_hardness(sql_str, schema, expected):
     assert (
         evaluator.eval_raw_sql_hardness(sql_str) == expected
     )  # Adjust expected value based on actual SQL structure
+
+
+def test_execution_match_compares_every_row(tmp_path):
+    from shared.db import get_db
+    from src.sql_qa.metrics.evaluation import MetricType, SQLMetrics
+
+    db = get_db(f"sqlite:///{tmp_path / 'numbers.db'}")
+    db.run("CREATE TABLE numbers (n INTEGER)")
+    db.run("INSERT INTO numbers VALUES " + ", ".join(f"({i})" for i in range(600)))
+    metrics = SQLMetrics.__new__(SQLMetrics)
+    metrics.db = db
+    metrics.metrics = {MetricType.EXECUTION_MATCH}
+
+    # equal on the first 500 rows (the agent's row cap), not after
+    result = metrics.evaluate_queries(
+        ["SELECT n FROM numbers ORDER BY n"],
+        ["SELECT CASE WHEN n < 550 THEN n ELSE -n END FROM numbers ORDER BY n"],
+    )
+
+    assert len(metrics._execute_query("SELECT n FROM numbers")) == 600
+    assert result.metrics["execution_match"] == 0
@@ -0,0 +1,124 @@
+from sql_qa.prompt.budget import (
+    PromptBudget,
+    count_tokens,
+    summarize_rows,
+    truncate_text,
+)
+from sql_qa.prompt.template import PromptTemplate
+from sql_qa.schema.render import fit_schema, render_schema
+from sql_qa.schema.store import Column, Schema, SchemaStore, Table
+
+
+def test_count_tokens():
+    assert count_tokens("") == 0
+    assert count_tokens("SELECT id FROM t;") == 6
+    # long words count one token per 4 characters
+    assert count_tokens("x" * 400) == 100
+
+
+def test_truncate_text():
+    text = "\n".join(f"line {i} with some words" for i in range(100))
+    assert truncate_text(text, 10_000) == text
+    truncated = truncate_text(text, 50)
+    assert count_tokens(truncated) <= 50
+    assert truncated.startswith("line 0 with some words")
+    assert "tokens omitted]" in truncated
+
+
+def test_summarize_rows():
+    rows = [(i, f"name {i}") for i in range(200)]
+    text = str(rows)
+    summarized = summarize_rows(text, 100)
+    assert count_tokens(summarized) <= 100
+    assert summarized.startswith("[(0, 'name 0'), (1, 'name 1')")
+    kept = summarized.split("\n")[0].count("(")
+    assert summarized.endswith(f"... {200 - kept} more rows")
+
+    lines = "columns: id, name\n" + "\n".join(str(row) for row in rows)
+    summarized = summarize_rows(lines, 100)
+    assert count_tokens(summarized) <= 100
+    assert summarized.startswith("columns: id, name\n(0, 'name 0')")
+
+    error = "Error: " + "syntax " * 200
+    assert count_tokens(summarize_rows(error, 50)) <= 50
+
+
+def test_template_budget_trims_in_order():
+    template = PromptTemplate(template="Q: {question}\nR: {result}\nE: {evidence}")
+    result = str([(i, "value") for i in range(300)])
+    evidence = "because " * 100
+    budget = PromptBudget(
+        300, {"result": summarize_rows, "evidence": truncate_text}
+    )
+
+    prompt = template.format(
+        budget=budget, question="how many?", result=result, evidence=evidence
+    )
+    assert count_tokens(prompt) <= 300
+    # the result alone was enough to give up
+    assert evidence in prompt
+    assert "more rows" in prompt
+    # no budget, no change
+    assert result in template.format(
+        question="how many?", result=result, evidence=evidence
+    )
+
+
+def _wide_schema():
+    return Schema(
+        name="shop",
+        tables=[
+            Table(
+                name="customer",
+                columns=[Column(name="id", type="INTEGER", description="")]
+                + [
+                    Column(
+                        name=f"attribute_{i}",
+                        type="TEXT",
+                        description=f"free text attribute {i}",
+                        example=str([f"value {j}" for j in range(20)]),
+                    )
+                    for i in range(40)
+                ]
+                + [
+                    Column(name="revenue", type="REAL", description="total revenue"),
+                    Column(name="branch_id", type="INTEGER", description="branch"),
+                ],
+            ),
+            Table(
+                name="branch",
+                columns=[Column(name="id", type="INTEGER", description="")],
+            ),
+        ],
+        foreign_keys=["customer.branch_id=branch.id"],
+    )
+
+
+def test_fit_schema_steps():
+    schema = _wide_schema()
+    full = count_tokens(render_schema(schema))
+    assert fit_schema(schema, full) is schema
+
+    # cutting examples is enough, every column stays
+    shortened = fit_schema(schema, full * 2 // 3)
+    assert len(shortened.tables[0].columns) == 43
+    assert all(len(c.example) <= 43 for c in shortened.tables[0].columns if c.example)
+
+    fitted = fit_schema(schema, 150, question="total revenue by branch")
+    assert count_tokens(render_schema(fitted)) <= 150
+    names = [c.name for c in fitted.tables[0].columns]
+    # key columns and the relevant one survive
+    assert {"id", "branch_id", "revenue"} <= set(names)
+    assert len(names) < 43
+    assert all(c.example is None for c in fitted.tables[0].columns)
+    # the source schema is left as is
+    assert len(schema.tables[0].columns) == 43
+
+
+def test_store_render_budget():
+    store = SchemaStore()
+    store.add_schema(_wide_schema())
+    assert store.render(max_tokens=100_000) == store.render()
+    text = store.render(max_tokens=150, question="revenue")
+    assert count_tokens(text) <= 150
+    assert "revenue" in text
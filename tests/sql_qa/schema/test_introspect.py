@@ -0,0 +1,72 @@
+from sqlalchemy import create_engine, event, text
+
+from sql_qa.schema.introspect import catalog_signature, introspect_schema
+from sql_qa.schema.store import Schema
+
+
+def _engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'shop.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE branch (id INTEGER PRIMARY KEY, name TEXT)"))
+        conn.execute(
+            text(
+                "CREATE TABLE sale_invoice (id INTEGER PRIMARY KEY, "
+                "branch_id INTEGER REFERENCES branch(id), total REAL, doc BLOB)"
+            )
+        )
+        conn.execute(text("INSERT INTO branch VALUES (1, 'Ha Noi'), (2, 'Da Nang')"))
+        conn.execute(
+            text(
+                "INSERT INTO sale_invoice VALUES (1, 1, 10.5, x'00'), "
+                "(2, 1, 20, NULL), (3, 2, NULL, NULL)"
+            )
+        )
+    return engine
+
+
+def test_introspect_sqlite(tmp_path):
+    engine = _engine(tmp_path)
+    schema = introspect_schema(engine, name="shop", sample_rows=3, max_examples=2)
+
+    assert schema.name == "shop"
+    assert [t.name for t in schema.tables] == ["branch", "sale_invoice"]
+    invoice = schema.tables[1]
+    assert [(c.name, c.type) for c in invoice.columns] == [
+        ("id", "INTEGER"),
+        ("branch_id", "INTEGER"),
+        ("total", "REAL"),
+        ("doc", "BLOB"),
+    ]
+    examples = {c.name: c.example for c in invoice.columns}
+    assert examples == {"id": "[1, 2]", "branch_id": "[1, 2]", "total": "[10.5, 20.0]", "doc": None}
+    assert schema.tables[0].columns[1].example == "['Ha Noi', 'Da Nang']"
+    assert schema.foreign_keys == ["sale_invoice.branch_id=branch.id"]
+
+
+def test_catalog_is_read_in_bulk(tmp_path):
+    engine = _engine(tmp_path)
+    statements = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    introspect_schema(engine, sample_rows=0)
+    assert len(statements) == 2
+
+
+def test_disk_cache_and_signature(tmp_path):
+    engine = _engine(tmp_path)
+    cache_dir = str(tmp_path / "cache")
+    first = introspect_schema(engine, cache_dir=cache_dir)
+    signature = catalog_signature(engine)
+
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE item (id INTEGER PRIMARY KEY)"))
+    cached = introspect_schema(engine, cache_dir=cache_dir)
+    assert cached == first
+    assert catalog_signature(engine) != signature
+
+    refreshed = introspect_schema(engine, cache_dir=cache_dir, refresh=True)
+    assert "item" in [t.name for t in refreshed.tables]
+    assert isinstance(Schema.load(next((tmp_path / "cache").iterdir())), Schema)
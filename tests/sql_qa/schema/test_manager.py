@@ -0,0 +1,99 @@
+import json
+import os
+
+from sql_qa.schema.manager import SchemaManager, diff_schemas
+from sql_qa.schema.retrieval import HashingEmbedder, SchemaRetriever
+from sql_qa.schema.store import Schema
+
+
+def _payload(branch_description="store branches", extra_table=False):
+    tables = [
+        {
+            "name": "sale_invoice",
+            "description": "sales invoices",
+            "columns": [{"name": "id", "type": "INTEGER", "description": "id"}],
+        },
+        {
+            "name": "branch",
+            "description": branch_description,
+            "columns": [{"name": "id", "type": "INTEGER", "description": "id"}],
+        },
+    ]
+    if extra_table:
+        tables.append(
+            {
+                "name": "item",
+                "columns": [{"name": "id", "type": "INTEGER", "description": "id"}],
+            }
+        )
+    return {
+        "name": "shop",
+        "tables": tables,
+        "foreign_keys": ["sale_invoice.branch_id=branch.id"],
+    }
+
+
+def _write(path, payload, mtime):
+    path.write_text(json.dumps(payload), encoding="utf-8")
+    os.utime(path, ns=(mtime, mtime))
+
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__(dim=128)
+        self.embedded = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return super().embed_documents(texts)
+
+
+def test_diff_schemas():
+    diff = diff_schemas(
+        Schema(**_payload()), Schema(**_payload("branches", extra_table=True))
+    )
+    assert diff.added == {"item"}
+    assert diff.changed == {"branch"}
+    assert not diff.removed and not diff.foreign_keys_changed
+
+
+def test_refresh_swaps_only_on_change(tmp_path):
+    path = tmp_path / "schema.json"
+    _write(path, _payload(), 1_000_000_000)
+    embedder = CountingEmbedder()
+    manager = SchemaManager.from_path(
+        str(path),
+        retriever_factory=lambda schema, store: SchemaRetriever(
+            schema, embedder, index=store.get_index(schema.name)
+        ),
+    )
+    pinned = manager.current
+    assert embedder.embedded == 4
+
+    # Same content, new mtime: nothing to swap.
+    _write(path, _payload(), 2_000_000_000)
+    assert manager.refresh() is None
+    assert manager.current is pinned
+
+    _write(path, _payload("branches", extra_table=True), 3_000_000_000)
+    diff = manager.refresh()
+    assert diff.added == {"item"} and diff.changed == {"branch"}
+    current = manager.current
+    assert current.version == 2
+    # Only the changed and added tables' documents are embedded again.
+    assert embedder.embedded == 4 + 3
+    assert "item" in current.store.get_index("shop").tables
+    # In-flight requests keep the version they started with.
+    assert [t.name for t in pinned.schema.tables] == ["sale_invoice", "branch"]
+    assert "item" not in pinned.store.get_index("shop").tables
+
+
+def test_broken_file_keeps_current_version(tmp_path):
+    path = tmp_path / "schema.json"
+    _write(path, _payload(), 1_000_000_000)
+    manager = SchemaManager.from_path(str(path))
+    current = manager.current
+    path.write_text("{", encoding="utf-8")
+    os.utime(path, ns=(2_000_000_000, 2_000_000_000))
+    assert manager.refresh() is None
+    assert manager.current is current
@@ -0,0 +1,82 @@
+from unittest.mock import patch
+
+from sql_qa.schema import store as store_module
+from sql_qa.schema.render import render_ddl, render_mschema
+from sql_qa.schema.store import Column, Schema, SchemaStore, Table
+
+
+def _schema(description="sales invoices"):
+    return Schema(
+        name="shop",
+        tables=[
+            Table(
+                name="sale_invoice",
+                description=description,
+                columns=[
+                    Column(name="id", type="INTEGER", description="invoice id"),
+                    Column(
+                        name="branch_id",
+                        type="INTEGER",
+                        description="branch",
+                        example="[1, 4]",
+                    ),
+                ],
+            ),
+            Table(
+                name="branch",
+                columns=[Column(name="id", type="INTEGER", description="")],
+            ),
+        ],
+        foreign_keys=["sale_invoice.branch_id=branch.id"],
+    )
+
+
+def test_render_mschema():
+    assert render_mschema(_schema()) == "\n".join(
+        [
+            "【DB_ID】 shop",
+            "【Schema】",
+            "# Table: sale_invoice, sales invoices",
+            "[",
+            "(id:INTEGER, invoice id),",
+            "(branch_id:INTEGER, branch, Examples: [1, 4])",
+            "]",
+            "# Table: branch",
+            "[",
+            "(id:INTEGER)",
+            "]",
+            "【Foreign keys】",
+            "sale_invoice.branch_id=branch.id",
+        ]
+    )
+
+
+def test_render_ddl():
+    ddl = render_ddl(_schema())
+    assert "CREATE TABLE sale_invoice (\n  id INTEGER, -- invoice id\n" in ddl
+    assert "  FOREIGN KEY (branch_id) REFERENCES branch(id)\n);" in ddl
+    assert ddl.endswith("CREATE TABLE branch (\n  id INTEGER\n);")
+
+
+def test_render_is_cached_per_table_subset():
+    store = SchemaStore()
+    store.add_schema(_schema())
+    with patch.object(
+        store_module, "render_schema", wraps=store_module.render_schema
+    ) as render:
+        first = store.render(store.search_tables(["branch"], mode="same"))
+        again = store.render(store.search_tables(["branch"], mode="same"))
+        both = store.render(
+            store.search_tables(
+                ["branch", "sale_invoice"], mode="same", include_foreign_keys=True
+            )
+        )
+        assert first == again
+        assert "sale_invoice.branch_id=branch.id" in both
+        assert render.call_count == 2
+
+        # Replacing the schema drops its cached renderings.
+        store.add_schema(_schema(description="invoices"))
+        assert "invoices" in store.render()
+        assert render.call_count == 3
+    assert store.render_stats()["hits"] == 1
@@ -0,0 +1,69 @@
+import os
+
+from sql_qa.schema.retrieval import HashingEmbedder, SchemaRetriever
+from sql_qa.schema.store import Column, Schema, Table
+
+
+def _schema():
+    def table(name, description, *columns):
+        return Table(
+            name=name,
+            description=description,
+            columns=[
+                Column(name=c, type="TEXT", description=d) for c, d in columns
+            ],
+        )
+
+    return Schema(
+        name="shop",
+        tables=[
+            table("customer", "people who buy", ("full_name", "customer name")),
+            table("sale_invoice", "sales invoices", ("total_amount", "invoice total")),
+            table("supplier", "vendors", ("phone", "supplier phone number")),
+            table("employee", "staff members", ("salary", "monthly salary")),
+            table("branch", "store branches", ("address", "branch address")),
+        ],
+        foreign_keys=["sale_invoice.customer_id=customer.id"],
+    )
+
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__(dim=256)
+        self.document_calls = 0
+
+    def embed_documents(self, texts):
+        self.document_calls += 1
+        return super().embed_documents(texts)
+
+
+def test_retrieve_ranks_tables_by_description_and_columns():
+    retriever = SchemaRetriever(_schema(), HashingEmbedder())
+    assert retriever.retrieve("monthly salary of staff", 1) == ["employee"]
+    assert retriever.retrieve("supplier phone number", 1) == ["supplier"]
+
+
+def test_filter_schema_keeps_top_k_and_their_foreign_keys():
+    retriever = SchemaRetriever(_schema(), HashingEmbedder())
+    narrowed = retriever.filter_schema("invoice total per customer name", 2)
+    assert [t.name for t in narrowed.tables] == ["customer", "sale_invoice"]
+    assert narrowed.foreign_keys == ["sale_invoice.customer_id=customer.id"]
+    assert retriever.filter_schema("anything", 10) is retriever.schema
+
+
+def test_index_is_persisted_and_reused(tmp_path):
+    first = CountingEmbedder()
+    SchemaRetriever(_schema(), first, cache_dir=str(tmp_path))
+    assert first.document_calls == 1
+    assert len(os.listdir(tmp_path)) == 1
+
+    second = CountingEmbedder()
+    retriever = SchemaRetriever(_schema(), second, cache_dir=str(tmp_path))
+    assert second.document_calls == 0
+    assert retriever.retrieve("branch address", 1) == ["branch"]
+
+    changed = _schema()
+    changed.tables[0].description = "buyers"
+    third = CountingEmbedder()
+    SchemaRetriever(changed, third, cache_dir=str(tmp_path))
+    assert third.document_calls == 1
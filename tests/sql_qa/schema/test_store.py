@@ -0,0 +1,149 @@
+from sql_qa.schema.store import Column, Schema, SchemaStore, Table
+
+
+def _table(name, *columns):
+    return Table(
+        name=name,
+        columns=[Column(name=c, type="INTEGER", description=c) for c in columns],
+    )
+
+
+def _store():
+    schema = Schema(
+        name="shop",
+        tables=[
+            _table("sale_invoice", "id", "branch_id", "store_id"),
+            _table("sale_invoice_detail", "id", "invoice_id", "item_id"),
+            _table("branch", "id"),
+            _table("item", "id"),
+            _table("store", "id"),
+            _table("supplier", "id"),
+        ],
+        foreign_keys=[
+            "sale_invoice.branch_id=branch.id",
+            "sale_invoice.store_id=store.id",
+            "sale_invoice_detail.invoice_id=sale_invoice.id",
+            "sale_invoice_detail.item_id=item.id",
+            "malformed",
+        ],
+    )
+    store = SchemaStore()
+    store.add_schema(schema)
+    return store
+
+
+def _names(result):
+    return [t.name for t in result["shop"].tables]
+
+
+def test_index_parses_foreign_keys_once():
+    index = _store().get_index("shop")
+    assert len(index.foreign_keys) == 4
+    assert index.neighbors("sale_invoice") == {
+        "branch",
+        "store",
+        "sale_invoice_detail",
+    }
+    assert index.lookup("SALE_INVOICE").name == "sale_invoice"
+    assert index.column("sale_invoice", "Branch_ID").name == "branch_id"
+
+
+def test_same_mode_matches_whole_names_in_schema_order():
+    result = _store().search_tables(
+        ["Store", "sale_invoice"], mode="same", include_foreign_keys=True
+    )
+    assert _names(result) == ["sale_invoice", "store"]
+    assert result["shop"].foreign_keys == ["sale_invoice.store_id=store.id"]
+
+
+def test_exact_mode_matches_substrings():
+    result = _store().search_tables(["invoice"], mode="exact")
+    assert _names(result) == ["sale_invoice", "sale_invoice_detail"]
+    assert result["shop"].foreign_keys is None
+
+
+def test_connected_mode_adds_bridge_tables():
+    result = _store().search_tables(
+        ["item", "branch"], mode="connected", include_foreign_keys=True
+    )
+    assert _names(result) == ["sale_invoice", "sale_invoice_detail", "branch", "item"]
+    assert result["shop"].foreign_keys == [
+        "sale_invoice.branch_id=branch.id",
+        "sale_invoice_detail.invoice_id=sale_invoice.id",
+        "sale_invoice_detail.item_id=item.id",
+    ]
+
+
+def test_qualified_table_names():
+    schema = Schema(
+        name="dw",
+        tables=[_table("sales.orders", "id", "customer_id"), _table("crm.customer", "id")],
+        foreign_keys=["sales.orders.customer_id=crm.customer.id"],
+    )
+    store = SchemaStore(schemas={"dw": schema})
+    result = store.search_tables(
+        ["orders", "customer"], mode="connected", include_foreign_keys=True
+    )
+    assert [t.name for t in result["dw"].tables] == ["sales.orders", "crm.customer"]
+    assert result["dw"].foreign_keys == schema.foreign_keys
+
+
+def _warehouse():
+    # orders - customer - region, orders - order_line - product - supplier;
+    # status is a hub every table points at.
+    tables = ["orders", "customer", "region", "order_line", "product", "supplier", "status"]
+    fks = [
+        "orders.customer_id=customer.id",
+        "customer.region_id=region.id",
+        "order_line.order_id=orders.id",
+        "order_line.product_id=product.id",
+        "product.supplier_id=supplier.id",
+    ] + [f"{t}.status_id=status.id" for t in tables if t != "status"]
+    store = SchemaStore()
+    store.add_schema(
+        Schema(name="dw", tables=[_table(t, "id") for t in tables], foreign_keys=fks)
+    )
+    return store
+
+
+def test_join_tree_takes_shortest_path():
+    index = _warehouse().get_index("dw")
+    tree = index.join_tree(["region", "product"], max_hops=4)
+    # 2 hops through the status hub beat 4 hops through customer/orders.
+    assert tree.tables == {"region", "status", "product"}
+    assert not tree.disconnected
+    assert len(tree.foreign_keys) == len(tree.tables) - 1
+
+
+def test_join_tree_prefers_specific_bridges_over_hubs():
+    index = _warehouse().get_index("dw")
+    tree = index.join_tree(["orders", "product"], max_hops=3)
+    # orders-order_line-product and orders-status-product are both 2 hops.
+    assert tree.tables == {"orders", "order_line", "product"}
+
+
+def test_join_tree_respects_hop_bound():
+    store = SchemaStore()
+    store.add_schema(
+        Schema(
+            name="chain",
+            tables=[_table(t, "id") for t in "abcd"],
+            foreign_keys=["a.b_id=b.id", "b.c_id=c.id", "c.d_id=d.id"],
+        )
+    )
+    index = store.get_index("chain")
+    assert index.join_tree(["a", "d"], max_hops=3).tables == set("abcd")
+    bounded = index.join_tree(["a", "d"], max_hops=2)
+    assert bounded.tables == {"a", "d"}
+    assert bounded.disconnected == {"a", "d"}
+
+
+def test_connected_mode_returns_join_tree():
+    result = _warehouse().search_tables(
+        ["orders", "product"], mode="connected", include_foreign_keys=True, max_hops=2
+    )
+    assert [t.name for t in result["dw"].tables] == ["orders", "order_line", "product"]
+    assert result["dw"].foreign_keys == [
+        "order_line.order_id=orders.id",
+        "order_line.product_id=product.id",
+    ]
@@ -0,0 +1,99 @@
+import pytest
+
+from shared.cache import LRUCache
+from shared.db import canonicalize_sql, execute_sql, get_db, get_result_cache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_eviction_by_entries():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lru_eviction_by_bytes():
+    cache = LRUCache(max_entries=10, max_bytes=10)
+    cache.set("a", "12345")
+    cache.set("b", "67890")
+    cache.set("c", "x")
+
+    assert "a" not in cache
+    assert cache.stats()["bytes"] <= 10
+    assert not cache.set("too_big", "x" * 11)
+
+
+def test_ttl_expiry():
+    clock = FakeClock()
+    cache = LRUCache(ttl=5, clock=clock)
+    cache.set("a", 1)
+    clock.now = 4
+    assert cache.get("a") == 1
+    clock.now = 5
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_invalidate_namespace():
+    cache = LRUCache()
+    cache.set("a", 1, namespace="db1")
+    cache.set("b", 2, namespace="db2")
+
+    assert cache.invalidate("db1") == 1
+    assert "a" not in cache and "b" in cache
+
+
+def test_canonicalize_sql():
+    assert canonicalize_sql(
+        "select  a\n from T -- comment\n where x=1", "mysql"
+    ) == canonicalize_sql("SELECT a FROM T WHERE x = 1", "mysql")
+    assert canonicalize_sql("SELECT a FROM T", "mysql") != canonicalize_sql(
+        "SELECT a FROM t", "mysql"
+    )
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = get_db(f"sqlite:///{tmp_path / 'cache.db'}")
+    db.run("CREATE TABLE t (x INTEGER)")
+    db.run("INSERT INTO t VALUES (1)")
+    get_result_cache().clear()
+    return db
+
+
+def test_execute_sql_serves_repeated_reads_from_cache(db):
+    stats = get_result_cache().stats()
+
+    assert execute_sql(db, "SELECT x FROM t") == ("[(1,)]", True)
+    assert execute_sql(db, "select x\nfrom t;") == ("[(1,)]", True)
+
+    after = get_result_cache().stats()
+    assert after["hits"] - stats["hits"] == 1
+    assert after["misses"] - stats["misses"] == 1
+
+
+def test_execute_sql_write_invalidates_database(db):
+    execute_sql(db, "SELECT x FROM t")
+    execute_sql(db, "INSERT INTO t VALUES (2)")
+
+    assert execute_sql(db, "SELECT x FROM t") == ("[(1,), (2,)]", True)
+
+
+def test_execute_sql_skips_volatile_and_failed_queries(db):
+    bypasses = get_result_cache().stats()["bypasses"]
+    execute_sql(db, "SELECT RANDOM()")
+    execute_sql(db, "SELECT x FROM missing")
+
+    assert get_result_cache().stats()["bypasses"] == bypasses + 1
+    assert len(get_result_cache()) == 0
@@ -0,0 +1,45 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from shared import tracing
+from shared.context import current_request_id, request_context, submit
+from shared.logger import logger, setup_logging
+
+
+def test_concurrent_requests_have_their_own_id():
+    async def turn():
+        with request_context() as request_id:
+            await asyncio.sleep(0.01)
+            seen = await asyncio.to_thread(current_request_id)
+            return request_id, seen
+
+    async def run():
+        return await asyncio.gather(*(turn() for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert all(request_id == seen for request_id, seen in results)
+    assert len({request_id for request_id, _ in results}) == 5
+    assert current_request_id() is None
+
+
+def test_submit_runs_in_the_callers_context():
+    with request_context("abc") as request_id, ThreadPoolExecutor(2) as pool:
+        assert submit(pool, current_request_id).result() == request_id
+        assert pool.submit(current_request_id).result() is None
+
+
+def test_root_span_trace_id_is_the_request_id():
+    with request_context() as request_id:
+        with tracing.span("turn") as turn, tracing.span("llm") as llm:
+            pass
+    assert turn.trace_id == llm.trace_id == request_id
+
+
+def test_log_records_carry_the_request_id():
+    setup_logging()
+    handler = logger.handlers[0]
+    record = logging.LogRecord("t", logging.INFO, __file__, 1, "msg", None, None)
+    with request_context("abc"):
+        assert "[abc]" in handler.format(record)
+    assert "[-]" in handler.format(record)
@@ -9,3 +9,144 @@ def db():
 
 def test_dialect(db):
     assert len(db.get_usable_table_names())
+
+
+def test_get_db_shares_one_engine_per_uri(tmp_path):
+    from shared.db import get_db, get_engine
+
+    uri = f"sqlite:///{tmp_path / 'shared.db'}"
+    assert get_db(uri) is get_db(uri)
+    assert get_db(uri)._engine is get_engine(uri)
+
+
+def test_pool_metrics_track_checkouts(tmp_path):
+    from shared.db import execute_sql, get_db, get_pool_metrics
+
+    uri = f"sqlite:///{tmp_path / 'metrics.db'}"
+    db = get_db(uri)
+    for _ in range(3):
+        assert execute_sql(db, "SELECT 1") == ("[(1,)]", True)
+
+    metrics = [m for name, m in get_pool_metrics().items() if "metrics.db" in name][0]
+    assert metrics["checkouts"] >= 3
+    assert metrics["checkins"] == metrics["checkouts"]
+    assert metrics["checked_out"] == 0
+    assert metrics["checkout_wait_max"] >= metrics["checkout_wait_avg"] >= 0
+
+
+def test_aexecute_sql_async_engine(tmp_path, monkeypatch):
+    import asyncio
+
+    import shared.db
+
+    pytest.importorskip("aiosqlite")
+    monkeypatch.setitem(shared.db.app_config.database, "async_execution", True)
+    uri = f"sqlite:///{tmp_path / 'async.db'}"
+    db = shared.db.get_db(uri)
+
+    async def run():
+        try:
+            return await shared.db.aexecute_sql(db, "SELECT 1, 'a'")
+        finally:
+            await shared.db.adispose_engines()
+
+    result = asyncio.run(run())
+
+    assert result == ("[(1, 'a')]", True)
+    assert any(name.startswith("async:") for name in shared.db.get_pool_metrics())
+
+
+@pytest.fixture
+def numbers_db(tmp_path):
+    from shared.db import get_db
+
+    db = get_db(f"sqlite:///{tmp_path / 'numbers.db'}")
+    db.run("CREATE TABLE numbers (n INTEGER, label TEXT)")
+    db.run(
+        "INSERT INTO numbers VALUES "
+        + ", ".join(f"({i}, 'row {i}')" for i in range(50))
+    )
+    return db
+
+
+def test_stream_sql_yields_typed_batches(numbers_db):
+    from shared.db import stream_sql
+
+    batches = list(stream_sql(numbers_db, "SELECT n, label FROM numbers", 20))
+
+    assert [len(b.rows) for b in batches] == [20, 20, 10]
+    assert batches[0].columns == ("n", "label")
+    assert batches[0].rows[0] == (0, "row 0")
+
+
+def test_execute_query_caps_rows_and_loads_full_result_lazily(numbers_db):
+    from shared.db import execute_query
+
+    result = execute_query(numbers_db, "SELECT n FROM numbers ORDER BY n", max_rows=5)
+
+    assert result.truncated
+    assert result.rows == [(i,) for i in range(5)]
+    assert "truncated after 5 rows" in result.to_text()
+    assert result.summary(max_rows=2).splitlines() == [
+        "columns: n",
+        "(0,)",
+        "(1,)",
+        "... 3+ more rows",
+    ]
+    assert len(result.fetch_all()) == 50
+
+
+def test_execute_query_runs_the_sql_unchanged(numbers_db):
+    from sqlalchemy import event
+
+    from shared.db import execute_query
+
+    statements = []
+    event.listen(
+        numbers_db._engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    sql = "SELECT n FROM numbers /* validated */ ORDER BY n"
+    result = execute_query(numbers_db, sql, max_rows=5, use_cache=False)
+
+    # capped while streaming, not by rewriting the statement
+    assert statements == [sql]
+    assert result.truncated
+    assert len(result.rows) == 5
+
+
+def test_execute_query_caps_bytes(numbers_db):
+    from shared.db import execute_query
+
+    result = execute_query(numbers_db, "SELECT label FROM numbers", max_bytes=40)
+
+    assert result.truncated
+    assert 0 < result.nbytes <= 40
+
+
+def test_execute_query_reports_errors(numbers_db):
+    from shared.db import execute_query
+
+    result = execute_query(numbers_db, "SELECT nope FROM numbers")
+
+    assert not result.is_success
+    assert "nope" in result.summary()
+
+
+def test_result_fingerprint_ignores_row_order(numbers_db):
+    from shared.db import execute_query
+
+    def fingerprint(sql):
+        return execute_query(numbers_db, sql, use_cache=False).fingerprint()
+
+    asc = fingerprint("SELECT n, label FROM numbers WHERE n < 5 ORDER BY n")
+    desc = fingerprint("SELECT n, label FROM numbers WHERE n < 5 ORDER BY n DESC")
+    as_real = fingerprint(
+        "SELECT CAST(n AS REAL), label FROM numbers WHERE n < 5 ORDER BY n"
+    )
+
+    assert asc == desc == as_real
+    assert asc != fingerprint("SELECT n, label FROM numbers WHERE n < 4")
+    assert fingerprint("SELECT n FROM numbers WHERE n < 0") is None
+    assert fingerprint("SELECT nope FROM numbers") is None
@@ -0,0 +1,94 @@
+import subprocess
+import sys
+
+import pytest
+
+from sql_qa.metrics.startup import cumulative_import_time
+
+# seconds of `python -X importtime` cumulative time per entry point
+IMPORT_BUDGETS = {
+    "sql_qa.config": 0.2,
+    "shared.logger": 0.3,
+    "shared.turn_log": 0.3,
+    "shared.tracing": 0.5,
+    "shared.db": 1.0,
+    "shared.mcp.chart": 0.2,
+    "sql_qa.metrics.benchmark": 0.5,
+    "sql_qa.metrics.evaluation": 1.0,
+    "sql_qa.metrics.traces": 0.5,
+    "sql_qa.schema.introspect": 1.0,
+    "sql_qa.serving.sql": 0.5,
+}
+
+# importing these must not compose the config or set up logging
+SIDE_EFFECT_FREE = [
+    "sql_qa.config",
+    "shared.logger",
+    "shared.turn_log",
+    "shared.tracing",
+    "shared.db",
+    "shared.mcp.chart",
+    "sql_qa.metrics.benchmark",
+    "sql_qa.metrics.evaluation",
+    "sql_qa.metrics.traces",
+    "sql_qa.schema.introspect",
+    "sql_qa.serving.sql",
+    "sql_qa.prompt.constant",
+    "sql_qa.llm.generation",
+    "sql_qa.llm.strategy",
+    "sql_qa.agent.sql",
+]
+
+
+def _run(code: str) -> subprocess.CompletedProcess:
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    if result.returncode != 0 and "ModuleNotFoundError" in result.stderr:
+        pytest.skip(result.stderr.strip().splitlines()[-1])
+    assert result.returncode == 0, result.stderr
+    return result
+
+
+@pytest.mark.parametrize("module", sorted(IMPORT_BUDGETS))
+def test_import_time_budget(module):
+    try:
+        seconds = cumulative_import_time(module)
+    except ImportError as e:
+        if "ModuleNotFoundError" not in str(e):
+            raise
+        pytest.skip(str(e))
+    assert seconds < IMPORT_BUDGETS[module], f"{module} imported in {seconds:.3f}s"
+
+
+@pytest.mark.parametrize("module", SIDE_EFFECT_FREE)
+def test_import_does_no_work(module):
+    _run(
+        f"import {module}\n"
+        "import shared.logger, sql_qa.config\n"
+        "assert sql_qa.config._settings is None, 'config composed'\n"
+        "assert not shared.logger._is_set_up, 'logging set up'\n"
+    )
+
+
+# heavy dependencies only the code paths using them may load
+DEFERRED = {
+    "sql_qa.serving.sql": ["pandas", "tqdm", "langgraph", "langchain_community"],
+    "sql_qa.metrics.evaluation": ["tqdm", "langgraph"],
+    "sql_qa.metrics.traces": ["pandas"],
+    "sql_qa.llm.adapter": ["langchain_huggingface", "transformers"],
+    "shared.db": ["langchain_community", "sqlalchemy.ext.asyncio", "sqlglot"],
+    "shared.mcp.chart": ["matplotlib", "numpy", "networkx", "wordcloud", "seaborn"],
+}
+
+
+@pytest.mark.parametrize("module", sorted(DEFERRED))
+def test_heavy_imports_are_deferred(module):
+    _run(
+        f"import sys, {module}\n"
+        f"loaded = [m for m in {DEFERRED[module]!r} if m in sys.modules]\n"
+        "assert not loaded, loaded\n"
+    )
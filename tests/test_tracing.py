@@ -0,0 +1,91 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from shared import tracing
+
+
+@pytest.fixture
+def exporter(tmp_path):
+    exporter = tracing.JsonlSpanExporter(str(tmp_path / "spans.jsonl"))
+    tracing.configure([exporter])
+    yield exporter
+    tracing.configure([])
+
+
+def test_nested_spans_roll_up_and_export(exporter):
+    with tracing.span("turn") as turn:
+        with tracing.span("llm", model="m"):
+            tracing.add("input_tokens", 10)
+            tracing.add("retries")
+        with tracing.span("db.execute"):
+            tracing.add("db_cache_hits")
+        # written once the root span ends
+        assert not os.path.exists(exporter.path)
+
+    assert turn.counters == {"input_tokens": 10, "retries": 1, "db_cache_hits": 1}
+    spans = tracing.read_spans(exporter.path)
+    assert [s["name"] for s in spans] == ["llm", "db.execute", "turn"]
+    llm, _, root = spans
+    assert llm["parent_id"] == root["span_id"]
+    assert llm["trace_id"] == root["trace_id"]
+    assert llm["attributes"] == {"model": "m"}
+    assert root["parent_id"] is None
+
+
+def test_spans_follow_tasks_and_threads(exporter):
+    @tracing.traced("node")
+    async def node(i):
+        await asyncio.to_thread(tracing.add, "rows", i)
+        if i == 2:
+            raise ValueError("boom")
+
+    async def run():
+        with tracing.span("turn") as turn:
+            await asyncio.gather(node(1), node(2), return_exceptions=True)
+        return turn
+
+    turn = asyncio.run(run())
+    assert turn.counters["rows"] == 3
+    spans = tracing.read_spans(exporter.path)
+    nodes = [s for s in spans if s["name"] == "node"]
+    assert sorted(s["status"] for s in nodes) == ["error", "ok"]
+    assert all(s["parent_id"] == turn.span_id for s in nodes)
+
+
+def test_record_stages():
+    with tracing.record_stages() as stages:
+        for _ in range(2):
+            with tracing.span("fix"):
+                pass
+    assert set(stages) == {"fix"}
+    with tracing.span("fix"):
+        pass
+    assert set(stages) == {"fix"}
+
+
+def test_summarize_spans():
+    spans = [
+        {"name": "llm", "duration": d, "status": "ok", "counters": {"input_tokens": 10}}
+        for d in (1.0, 2.0, 3.0)
+    ] + [{"name": "db.execute", "duration": 0.5, "status": "error", "counters": {}}]
+    summary = tracing.summarize_spans(spans)
+    assert summary["llm"]["count"] == 3
+    assert summary["llm"]["p50"] == 2.0
+    assert summary["llm"]["mean_input_tokens"] == 10
+    assert summary["db.execute"]["errors"] == 1
+
+
+def test_otlp_payload():
+    with tracing.span("turn") as root:
+        with tracing.span("llm", model="m") as child:
+            child.add("input_tokens", 5)
+    payload = tracing._otlp_span(child)
+    assert payload["parentSpanId"] == root.span_id
+    assert len(payload["traceId"]) == 32 and len(payload["spanId"]) == 16
+    attributes = {a["key"]: a["value"] for a in payload["attributes"]}
+    assert attributes["model"] == {"stringValue": "m"}
+    assert attributes["input_tokens"] == {"intValue": "5"}
+    json.dumps(payload)
@@ -0,0 +1,189 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from shared.context import request_context
+from shared.logger import with_a_turn_logger
+from shared.turn_log import BufferedTurnLogger, JsonlTurnSink, create_turn_logger
+
+
+@pytest.fixture
+def turn_logger(tmp_path):
+    turn_logger = BufferedTurnLogger(
+        JsonlTurnSink(str(tmp_path / "turns.jsonl")), batch_size=4, flush_interval=0.05
+    )
+    yield turn_logger
+    turn_logger.close()
+
+
+def _rows(turn_logger):
+    turn_logger.flush(5)
+    with open(turn_logger.sink.path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_concurrent_turns_get_their_own_row(turn_logger):
+    @with_a_turn_logger(turn_logger)
+    async def turn(i):
+        turn_logger.log("question", f"q{i}")
+        await asyncio.sleep(0.01 * (3 - i))
+        # nodes run in tasks, they see the turn's row
+        await asyncio.gather(
+            asyncio.create_task(asyncio.sleep(0)),
+            asyncio.to_thread(turn_logger.log, "answer", f"a{i}"),
+        )
+        return i
+
+    async def run():
+        return await asyncio.gather(*(turn(i) for i in range(3)))
+
+    assert asyncio.run(run()) == [0, 1, 2]
+    rows = _rows(turn_logger)
+    assert sorted((r["question"], r["answer"]) for r in rows) == [
+        ("q0", "a0"),
+        ("q1", "a1"),
+        ("q2", "a2"),
+    ]
+    assert len({r["turn_id"] for r in rows}) == 3
+
+
+def test_new_keys_and_repeated_values(turn_logger):
+    with turn_logger:
+        turn_logger.log("prompt", "first")
+        turn_logger.log("prompt", "retry")
+        turn_logger.log("state", {"tables": ["a"]})
+    with turn_logger:
+        turn_logger.log("other_key", 1)
+
+    first, second = _rows(turn_logger)
+    assert first["prompt"] == "first\nretry"
+    assert first["state"] == {"tables": ["a"]}
+    assert second["other_key"] == 1
+    assert "prompt" not in second
+
+
+def test_log_outside_a_turn_is_dropped(turn_logger):
+    turn_logger.log("orphan", "value")
+    turn_logger.save_turn()
+    turn_logger.flush(5)
+    assert not os.path.exists(turn_logger.sink.path)
+
+
+def test_batches_are_written_by_the_writer(tmp_path):
+    writes = []
+
+    class Sink(JsonlTurnSink):
+        def write(self, rows):
+            writes.append(len(rows))
+
+    turn_logger = BufferedTurnLogger(Sink("unused"), batch_size=3, flush_interval=10)
+    for i in range(7):
+        turn_logger.new_turn()
+        turn_logger.log("i", i)
+        turn_logger.save_turn()
+    turn_logger.close()
+    assert sum(writes) == 7
+    assert max(writes) == 3
+
+
+def test_create_turn_logger_validates():
+    with pytest.raises(ValueError):
+        create_turn_logger(format="xml")
+    with pytest.raises(ValueError):
+        create_turn_logger(durability="always")
+
+
+def test_turn_id_is_the_request_id(turn_logger):
+    with request_context() as request_id, turn_logger:
+        turn_logger.log("question", "q")
+    (row,) = _rows(turn_logger)
+    assert row["turn_id"] == request_id
+
+
+def test_send_fan_out_logs_into_the_turn_row(turn_logger):
+    import operator
+    from typing import Annotated, List, TypedDict
+
+    from langgraph.graph import END, START, StateGraph
+    from langgraph.types import Send
+
+    class State(TypedDict):
+        question: str
+        branch: str
+        done: Annotated[List[str], operator.add]
+
+    def branch(state):
+        turn_logger.log(state["branch"], state["question"])
+        return {"done": [state["branch"]]}
+
+    graph = StateGraph(State)
+    graph.add_node("strategy", branch)
+    graph.add_conditional_edges(
+        START,
+        lambda state: [Send("strategy", {**state, "branch": b}) for b in ("a", "b")],
+    )
+    graph.add_edge("strategy", END)
+    graph = graph.compile()
+
+    @with_a_turn_logger(turn_logger)
+    async def turn(question):
+        turn_logger.log("question", question)
+        return await graph.ainvoke({"question": question, "done": []})
+
+    @with_a_turn_logger(turn_logger)
+    def sync_turn(question):
+        turn_logger.log("question", question)
+        return graph.invoke({"question": question, "done": []})
+
+    async def run():
+        return await asyncio.gather(turn("q1"), turn("q2"))
+
+    asyncio.run(run())
+    sync_turn("q3")
+    rows = _rows(turn_logger)
+    assert sorted((r["question"], r["a"], r["b"]) for r in rows) == [
+        ("q1", "q1", "q1"),
+        ("q2", "q2", "q2"),
+        ("q3", "q3", "q3"),
+    ]
+
+
+def test_csv_turn_logger_rows_are_per_turn(tmp_path):
+    import csv
+
+    from shared.logger import CSV_DEMILITER, TurnLogger
+
+    turn_logger = TurnLogger(str(tmp_path / "turns.csv"))
+
+    @with_a_turn_logger(turn_logger)
+    async def turn(i):
+        turn_logger.log("question", f"q{i}")
+        await asyncio.sleep(0.01 * (2 - i))
+        turn_logger.log("answer", f"a{i}")
+
+    async def run():
+        await asyncio.gather(turn(0), turn(1))
+
+    asyncio.run(run())
+    with open(turn_logger.csv_file_path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f, delimiter=CSV_DEMILITER))
+    assert sorted((r["question"], r["answer"]) for r in rows) == [
+        ("q0", "a0"),
+        ("q1", "a1"),
+    ]
+
+
+def test_csv_turn_logger_has_no_shared_default_row(tmp_path):
+    import contextvars
+
+    from shared.logger import TurnLogger
+
+    turn_logger = TurnLogger(str(tmp_path / "turns.csv"))
+    assert turn_logger.current_row is None
+
+    # contexts logging before `new_turn` each start their own row
+    contextvars.copy_context().run(turn_logger.log, "question", "q0")
+    turn_logger.log("question", "q1")
+    assert turn_logger.current_row == {"question": "q1"}